@@ -308,3 +308,13 @@ class WASM_OP_Code:
                     ('data', '0b'), ('custom', '00')]
     section_code_dict = dict(section_code)
     section_code_dict_rev = {v: k for k, v in section_code_dict.items()}
+
+
+# opcode byte -> mnemonic and opcode byte -> whether it has immediates. the
+# type encodings at the head of all_ops share their bytes with real opcodes,
+# the instructions come later in the list and overwrite them.
+Op_Names = [None] * 256
+Op_Immediates = [False] * 256
+for op_code in WASM_OP_Code.all_ops:
+    Op_Names[int(op_code[1], 16)] = op_code[0]
+    Op_Immediates[int(op_code[1], 16)] = op_code[2]
@@ -1,7 +1,12 @@
-from utils import Colors, init_interpret, ParseFlags
+from utils import Colors, init_interpret, InitExprValue, ParseFlags
 from OpCodes import WASM_OP_Code
 from section_structs import Code_Section, Func_Body, WASM_Ins
 from execute import *
+from validator import *
+from predecode import BuildSideTable
+from values import ToValue, Operand_Stack
+from linearmemory import Memory_Instance
+from gasbound import GetGasBounds
 import datetime as dti
 import os
 import sys
@@ -105,17 +110,20 @@ def DumpIndexSpaces(machinestate):
 # WIP-the Truebit Machine class
 class TBMachine():
     def __init__(self):
-        # bytearray of size PAGE_SIZE
+        # a Memory_Instance per memory
         self.Linear_Memory = []
         self.Stack_Control_Flow = list()
         self.Stack_Call = list()
         self.Stack_Value = list()
-        self.Stack_Omni = list()
+        # the interpreter replaces it with one sized for the module
+        self.Stack_Omni = Operand_Stack(0)
         self.Vector_Globals = list()
         self.Index_Space_Function = list()
         self.Index_Space_Global = list()
         self.Index_Space_Linear = list()
         self.Index_Space_Table = list()
+        # the function indices in each table
+        self.Tables = list()
 
 
 # handles the initialization of the WASM machine
@@ -127,11 +135,18 @@ class TBInit():
     # a convenience function that runs the methods of the class. all methods
     # can be called separately manually as well.
     def run(self):
+        self.InitDeclarations()
+        self.LoadDataSegments()
+
+    # everything that only needs the sections in front of the code section.
+    # the streaming parser runs this before the code section has arrived.
+    def InitDeclarations(self):
         self.InitFuncIndexSpace()
         self.InitGlobalIndexSpace()
         self.InitLinearMemoryIndexSpace()
         self.InitTableIndexSpace()
-        self.InitializeLinearMemory()
+        self.AllocateLinearMemory()
+        self.LoadElementSegments()
 
     def InitFuncIndexSpace(self):
         if self.module.import_section is not None:
@@ -157,7 +172,9 @@ class TBInit():
 
         if self.module.global_section is not None:
             for iter in self.module.global_section.global_variables:
-                self.machinestate.Index_Space_Global.append(iter.init_expr)
+                value = InitExprValue(iter.init_expr, self.machinestate.Index_Space_Global)
+                self.machinestate.Index_Space_Global.append(
+                    ToValue(iter.global_type.content_type, value))
 
     def InitLinearMemoryIndexSpace(self):
         if self.module.import_section is not None:
@@ -186,18 +203,51 @@ class TBInit():
                 self.machinestate.Index_Space_Table.append(iter.element_type)
 
     def InitializeLinearMemory(self):
-        # @DEVI-we could try to pack the data in the linear memory ourselve to
-        # decrease the machinestate size
+        self.AllocateLinearMemory()
+        self.LoadDataSegments()
+
+    # every memory is a Memory_Instance of its initial size that can grow up
+    # to its maximum
+    def AllocateLinearMemory(self):
         if self.module.memory_section is not None:
             for iter in self.module.memory_section.memory_types:
-                self.machinestate.Linear_Memory.append(bytearray(
-                    WASM_OP_Code.PAGE_SIZE))
+                maximum = iter.maximum if iter.flags else None
+                self.machinestate.Linear_Memory.append(
+                    Memory_Instance(iter.initial, maximum))
+
+    # fills the tables with the function indices of the element segments.
+    # entries no segment covers stay None.
+    def LoadElementSegments(self):
+        if self.module.table_section is not None:
+            for iter in self.module.table_section.table_types:
+                self.machinestate.Tables.append([None] * iter.limit.initial)
+            if self.module.element_section is not None:
+                for iter in self.module.element_section.elem_segments:
+                    table = self.machinestate.Tables[iter.index]
+                    offset = init_interpret(iter.offset)
+                    end = offset + len(iter.elems)
+                    if end > len(table):
+                        raise Exception(Colors.red + "element segment at " + repr(offset) +
+                                        " of size " + repr(len(iter.elems)) +
+                                        " does not fit in table " + repr(iter.index) +
+                                        Colors.ENDC)
+                    table[offset:end] = iter.elems
+
+    # the segments' data are views into the module buffer. each one is copied
+    # into the linear memory with a single slice assignment.
+    def LoadDataSegments(self):
+        if self.module.memory_section is not None:
             if self.module.data_section is not None:
                 for iter in self.module.data_section.data_segments:
-                    count = int()
-                    for byte in iter.data:
-                        self.machinestate.Linear_Memory[iter.index][init_interpret(iter.offset) + count] = byte
-                        count += 1
+                    linear_memory = self.machinestate.Linear_Memory[iter.index]
+                    offset = init_interpret(iter.offset)
+                    end = offset + len(iter.data)
+                    if end > len(linear_memory):
+                        raise Exception(Colors.red + "data segment at " + repr(offset) +
+                                        " of size " + repr(len(iter.data)) +
+                                        " does not fit in linear memory " +
+                                        repr(iter.index) + Colors.ENDC)
+                    linear_memory[offset:end] = iter.data
 
 
 
@@ -219,48 +269,190 @@ class RTE():
         pass
 
 
-# palceholder for the class that holds the validation functions
+# the module level validation. the function bodies are validated while they
+# are disassembled, CodeSection only collects what the validator found. the
+# errors end up in self.errors. lazy bodies that haven't been decoded yet are
+# validated when they are, their indexes end up in self.deferred.
 class ModuleValidation():
     def __init__(self, module):
         self.module = module
+        self.errors = []
+        self.deferred = []
+        self.context = Validation_Context(
+            module.type_section, module.import_section, module.function_section,
+            module.table_section, module.memory_section, module.global_section)
+
+    def error(self, section, message):
+        self.errors.append(section + ': ' + message)
+
+    def checkLimits(self, section, limits, maximum):
+        if limits.initial > maximum:
+            self.error(section, 'initial size ' + repr(limits.initial) + ' is over ' +
+                       repr(maximum))
+        if limits.flags and limits.maximum < limits.initial:
+            self.error(section, 'maximum size ' + repr(limits.maximum) +
+                       ' is under the initial size ' + repr(limits.initial))
+        if limits.flags and limits.maximum > maximum:
+            self.error(section, 'maximum size ' + repr(limits.maximum) + ' is over ' +
+                       repr(maximum))
+
+    def checkInitExpr(self, section, expr, expect):
+        try:
+            value_type = InitExprType(expr, self.context)
+        except ValidationError as e:
+            self.error(section, str(e))
+            return
+        if value_type != expect:
+            self.error(section, 'init expr produces ' + Type_Names[value_type] +
+                       ' instead of ' + Type_Names[expect])
 
     def TypeSection(self):
-        pass
+        if self.module.type_section is None:
+            return
+        for index, func_type in enumerate(self.module.type_section.func_types):
+            if func_type.form != Func_Form:
+                self.error('type', 'type ' + repr(index) + ' is not a function type')
+            if func_type.return_cnt > 1:
+                self.error('type', 'type ' + repr(index) + ' has more than one result')
+            for value_type in func_type.param_types + func_type.return_type:
+                if value_type not in Value_Types:
+                    self.error('type', 'type ' + repr(index) + ' has a bad value type ' +
+                               repr(value_type))
 
     def ImportSection(self):
-        pass
+        if self.module.import_section is None:
+            return
+        for import_entry in self.module.import_section.import_entry:
+            if import_entry.kind == 0:
+                if import_entry.type >= len(self.context.types):
+                    self.error('import', 'unknown type ' + repr(import_entry.type))
+            elif import_entry.kind == 1:
+                if import_entry.type.element_type != Anyfunc:
+                    self.error('import', 'table element type is not anyfunc')
+                self.checkLimits('import', import_entry.type.limit, 2**32 - 1)
+            elif import_entry.kind == 2:
+                self.checkLimits('import', import_entry.type.limits, Max_Pages)
+            elif import_entry.kind == 3:
+                if import_entry.type.content_type not in Value_Types:
+                    self.error('import', 'bad global type ' + repr(import_entry.type.content_type))
+                if import_entry.type.mutability:
+                    self.error('import', 'mutable globals can not be imported')
+            else:
+                self.error('import', 'unknown import kind ' + repr(import_entry.kind))
 
     def FunctionSection(self):
-        pass
+        if self.module.function_section is None:
+            return
+        for type_index in self.module.function_section.type_section_index:
+            if type_index >= len(self.context.types):
+                self.error('function', 'unknown type ' + repr(type_index))
 
     def TableSection(self):
-        pass
+        if self.context.tables > 1:
+            self.error('table', 'more than one table')
+        if self.module.table_section is None:
+            return
+        for table_type in self.module.table_section.table_types:
+            if table_type.element_type != Anyfunc:
+                self.error('table', 'table element type is not anyfunc')
+            self.checkLimits('table', table_type.limit, 2**32 - 1)
 
     def MemorySection(self):
-        pass
+        if self.context.memories > 1:
+            self.error('memory', 'more than one memory')
+        if self.module.memory_section is None:
+            return
+        for limits in self.module.memory_section.memory_types:
+            self.checkLimits('memory', limits, Max_Pages)
 
     def GlobalSection(self):
-        pass
+        if self.module.global_section is None:
+            return
+        for global_variable in self.module.global_section.global_variables:
+            if global_variable.global_type.content_type not in Value_Types:
+                self.error('global', 'bad global type ' +
+                           repr(global_variable.global_type.content_type))
+                continue
+            self.checkInitExpr('global', global_variable.init_expr,
+                               global_variable.global_type.content_type)
 
     def ExportSection(self):
-        pass
+        if self.module.export_section is None:
+            return
+        index_space = [len(self.context.functions), self.context.tables,
+                       self.context.memories, len(self.context.globals)]
+        names = set()
+        for export_entry in self.module.export_section.export_entries:
+            name = bytes(export_entry.field_str)
+            if name in names:
+                self.error('export', 'duplicate export name ' + repr(name))
+            names.add(name)
+            if export_entry.kind > 3:
+                self.error('export', 'unknown export kind ' + repr(export_entry.kind))
+            elif export_entry.index >= index_space[export_entry.kind]:
+                self.error('export', repr(name) + ' exports an unknown index ' +
+                           repr(export_entry.index))
+            elif export_entry.kind == 3 and self.context.globals[export_entry.index][1]:
+                self.error('export', 'mutable globals can not be exported')
 
     def StartSection(self):
-        pass
+        if self.module.start_section is None:
+            return
+        try:
+            params, results = self.context.getFunctionType(
+                self.module.start_section.function_section_index)
+        except ValidationError as e:
+            self.error('start', str(e))
+            return
+        if params or results:
+            self.error('start', 'the start function must take and return nothing')
 
     def ElementSection(self):
-        pass
+        if self.module.element_section is None:
+            return
+        for elem_segment in self.module.element_section.elem_segments:
+            if elem_segment.index != 0 or self.context.tables == 0:
+                self.error('element', 'unknown table ' + repr(elem_segment.index))
+            self.checkInitExpr('element', elem_segment.offset, I32)
+            for func_index in elem_segment.elems:
+                if func_index >= len(self.context.functions):
+                    self.error('element', 'unknown function ' + repr(func_index))
 
     def CodeSection(self):
-        pass
+        func_count = len(self.context.functions) - self.context.imported_funcs
+        if self.module.code_section is None:
+            if func_count:
+                self.error('code', 'there are functions but no code section')
+            return
+        if self.module.code_section.count != func_count:
+            self.error('code', repr(self.module.code_section.count) + ' bodies for ' +
+                       repr(func_count) + ' functions')
+        for index, func_body in enumerate(self.module.code_section.func_bodies):
+            if func_body.decoder is not None:
+                self.deferred.append(index)
+                continue
+            if not func_body.validated:
+                ValidateBody(self.context, func_body)
+                if func_body.validation_error is None:
+                    func_body.side_table = BuildSideTable(func_body, func_body.code)
+            if func_body.validation_error is not None:
+                self.error('code', 'function body ' + repr(index) + ': ' +
+                           func_body.validation_error)
 
     def DataSection(self):
-        pass
+        if self.module.data_section is None:
+            return
+        for data_segment in self.module.data_section.data_segments:
+            if data_segment.index != 0 or self.context.memories == 0:
+                self.error('data', 'unknown memory ' + repr(data_segment.index))
+            self.checkInitExpr('data', data_segment.offset, I32)
 
     def TBCustom(self):
         pass
 
     def ValidateAll(self):
+        self.errors = []
+        self.deferred = []
         self.TypeSection()
         self.ImportSection()
         self.FunctionSection()
@@ -274,22 +466,28 @@ class ModuleValidation():
         self.DataSection()
         self.TBCustom()
 
-        return(True)
+        self.module.validated = not self.errors
+        return(self.module.validated)
 
 
 # a convinience class that handles the initialization of the wasm machine and
 # interpretation of the code.
 class VM():
-    def __init__(self, modules):
+    # init is an already run TBInit for the first module, e.g. the one the
+    # streaming parser sets up while the module arrives. schedule is the
+    # gas.Gas_Schedule to charge by, the default one if it's None.
+    def __init__(self, modules, init=None, schedule=None):
         self.modules = modules
         self.machinestate = TBMachine()
         # @DEVI-FIXME- the first implementation is single-module only
-        self.init = TBInit(self.modules[0], self.machinestate)
-        self.init.run()
+        if init is None:
+            init = TBInit(self.modules[0], self.machinestate)
+            init.run()
+        self.init = init
         self.machinestate = self.init.getInits()
         self.start_function = Func_Body()
         self.ins_cache = WASM_Ins()
-        self.executewasm = Execute(self.machinestate)
+        self.executewasm = Execute(self.machinestate, self.modules[0], schedule)
         self.totGas = int()
         self.metric = Metric(modules[0].code_section)
         self.parseflags = None
@@ -321,16 +519,23 @@ class VM():
         else:
             raise Exception(Colors.red + "invalid entry for start function index" + Colors.ENDC)
 
+    # returns the function index of the function the module exports as name
+    def getExportFunctionIndex(self, name):
+        if self.modules[0].export_section is not None:
+            for export_entry in self.modules[0].export_section.export_entries:
+                if export_entry.kind == 0 and bytes(export_entry.field_str) == name.encode():
+                    return(export_entry.index)
+        raise Exception(Colors.red + "module does not export a function named " + name +
+                        Colors.ENDC)
+
+    # runs the function at func_index and returns its results
+    def invoke(self, func_index, args=()):
+        return(self.executewasm.invoke(func_index, list(args)))
+
+    # runs the start function. a trap is raised to the caller.
     def execute(self):
         print(Colors.blue + 'running module...' + Colors.ENDC)
-        '''
-        for ins in self.start_function.code:
-            print(ins.opcode + ' ' + ins.operands)
-        '''
-        for ins in self.start_function.code:
-            self.executewasm.getInstruction(ins.opcodeint, ins.operands)
-            self.executewasm.callExecuteMethod()
-            self.getState()
+        self.invoke(self.getStartFunctionIndex())
 
     # pre-execution hook
     def startHook(self):
@@ -341,6 +546,9 @@ class VM():
             self.metric.mccabe()
             print(Colors.red + "mccabe: " + repr(self.metric.getMcCabe()) + Colors.ENDC)
             print(Colors.red + "soc: " + repr(self.metric.getSOC()) + Colors.ENDC)
+            bounds = GetGasBounds(self.modules[0], self.executewasm.schedule)
+            print(Colors.red + "gas bound: " + repr([bound.getText() for bound in bounds]) +
+                  Colors.ENDC)
 
     # post-execution hook
     def endHook(self):
@@ -348,12 +556,19 @@ class VM():
             self.totGas = self.executewasm.getOPGas()
             print(Colors.red + "total gas cost: " + repr(self.totGas) + Colors.ENDC)
 
-    # a convinience method
-    def run(self):
+    # a convinience method. gas_limit is the most gas the start function may
+    # use, it raises a Trap with out of gas once it would use more. None runs
+    # it without a limit. traps are raised after the limit was lifted and the
+    # gas reported.
+    def run(self, gas_limit=None):
         self.startHook()
         self.getStartFunctionBody()
-        self.execute()
-        self.endHook()
+        self.executewasm.setGasLimit(gas_limit)
+        try:
+            self.execute()
+        finally:
+            self.executewasm.setGasLimit(None)
+            self.endHook()
 
 
 # a wrapper class for VM. it timeouts instructions that take too long to
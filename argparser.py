@@ -2,12 +2,21 @@ from __future__ import print_function
 import argparse
 import sys
 import re
+import mmap
+import os
+import time
+import multiprocessing
+import struct as stc
 from section_structs import *
 from utils import *
 from OpCodes import *
-from copy import deepcopy
 from TBInit import *
 from merklize import *
+from modcache import ModuleCache, PackModule, UnpackModule
+from validator import Validation_Context, CodeValidator
+from predecode import BuildSideTable
+from gas import LoadGasSchedule
+from gasbound import GetGasBounds
 
 _DBG_ = True
 
@@ -17,6 +26,12 @@ class ParsedStruct:
     def __init__(self):
         self.version_number = int()
         self.section_list = []
+        # section id -> payload for the known sections
+        self.section_dir = dict()
+        # (name, payload) for every custom section, in the order they appear
+        self.custom_sections = []
+        # the bytes or mmap object the section payloads are views into
+        self.buffer = None
 
 
 # like the above. currently unused
@@ -65,6 +80,16 @@ class CLIArgParser(object):
         parser.add_argument("--run", action='store_true', help="runs the start function", default=False)
         parser.add_argument("--metric", action='store_true', help="print metrics", default=False)
         parser.add_argument("--gas", action='store_true', help="print gas usage", default=False)
+        parser.add_argument("--gas-limit", type=int, help="the most gas --run may use before it traps")
+        parser.add_argument("--gas-schedule", type=str, help="the json gas schedule file to charge gas by")
+        parser.add_argument("--mmap", action='store_true', help="memory-map the wasm object files instead of reading them", default=False)
+        parser.add_argument("--lazy", action='store_true', help="disassemble function bodies the first time they are used", default=False)
+        parser.add_argument("--cache", type=str, nargs='?', const='./.wasmcache', help="cache parsed modules in this directory(./.wasmcache by default). turns off --lazy since every function body is decoded before a module is cached")
+        parser.add_argument("--cachesize", type=int, help="the size limit of the module cache in MiB", default=64)
+        parser.add_argument("--cachestats", action='store_true', help="print module cache statistics", default=False)
+        parser.add_argument("--stream", action='store_true', help="parse the --wasm objects section by section as they are read. a path of - reads the object from stdin", default=False)
+        parser.add_argument("--batch", action='store_true', help="parse, validate and instantiate the --wasm objects in parallel and print a summary", default=False)
+        parser.add_argument("--jobs", type=int, help="the number of worker processes for --batch(the core count by default)")
 
         self.args = parser.parse_args()
 
@@ -108,10 +133,41 @@ class CLIArgParser(object):
     def getGas(self):
         return self.args.gas
 
+    def getGasLimit(self):
+        return self.args.gas_limit
+
+    def getGasSchedule(self):
+        return self.args.gas_schedule
+
+    def getMMAP(self):
+        return self.args.mmap
+
+    def getLazy(self):
+        return self.args.lazy
+
+    def getCache(self):
+        return self.args.cache
+
+    def getCacheSize(self):
+        return self.args.cachesize
+
+    def getCacheStats(self):
+        return self.args.cachestats
+
+    def getStream(self):
+        return self.args.stream
+
+    def getBatch(self):
+        return self.args.batch
+
+    def getJobs(self):
+        return self.args.jobs
+
     def getParseFlags(self):
         return(ParseFlags(self.args.wast, self.args.wasm, self.args.asb, self.args.dis,
                           self.args.o, self.args.dbg, self.args.unval, self.args.memdump,
-                          self.args.idxspc, self.args.run, self.args.metric, self.args.gas))
+                          self.args.idxspc, self.args.run, self.args.metric, self.args.gas,
+                          self.args.mmap, self.args.lazy))
 
 
 # this class is responsible for reading the wasm text file- the first part of
@@ -473,626 +529,580 @@ class WASM_CodeEmitter(object):
 
 
 # reads a wasm-obj file, returns a parsedstruct that holds all the sections'
-# bytecode, their section type and their length
-def ReadWASM(file_path, endianness, is_extended_isa, dbg):
-    temp_obj_file = []
-    wasm_file = open(file_path, "rb")
+# bytecode, their section type and their length. the file is read in one go,
+# or memory-mapped if use_mmap is set, and the section payloads are memoryview
+# slices of that buffer so nothing gets copied.
+def ReadWASM(file_path, endianness, is_extended_isa, dbg, use_mmap=False):
+    return(ReadWASMBuffer(LoadWASM(file_path, use_mmap), endianness))
+
+
+# returns the contents of a wasm-obj file, either as bytes or as a read-only
+# mmap if use_mmap is set.
+def LoadWASM(file_path, use_mmap=False):
+    with open(file_path, "rb") as wasm_file:
+        # @DEVI-an empty file can't be mapped. it fails the magic check below
+        # either way.
+        if use_mmap and os.fstat(wasm_file.fileno()).st_size > 0:
+            # @DEVI-the mmap outlives the file object. the memoryviews we hand
+            # out keep it alive for as long as the module needs them.
+            return(mmap.mmap(wasm_file.fileno(), 0, access=mmap.ACCESS_READ))
+        return(wasm_file.read())
+
+
+# same as ReadWASM but for a buffer that LoadWASM returned.
+def ReadWASMBuffer(buffer, endianness):
     parsedstruct = ParsedStruct()
     # read the magic cookie
-    byte = wasm_file.read(WASM_OP_Code.uint32)
+    byte = buffer[0:WASM_OP_Code.uint32]
     if byte != WASM_OP_Code.magic_number.to_bytes(
             WASM_OP_Code.uint32, byteorder=endianness, signed=False):
         raise Exception("bad magic cookie")
 
     # read the version number
-    byte = wasm_file.read(WASM_OP_Code.uint32)
+    byte = buffer[WASM_OP_Code.uint32:2 * WASM_OP_Code.uint32]
     if byte != WASM_OP_Code.version_number.to_bytes(
             WASM_OP_Code.uint32, byteorder=endianness, signed=False):
         raise Exception("bad version number")
     else:
         parsedstruct.version_number = byte
 
-    while True:
-        byte = wasm_file.read(1)
-        if byte != b'':
-            temp_obj_file.append(int.from_bytes(byte, byteorder='big', signed=False))
-        else:
-            break
-
-    offset = 0
-    loop = True
-    while loop:
-        try:
-            section_id, offset, dummy = Read(temp_obj_file, offset, 'varuint7')
-        except IndexError:
-            break
+    parsedstruct.buffer = buffer
+    obj_file = memoryview(buffer)[2 * WASM_OP_Code.uint32:]
 
-        payload_length, offset, dummy = Read(temp_obj_file, offset, 'varuint32')
+    cursor = ByteCursor(obj_file)
+    last_section_id = 0
+    while cursor.offset < len(obj_file):
+        section_id = cursor.varuint7()
+        payload_length = cursor.varuint32()
+        payload_end = cursor.offset + payload_length
 
+        name = ''
         if section_id == 0:
-            is_custom_section = True
-            name_len, offset, dummy = Read(temp_obj_file, offset, 'varuint32')
-            name = temp_obj_file[offset : offset + name_len]
-            offset += name_len
-        else:
-            is_custom_section = False
-            name_len = 0
-            name = ''
-            dummy = 0
+            name = cursor.name()
 
-        payload_data = temp_obj_file[offset:offset + payload_length - name_len - dummy]
-        offset += payload_length - name_len - dummy
+        payload_data = cursor.bytes(payload_end - cursor.offset)
 
-        # @DEVI-the second field is for general use. it is unused right
-        # now so we are filling it with jojo.
-        parsedstruct.section_list.append([section_id, 'jojo',
-                                            payload_length,
-                                            is_custom_section,
-                                            name_len, name,
-                                            payload_data])
+        last_section_id = AddSection(parsedstruct, last_section_id, section_id,
+                                     payload_length, name, payload_data)
 
     # prints out the sections in the wasm object
     # for section in parsedstruct.section_list:
         # print(section)
-    wasm_file.close()
     return(parsedstruct)
 
 
+# records a section in the parsedstruct. returns the id of the last
+# non-custom section, which is what the next section's order is checked
+# against.
+def AddSection(parsedstruct, last_section_id, section_id, payload_length, name, payload_data):
+    is_custom_section = section_id == 0
+    # @DEVI-the second field is for general use. it is unused right
+    # now so we are filling it with jojo.
+    parsedstruct.section_list.append([section_id, 'jojo',
+                                      payload_length,
+                                      is_custom_section,
+                                      len(name), name,
+                                      payload_data])
+
+    # custom sections can go anywhere, the rest have to show up at most
+    # once and in the order of their ids
+    if is_custom_section:
+        parsedstruct.custom_sections.append(
+            (bytes(name).decode('utf-8', 'replace'), payload_data))
+    elif section_id in parsedstruct.section_dir:
+        raise Exception(Colors.red + "duplicate section: " +
+                        repr(section_id) + Colors.ENDC)
+    elif section_id < last_section_id:
+        raise Exception(Colors.red + "section " + repr(section_id) +
+                        " is out of order. it comes after section " +
+                        repr(last_section_id) + Colors.ENDC)
+    elif section_id > 11:
+        raise Exception(Colors.red + "unknown section id: " +
+                        repr(section_id) + Colors.ENDC)
+    else:
+        parsedstruct.section_dir[section_id] = payload_data
+        last_section_id = section_id
+    return(last_section_id)
+
+
+# the immediate decoders for the decode table. each one takes a ByteCursor
+# sitting on the first immediate and the ByteCursor readers for the immediate
+# kinds of the opcode. they return the immediates as a tuple of native values.
+def DecodeNoImmediate(cursor, readers):
+    return ()
+
+
+def DecodeImmediate(cursor, reader):
+    return (reader(cursor),)
+
+
+def DecodeImmediates(cursor, readers):
+    return tuple([reader(cursor) for reader in readers])
+
+
+# br_table has special immediates. a target count, the targets themselves and
+# the default target. the targets are returned as a tuple of their own.
+def DecodeBrTable(cursor, readers):
+    target_count = readers[0](cursor)
+    targets = tuple([readers[1](cursor) for target_table in range(0, target_count)])
+    return (targets, readers[2](cursor))
+
+
+# f32.const and f64.const carry the raw little-endian bits of the float
+def DecodeFloat32(cursor, reader):
+    return (cursor.f32(),)
+
+
+def DecodeFloat64(cursor, reader):
+    return (cursor.f64(),)
+
+
+# the ByteCursor reader for every immediate kind that shows up in all_ops
+Immediate_Readers = {'varuint1': ByteCursor.varuint1, 'varuint7': ByteCursor.varuint7,
+                     'varuint32': ByteCursor.varuint32, 'varint32': ByteCursor.varint32,
+                     'varint64': ByteCursor.varint64, 'uint32': ByteCursor.u32,
+                     'uint64': ByteCursor.u64}
+
+
+# builds the 256-entry decode table out of WASM_OP_Code.all_ops. the table is
+# indexed by the raw opcode byte and every entry holds the mnemonic, the opcode
+# as an int, whether it has immediates, the readers for the immediate kinds and
+# the immediate decoder. slots that are not valid opcodes are None.
+def BuildDecodeTable():
+    table = [None] * 256
+    for op_code in WASM_OP_Code.all_ops:
+        opcodeint = int(op_code[1], 16)
+        # the type encodings at the head of all_ops share their bytes with
+        # real opcodes(0x7f is both i32 and i64.div_s). the instructions come
+        # after them in the list so they get to keep the slot.
+        if not op_code[2]:
+            handler = DecodeNoImmediate
+            readers = None
+        elif opcodeint == 0x0e:
+            handler = DecodeBrTable
+            readers = tuple([Immediate_Readers[kind] for kind in op_code[3]])
+        elif opcodeint == 0x43:
+            handler = DecodeFloat32
+            readers = None
+        elif opcodeint == 0x44:
+            handler = DecodeFloat64
+            readers = None
+        elif isinstance(op_code[3], tuple):
+            handler = DecodeImmediates
+            readers = tuple([Immediate_Readers[kind] for kind in op_code[3]])
+        else:
+            handler = DecodeImmediate
+            readers = Immediate_Readers[op_code[3]]
+        table[opcodeint] = (op_code[0], opcodeint, op_code[2], readers, handler)
+    return(table)
+
+
+Decode_Table = BuildDecodeTable()
+
+
+# the Module attribute and the ObjReader method for every known section id
+Section_Readers = {1: ('type_section', 'ReadTypeSection'),
+                   2: ('import_section', 'ReadImportSection'),
+                   3: ('function_section', 'ReadFunctionSection'),
+                   4: ('table_section', 'ReadTableSection'),
+                   5: ('memory_section', 'ReadMemorySection'),
+                   6: ('global_section', 'ReadGlobalSection'),
+                   7: ('export_section', 'ReadExportSection'),
+                   8: ('start_section', 'ReadStartSection'),
+                   9: ('element_section', 'ReadElementSection'),
+                   10: ('code_section', 'ReadCodeSection'),
+                   11: ('data_section', 'ReadDataSection')}
+
+
 # Receives a parsedstruct returned from ReadWASM, parses all the sections and
 # fills up a module class. the parse method, then can return the module.
 # the returned class objects are all defined in section_structs.py.
 class ObjReader(object):
-    def __init__(self, parsedstruct):
+    def __init__(self, parsedstruct, lazy=False, validate=True):
         self.parsedstruct = parsedstruct
-
-    # we use this method to read the operands of instructions. it's only
-    # called by ReadCodeSection
-    def Disassemble(self, section_byte, offset):
-        matched = False
-        read_bytes = 0
-        read_bytes_temp = 0
-        read_bytes_temp_iter = 0
-        instruction = str()
-        temp_wasm_ins = WASM_Ins()
-
+        self.lazy = lazy
+        self.validate = validate
+        self.code_section = None
+        # the module parse is filling in
+        self.module = None
+        self.validation_context = None
+
+    # decodes the instruction under the cursor. returns whether the opcode
+    # was matched, the opcode as an int and its immediates.
+    def Disassemble(self, cursor):
         # @DEVI-FIXME-for v1.0 opcodes. needs to get fixed for extended
         # op-codes. ideally the mosule should hold its version number so we can
         # check it here.
-        byte = format(section_byte[6][offset], '02x')
-        offset += 1
-        read_bytes += 1
-
-        for op_code in WASM_OP_Code.all_ops:
-            if op_code[1] == byte:
-                matched = True
-
-                # br_table has special immediates
-                # @DEVI-FIXME-this is costing us quite dearly for every opcode
-                # we read(at least two ticks per opcode). I could have the
-                # br_table opcode done separately but kinda hurts the codes
-                # uniformity. anyways.
-                if op_code[1] == '0e':
-                    matched = True
-                    temp, offset, read_bytes_temp_iter = Read(
-                        section_byte[6], offset, op_code[3][0])
-                    instruction += repr(temp) + ' '
-                    read_bytes_temp += read_bytes_temp_iter
-                    for target_table in range(0, temp):
-                        temp, offset, read_bytes_temp_iter = Read(section_byte[6], offset, op_code[3][1])
-                        read_bytes_temp += read_bytes_temp_iter
-                        instruction += repr(temp) + ' '
-                    temp, offset, read_bytes_temp_iter = Read(
-                        section_byte[6], offset, op_code[3][2])
-                    instruction += repr(temp) + ' '
-                    read_bytes_temp += read_bytes_temp_iter
-                elif op_code[2]:
-                    if isinstance(op_code[3], tuple):
-                        for i in range(0, len(op_code [3])):
-                            temp, offset, read_bytes_temp_iter = Read(
-                                section_byte[6], offset, op_code[3][i])
-                            read_bytes_temp += read_bytes_temp_iter
-                            instruction += repr(temp) + ' '
-                    else:
-                        temp, offset, read_bytes_temp = Read(
-                            section_byte[6], offset, op_code[3])
-                        instruction += repr(temp)
-
-                temp_wasm_ins.opcode = op_code[0]
-                temp_wasm_ins.opcodeint = int(byte, 16)
-                temp_wasm_ins.operands = instruction
-                instruction = str()
-                break
-
-        read_bytes += read_bytes_temp
-        return offset, matched, read_bytes, temp_wasm_ins
+        byte = cursor.u8()
+
+        op_code = Decode_Table[byte]
+        if op_code is None:
+            return False, byte, ()
+
+        return True, byte, op_code[4](cursor, op_code[3])
+
+    # disassembles the instructions of a function body that sit between
+    # offset and end in the code section into a Code_Store. if a validator is
+    # given every instruction goes through it as it is decoded.
+    def DisassembleBody(self, code_section, offset, end, validator=None):
+        code = Code_Store()
+        cursor = ByteCursor(code_section, offset)
+        while cursor.offset < end:
+            matched, opcodeint, immediates = self.Disassemble(cursor)
+            if validator is not None and matched:
+                validator.step(len(code), opcodeint, immediates)
+
+            if not matched:
+                print(Colors.red + 'did not match anything' + Colors.ENDC)
+                print(Colors.red + 'code section offset: ' + repr(cursor.offset) + Colors.ENDC)
+                print(Colors.red + 'wasm ins: ' + format(opcodeint, '02x') + Colors.ENDC)
+
+                for iter in code:
+                    print(iter.opcode)
+                    print(iter.operands)
+                sys.exit(1)
+            else:
+                code.append(opcodeint, immediates)
+        return(code)
+
+    # the decoder lazy function bodies are given. called the first time the
+    # body's code is accessed.
+    def DisassembleLazyBody(self, func_body):
+        validator = self.getValidator(func_body)
+        code = self.DisassembleBody(self.code_section, func_body.code_offset,
+                                    func_body.code_offset + func_body.code_size, validator)
+        self.finishBody(func_body, code, validator)
+        return(code)
+
+    # records what the validator found and builds the side table of a body
+    # that passed
+    def finishBody(self, func_body, code, validator):
+        if validator is None:
+            return
+        validator.finish(func_body)
+        if func_body.validation_error is None:
+            func_body.side_table = BuildSideTable(func_body, code)
+
+    # the validation context is built out of the sections in front of the
+    # code section. if we are not parsing a whole module they are read here.
+    def getValidationContext(self):
+        if self.validation_context is None:
+            module = self.module
+            if module is None:
+                module = Module(self.ReadTypeSection(), self.ReadImportSection(),
+                                self.ReadFunctionSection(), self.ReadTableSection(),
+                                self.ReadMemorySection(), self.ReadGlobalSection(),
+                                None, None, None, None, None)
+            self.validation_context = Validation_Context(
+                module.type_section, module.import_section, module.function_section,
+                module.table_section, module.memory_section, module.global_section)
+        return(self.validation_context)
+
+    def getValidator(self, func_body):
+        if not self.validate:
+            return None
+        return(CodeValidator(self.getValidationContext(), func_body.type_index,
+                             func_body.locals))
 
-    # parses the code section. returns a Code_Section class
+    # parses the code section. returns a Code_Section class. in lazy mode the
+    # section is only scanned for the bodies' offsets, sizes and locals and
+    # each body is disassembled the first time its code is accessed.
     def ReadCodeSection(self):
-        offset = 0
         CS = Code_Section()
-        temp_func_bodies = Func_Body()
-        temp_local_entry = Local_Entry()
-        section_exists = False
-        for whatever in self.parsedstruct.section_list:
-            # 10 is the code section
-            if whatever[0] == 10:
-                code_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        code_section = self.parsedstruct.section_dir.get(10)
+        if code_section is None:
             return None
+        self.code_section = code_section
+        cursor = ByteCursor(code_section)
 
-        fn_cn, offset, dummy = Read(code_section[6], offset, 'varuint32')
-        function_cnt = fn_cn
+        function_cnt = cursor.varuint32()
         CS.count = function_cnt
+        context = self.getValidationContext()
+        defined_types = context.functions[context.imported_funcs:]
 
         while function_cnt > 0:
-            function_body_length, offset, dummy = Read(code_section[6], offset, 'varuint32')
-            temp_func_bodies.body_size = function_body_length
-
-            local_count, offset, dummy = Read(code_section[6], offset, 'varuint32')
-            temp_func_bodies.local_count = local_count
-
-            # local_count_size will eventually hold how many bytes we will read
-            # in total because of the local section
-            local_count_size = dummy
-            if local_count != 0:
-                for i in range(0, local_count):
-                    partial_local_count, offset, dummy = Read(code_section[6], offset, 'varuint32')
-                    local_count_size += dummy
-                    partial_local_type, offset, dummy = Read(code_section[6], offset, 'uint8')
-                    local_count_size += dummy
-                    temp_local_entry.count = partial_local_count
-                    temp_local_entry.type = partial_local_type
-                    temp_func_bodies.locals.append(deepcopy(temp_local_entry))
-                    local_count -= partial_local_count
+            func_body = Func_Body()
+            if len(CS.func_bodies) < len(defined_types):
+                func_body.type_index = defined_types[len(CS.func_bodies)]
+            function_body_length = cursor.varuint32()
+            func_body.body_size = function_body_length
+            body_end = cursor.offset + function_body_length
+
+            local_count = cursor.varuint32()
+            func_body.local_count = local_count
+
+            for i in range(0, local_count):
+                local_entry = Local_Entry()
+                local_entry.count = cursor.varuint32()
+                local_entry.type = cursor.u8()
+                func_body.locals.append(local_entry)
+
+            func_body.code_offset = cursor.offset
+            func_body.code_size = body_end - cursor.offset
+            if self.lazy:
+                func_body.decoder = self.DisassembleLazyBody
             else:
-                pass
-
-            read_bytes_so_far = local_count_size
-            for i in range(0, function_body_length - local_count_size):
-                offset, matched, read_bytes, temp_wasm_ins = self.Disassemble(
-                    code_section, offset)
-                temp_func_bodies.code.append(deepcopy(temp_wasm_ins))
-
-                if not matched:
-                    print(Colors.red + 'did not match anything' + Colors.ENDC)
-                    print(Colors.red + 'code section offset: ' + repr(offset) + Colors.ENDC)
-                    print(Colors.red + 'read bytes: ' + repr(read_bytes) + Colors.ENDC)
-                    print(Colors.red + 'wasm ins: ' + repr(temp_wasm_ins.opcode) + Colors.ENDC)
-
-                    for iter in temp_func_bodies.code:
-                        print(iter.opcode)
-                        print(iter.operands)
-                    sys.exit(1)
-                else:
-                    pass
-                matched = False
-                read_bytes_so_far += read_bytes
-                if read_bytes_so_far == function_body_length:
-                    break
+                validator = self.getValidator(func_body)
+                func_body.code = self.DisassembleBody(code_section, cursor.offset, body_end,
+                                                      validator)
+                self.finishBody(func_body, func_body.code, validator)
+            CS.func_bodies.append(func_body)
+            cursor.offset = body_end
 
-            CS.func_bodies.append(deepcopy(temp_func_bodies))
-            temp_func_bodies.locals = []
-            temp_func_bodies.code = []
             function_cnt -= 1
         return(CS)
 
+    # reads an MVP init-expr, which is a single constant or get_global
+    # followed by an end, and returns its bytes including the end
+    def ReadInitExpr(self, cursor):
+        start = cursor.offset
+        opcode = cursor.u8()
+        if opcode == 0x41:
+            cursor.varint32()
+        elif opcode == 0x42:
+            cursor.varint64()
+        elif opcode == 0x43:
+            cursor.u32()
+        elif opcode == 0x44:
+            cursor.u64()
+        elif opcode == 0x23:
+            cursor.varuint32()
+        # @DEVI-FIXME-this only works for none extended opcodes
+        while opcode != 0x0b:
+            opcode = cursor.u8()
+        return list(cursor.buffer[start:cursor.offset])
+
     # parsed the data section. returns a Data_Section class
     def ReadDataSection(self):
-        loop = True
-        section_exists = False
-        offset = 0
         DS = Data_Section()
-        temp_data_segment = Data_Segment()
-        init_expr = []
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 11:
-                data_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        data_section = self.parsedstruct.section_dir.get(11)
+        if data_section is None:
             return None
+        cursor = ByteCursor(data_section)
 
-        data_entry_count, offset, dummy = Read(data_section[6], offset, 'varuint32')
+        data_entry_count = cursor.varuint32()
         DS.count = data_entry_count
 
         while data_entry_count != 0:
-            linear_memory_index, offset, dummy = Read(data_section[6], offset, 'varuint32')
-            temp_data_segment.index = linear_memory_index
-
-            # reading in the init-expr
-            while loop:
-                # @DEVI-FIXME-this only works for none extended opcodes
-                if data_section[6][offset] == 0x0b:
-                    loop = False
-                data_char, offset, dummy = Read(data_section[6], offset, 'uint8')
-                init_expr.append(data_char)
+            data_segment = Data_Segment()
+            data_segment.index = cursor.varuint32()
+            data_segment.offset = self.ReadInitExpr(cursor)
 
-            temp_data_segment.offset = init_expr
+            data_entry_length = cursor.varuint32()
+            data_segment.size = data_entry_length
 
-            data_entry_length, offset, dummy = Read(data_section[6], offset, 'varuint32')
-            temp_data_segment.size = data_entry_length
-
-            data_itself = data_section[6][offset:offset + data_entry_length]
-            temp_data_segment.data = data_itself
-            offset += data_entry_length
-
-            DS.data_segments.append(deepcopy(temp_data_segment))
+            # a view into the module buffer, nothing gets copied
+            data_segment.data = cursor.bytes(data_entry_length)
 
+            DS.data_segments.append(data_segment)
             data_entry_count -= 1
-            init_expr = []
-            loop = True
         return(DS)
 
+    # reads the flags, initial and maximum of a resizable limit
+    def ReadResizableLimits(self, cursor):
+        rsz_limits = Resizable_Limits()
+        rsz_limits.flags = cursor.varuint1()
+        rsz_limits.initial = cursor.varuint32()
+        if rsz_limits.flags:
+            rsz_limits.maximum = cursor.varuint32()
+        return rsz_limits
+
     # parses the import section. returns an Import_Section class
     def ReadImportSection(self):
-        offset = 0
-        section_exists = False
-        module_name = []
-        field_name = []
         IS = Import_Section()
-        temp_import_entry = Import_Entry()
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 2:
-                import_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        import_section = self.parsedstruct.section_dir.get(2)
+        if import_section is None:
             return None
+        cursor = ByteCursor(import_section)
 
-        import_cnt, offset, dummy = Read(import_section[6], offset, 'varuint32')
+        import_cnt = cursor.varuint32()
         IS.count = import_cnt
 
         while import_cnt != 0:
-            module_length, offset, dummy = Read(import_section[6], offset, 'varuint32')
-            temp_import_entry.module_len = module_length
-
-            for i in range(0, module_length):
-                module_name.append(import_section[6][offset + i])
-            temp_import_entry.module_str = module_name
-            offset += module_length
-
-            field_length, offset, dummy = Read(import_section[6], offset, 'varuint32')
-            temp_import_entry.field_len = field_length
-            for i in range(0, field_length):
-                field_name.append(import_section[6][offset + i])
-            temp_import_entry.field_str = field_name
-            offset += field_length
+            import_entry = Import_Entry()
+            import_entry.module_str = list(cursor.name())
+            import_entry.module_len = len(import_entry.module_str)
+            import_entry.field_str = list(cursor.name())
+            import_entry.field_len = len(import_entry.field_str)
 
-            kind, offset, dummy = Read(import_section[6], offset, 'uint8')
-            temp_import_entry.kind = kind
+            kind = cursor.u8()
+            import_entry.kind = kind
 
             # function type
             if kind == 0:
-                import_type, offset, dummy = Read(import_section[6], offset, 'varuint32')
-                temp_import_entry.type = import_type
+                import_entry.type = cursor.varuint32()
             # table type
             elif kind == 1:
                 table_type = Table_Type()
-                table_type.elemet_type, offset, dummy = Read(import_section[6], offset, 'varint7')
-                rsz_limits = Resizable_Limits()
-                rsz_limits.flags, offset, dummy = Read(import_section[6], offset, 'varuint1')
-                rsz_limits.initial, offset, dummy = Read(import_section[6], offset, 'varuint32')
-                if rsz_limits.flags:
-                    rsz_limits.maximum, offset, dummy = Read(import_section[6], offset, 'varuint32')
-                table_type.limit = rsz_limits
-                temp_import_entry.type = table_type
+                table_type.element_type = cursor.varint7()
+                table_type.limit = self.ReadResizableLimits(cursor)
+                import_entry.type = table_type
             elif kind == 2:
                 memory_type = Memory_Type()
-                rsz_limits = Resizable_Limits()
-                rsz_limits.flags, offset, dummy = Read(import_section[6], offset, 'varuint1')
-                rsz_limits.initial, offset, dummy = Read(import_section[6], offset, 'varuint32')
-                if rsz_limits.flags:
-                    rsz_limits.maximum, offset, dummy = Read(import_section[6], offset, 'varuint32')
-                memory_type.limits = rsz_limits
-                temp_import_entry.type = memory_type
+                memory_type.limits = self.ReadResizableLimits(cursor)
+                import_entry.type = memory_type
             elif kind == 3:
                 global_type = Global_Type()
-                global_type.content_type, offset, dummy = Read(import_section[6], offset, 'uint8')
-                global_type.mutability, offset, dummy = Read(import_section[6], offset, 'varuint1')
-                temp_import_entry.type = global_type
-
-            IS.import_entry.append(deepcopy(temp_import_entry))
+                global_type.content_type = cursor.u8()
+                global_type.mutability = cursor.varuint1()
+                import_entry.type = global_type
 
+            IS.import_entry.append(import_entry)
             import_cnt -= 1
-            module_name = []
-            field_name = []
         return(IS)
 
     # parses the export section, returns an Export_Section class
     def ReadExportSection(self):
-        offset = 0
-        section_exists = False
-        field_name = []
         ES = Export_Section()
-        temp_export_entry = Export_Entry()
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 7:
-                export_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        export_section = self.parsedstruct.section_dir.get(7)
+        if export_section is None:
             return None
+        cursor = ByteCursor(export_section)
 
-        export_entry_cnt, offset, dummy = Read(export_section[6], offset, 'varuint32')
+        export_entry_cnt = cursor.varuint32()
         ES.count = export_entry_cnt
 
         while export_entry_cnt != 0:
-            field_length, offset, dummy = Read(export_section[6], offset, 'varuint32')
-            temp_export_entry.field_len = field_length
-
-            for i in range(0, field_length):
-                field_name.append(export_section[6][offset + i])
-            temp_export_entry.fiels_str = field_name
-            offset += field_length
-
-            kind, offset, dummy = Read(export_section[6], offset, 'uint8')
-            temp_export_entry.kind = kind
-
-            index, offset, dummy = Read(export_section[6], offset, 'varuint32')
-            temp_export_entry.index = index
-
-            ES.export_entries.append(deepcopy(temp_export_entry))
+            export_entry = Export_Entry()
+            export_entry.field_str = list(cursor.name())
+            export_entry.field_len = len(export_entry.field_str)
+            export_entry.kind = cursor.u8()
+            export_entry.index = cursor.varuint32()
 
+            ES.export_entries.append(export_entry)
             export_entry_cnt -= 1
-            field_name = []
         return(ES)
 
     # parses the type section, returns a Type_Section class
     def ReadTypeSection(self):
-        offset = 0
-        section_exists = False
-        param_list = []
-        return_list = []
         TS = Type_Section()
-        temp_func_type = Func_Type()
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 1:
-                type_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        type_section = self.parsedstruct.section_dir.get(1)
+        if type_section is None:
             return None
+        cursor = ByteCursor(type_section)
 
-        type_entry_count, offset, dummy = Read(type_section[6], offset, 'varuint32')
+        type_entry_count = cursor.varuint32()
         TS.count = type_entry_count
 
         while type_entry_count != 0:
-            form, offset, dummy = Read(type_section[6], offset, 'varint7')
-            temp_func_type.form = form
-
-            param_count, offset, dummy = Read(type_section[6], offset, 'varuint32')
-            temp_func_type.param_cnt = param_count
+            func_type = Func_Type()
+            func_type.form = cursor.varint7()
 
-            for i in range(0, param_count):
-                param_list.append(type_section[6][offset + i])
-            temp_func_type.param_types = param_list
-            offset += param_count
+            param_count = cursor.varuint32()
+            func_type.param_cnt = param_count
+            func_type.param_types = list(cursor.bytes(param_count))
 
             # @DEVI-FIXME- only works for MVP || single return value
-            return_count, offset, dummy = Read(type_section[6], offset, 'varuint1')
-            temp_func_type.return_cnt = return_count
-
-            for i in range(0, return_count):
-                return_list.append(type_section[6][offset + i])
-            temp_func_type.return_type = return_list
-            offset += return_count
-
-            TS.func_types.append(deepcopy(temp_func_type))
+            return_count = cursor.varuint1()
+            func_type.return_cnt = return_count
+            func_type.return_type = list(cursor.bytes(return_count))
 
+            TS.func_types.append(func_type)
             type_entry_count -= 1
-            param_list = []
-            return_list = []
         return(TS)
 
     # parses the function section, returns a Function_section class
     def ReadFunctionSection(self):
-        offset = 0
-        section_exists = False
-        index_to_type = []
         FS = Function_Section()
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 3:
-                function_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        function_section = self.parsedstruct.section_dir.get(3)
+        if function_section is None:
             return None
+        cursor = ByteCursor(function_section)
 
-        function_entry_count, offset, dummy = Read(function_section[6], offset, 'varuint32')
+        function_entry_count = cursor.varuint32()
         FS.count = function_entry_count
-
-        for i in range(0, function_entry_count):
-            index, offset, dummy = Read(function_section[6], offset, 'varuint32')
-            index_to_type.append(index)
-        FS.type_section_index = index_to_type
-        offset += function_entry_count
+        FS.type_section_index = [cursor.varuint32() for i in range(0, function_entry_count)]
         return(FS)
 
     # parses the element secction, returns an Element_Section class
     def ReadElementSection(self):
-        offset = 0
-        section_exists = False
-        init_expr = []
-        loop = True
-        function_indices = []
         ES = Element_Section()
-        temp_elem_segment = Elem_Segment()
-
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 9:
-                element_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        element_section = self.parsedstruct.section_dir.get(9)
+        if element_section is None:
             return None
+        cursor = ByteCursor(element_section)
 
-        element_entry_count, offset, dummy = Read(element_section[6], offset, 'varuint32')
+        element_entry_count = cursor.varuint32()
         ES.count = element_entry_count
 
         while element_entry_count != 0:
-            table_index, offset, dummy = Read(element_section[6], offset, 'varuint32')
-            temp_elem_segment.index = table_index
-
-            # @DEVI-FIXME-only works for non-extneded opcodes
-            while loop:
-                if element_section[6][offset] == 0x0b:
-                    loop = False
-                init_expr.append(element_section[6][offset])
-                offset += 1
-            temp_elem_segment.offset = init_expr
-
-            num_elements, offset, dummy = Read(element_section[6], offset, 'varuint32')
-            temp_elem_segment.num_elem = num_elements
-
-            for i in range(0, num_elements):
-                index, offset, dummy = Read(element_section[6], offset, 'varuint32')
-                function_indices.append(index)
-            temp_elem_segment.elems = function_indices
-            offset += num_elements
-
-            ES.elem_segments.append(deepcopy(temp_elem_segment))
-
-            loop = True
-            init_expr = []
-            function_indices = []
+            elem_segment = Elem_Segment()
+            elem_segment.index = cursor.varuint32()
+            elem_segment.offset = self.ReadInitExpr(cursor)
+
+            num_elements = cursor.varuint32()
+            elem_segment.num_elem = num_elements
+            elem_segment.elems = [cursor.varuint32() for i in range(0, num_elements)]
+
+            ES.elem_segments.append(elem_segment)
             element_entry_count -= 1
         return(ES)
 
     # parses the memory section, returns a Memory_Section class
     def ReadMemorySection(self):
-        offset = 0
-        section_exists = False
         MS = Memory_Section()
-        temp_rsz_limits = Resizable_Limits()
-
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 5:
-                memory_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        memory_section = self.parsedstruct.section_dir.get(5)
+        if memory_section is None:
             return None
+        cursor = ByteCursor(memory_section)
 
-        num_linear_mems, offset, dummy = Read(memory_section[6], offset, 'varuint32')
+        num_linear_mems = cursor.varuint32()
         MS.count = num_linear_mems
 
         while num_linear_mems != 0:
-            flag, offset, dummy = Read(memory_section[6], offset, 'varuint1')
-            temp_rsz_limits.flags = flag
-
-            initial,offset, dummy = Read(memory_section[6], offset, 'varuint32')
-            temp_rsz_limits.initial = initial
-
-            if flag:
-                maximum, offset, dummy = Read(memory_section[6], offset, 'varuint32')
-                temp_rsz_limits.maximum = maximum
-
-            MS.memory_types.append(deepcopy(temp_rsz_limits))
+            MS.memory_types.append(self.ReadResizableLimits(cursor))
             num_linear_mems -= 1
         return(MS)
 
     # parses the table section, returns a Table_Section class
     def ReadTableSection(self):
-        offset = 0
-        section_exists = False
         TS = Table_Section()
-        temp_table_type = Table_Type()
-        temp_rsz_limits = Resizable_Limits()
-
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 4:
-                table_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        table_section = self.parsedstruct.section_dir.get(4)
+        if table_section is None:
             return None
+        cursor = ByteCursor(table_section)
 
-        table_count, offset, dummy = Read(table_section[6], offset, 'varuint32')
+        table_count = cursor.varuint32()
         TS.count = table_count
 
         while table_count != 0:
-            element_type, offset, dummy = Read(table_section[6], offset, 'varint7')
-            temp_table_type.element_type = element_type
-
-            flag, offset, dummy = Read(table_section[6], offset, 'varuint1')
-            temp_rsz_limits.flags = flag
-
-            initial, offset, dummy = Read(table_section[6], offset, 'varuint32')
-            temp_rsz_limits.initial = initial
-
-            if flag:
-                maximum, offset, dummy = Read(table_section[6], offset, 'varuint32')
-                temp_rsz_limits.maximum = maximum
-
-            temp_table_type.limit = temp_rsz_limits
-            TS.table_types.append(deepcopy(temp_table_type))
-
+            table_type = Table_Type()
+            table_type.element_type = cursor.varint7()
+            table_type.limit = self.ReadResizableLimits(cursor)
+            TS.table_types.append(table_type)
             table_count -= 1
         return(TS)
 
     # parses the global section, returns a Global_Section class
     def ReadGlobalSection(self):
-        offset = 0
-        loop = True
-        section_exists = False
-        init_expr = []
         GS = Global_Section()
-        temp_gl_var = Global_Variable()
-        temp_gl_type = Global_Type()
-
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 6:
-                global_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        global_section = self.parsedstruct.section_dir.get(6)
+        if global_section is None:
             return None
+        cursor = ByteCursor(global_section)
 
-        count, offset, dummy = Read(global_section[6], offset, 'varuint32')
+        count = cursor.varuint32()
         GS.count = count
 
         while count != 0:
-            content_type, offset, dummy = Read(global_section[6], offset, 'uint8')
-            temp_gl_type.content_type = content_type
-
-            mutability, offset, dummy = Read(global_section[6], offset, 'varuint1')
-            temp_gl_type.mutability = mutability
-
-            # @DEVI-FIXME-only works for non-extended opcodes
-            while loop:
-                if global_section[6][offset] == 0x0b:
-                    loop = False
-                init_expr.append(global_section[6][offset])
-                offset += 1
-            temp_gl_var.init_expr = init_expr
-
-            temp_gl_var.global_type = temp_gl_type
-            GS.global_variables.append(deepcopy(temp_gl_var))
-
+            global_variable = Global_Variable()
+            global_variable.global_type.content_type = cursor.u8()
+            global_variable.global_type.mutability = cursor.varuint1()
+            global_variable.init_expr = self.ReadInitExpr(cursor)
 
+            GS.global_variables.append(global_variable)
             count -= 1
-            loop = True
-            init_expr = []
         return(GS)
 
     # parses the start section, returns a Start_Section
     def ReadStartSection(self):
-        offset = 0
-        section_exists = False
         SS = Start_Section()
 
-        for whatever in self.parsedstruct.section_list:
-            if whatever[0] == 8:
-                start_section = whatever.copy()
-                section_exists = True
-
-        if not section_exists:
+        start_section = self.parsedstruct.section_dir.get(8)
+        if start_section is None:
             return None
 
-        function_index, offset, dummy = Read(start_section[6], offset, 'varuint32')
-        SS.function_section_index = function_index
+        SS.function_section_index = ByteCursor(start_section).varuint32()
         return(SS)
 
     # unused-returns the cursor location in the object file
@@ -1100,13 +1110,121 @@ class ObjReader(object):
         return(self.wasm_file.tell())
 
     # a convinience method-builds a module class and returns it
+    # the sections are read in order and the code section is validated
+    # against the ones in front of it
     def parse(self):
-        return(Module(self.ReadTypeSection(), self.ReadImportSection(),
-                      self.ReadFunctionSection(), self.ReadTableSection(),
-                      self.ReadMemorySection(), self.ReadGlobalSection(),
-                      self.ReadExportSection(), self.ReadStartSection(),
-                      self.ReadElementSection(), self.ReadCodeSection(),
-                      self.ReadDataSection()))
+        self.module = Module(None, None, None, None, None, None, None, None, None, None, None)
+        for section_id in range(1, 12):
+            attribute, reader = Section_Readers[section_id]
+            setattr(self.module, attribute, getattr(self, reader)())
+        return(self.module)
+
+
+# parses a wasm object off of a byte stream one section at a time. the stream
+# can be anything with a read method, e.g. a file, sys.stdin.buffer or a
+# socket's makefile('rb'). only one section's payload is held in memory
+# before it is parsed. if a machinestate is given, the index spaces and the
+# linear memories are set up with a TBInit before the code section's payload
+# is read and the data segments are loaded once the stream is done.
+class StreamParser(object):
+    def __init__(self, stream, lazy=False, machinestate=None):
+        self.stream = stream
+        self.parsedstruct = ParsedStruct()
+        self.reader = ObjReader(self.parsedstruct, lazy)
+        self.module = Module(None, None, None, None, None, None, None, None, None, None, None)
+        self.reader.module = self.module
+        self.init = None
+        if machinestate is not None:
+            self.init = TBInit(self.module, machinestate)
+
+    # reads exactly n bytes. pipes and sockets can come back with less than
+    # was asked for so we keep reading until we have them all.
+    def readExact(self, n):
+        buffer = bytearray(n)
+        view = memoryview(buffer)
+        got = 0
+        while got < n:
+            chunk = self.stream.read(n - got)
+            if not chunk:
+                raise Exception(Colors.red + "the stream ended " + repr(n - got) +
+                                " bytes short." + Colors.ENDC)
+            view[got:got + len(chunk)] = chunk
+            got += len(chunk)
+        return(buffer)
+
+    # reads an unsigned LEB128 value of bits bits that is at most max_bytes
+    # long. returns None if the stream ends before the first byte and
+    # at_boundary is set.
+    def readVarUInt(self, max_bytes, bits, at_boundary=False):
+        raw = bytearray()
+        while len(raw) < max_bytes:
+            byte = self.stream.read(1)
+            if not byte:
+                if at_boundary and not raw:
+                    return None
+                raise Exception(Colors.red + "the stream ended inside a LEB128 value." +
+                                Colors.ENDC)
+            raw += byte
+            if byte[0] < 0x80:
+                break
+        return(ByteCursor(raw).varuint(max_bytes, bits))
+
+    # a generator that yields (section_id, section) as soon as each section
+    # has been read and parsed. custom sections come out as (0, (name,
+    # payload)). the module gets filled in as it goes.
+    def sections(self):
+        header = self.readExact(2 * WASM_OP_Code.uint32)
+        if header[0:4] != WASM_OP_Code.magic_number.to_bytes(
+                WASM_OP_Code.uint32, byteorder='little', signed=False):
+            raise Exception("bad magic cookie")
+        if header[4:8] != WASM_OP_Code.version_number.to_bytes(
+                WASM_OP_Code.uint32, byteorder='little', signed=False):
+            raise Exception("bad version number")
+        self.parsedstruct.version_number = bytes(header[4:8])
+
+        last_section_id = 0
+        declared = False
+        while True:
+            section_id = self.readVarUInt(1, 7, True)
+            if section_id is None:
+                break
+            payload_length = self.readVarUInt(5, 32)
+
+            if section_id >= 10 and not declared:
+                self.initDeclarations()
+                declared = True
+
+            payload_data = memoryview(self.readExact(payload_length))
+            name = ''
+            if section_id == 0:
+                cursor = ByteCursor(payload_data)
+                name = cursor.name()
+                payload_data = payload_data[cursor.offset:]
+
+            last_section_id = AddSection(self.parsedstruct, last_section_id, section_id,
+                                         payload_length, name, payload_data)
+            if section_id == 0:
+                yield section_id, self.parsedstruct.custom_sections[-1]
+            else:
+                attribute, reader = Section_Readers[section_id]
+                section = getattr(self.reader, reader)()
+                setattr(self.module, attribute, section)
+                yield section_id, section
+
+        if not declared:
+            self.initDeclarations()
+        if self.init is not None:
+            self.init.LoadDataSegments()
+
+    def initDeclarations(self):
+        if self.init is not None:
+            self.init.InitDeclarations()
+
+    # reads the whole stream. returns the module.
+    def parse(self):
+        for section_id, section in self.sections():
+            pass
+        return(self.module)
 
 
 # WIP-basically how the assembler is constructed
@@ -1159,10 +1277,25 @@ class PythonInterpreter(object):
         return(self.modules)
 
     # convinience method.calls the ObjReader to parse a wasm obj file.
-    # returns a module class.
-    def parse(self, file_path):
-        parser = ObjReader(ReadWASM(file_path, 'little', False, True))
-        return(parser.parse())
+    # returns a module class. if a ModuleCache is given, a cached module is
+    # returned without parsing the object and new modules are cached along
+    # with their gas bounds. cached modules have all their bodies decoded so
+    # lazy is ignored when there is a cache.
+    def parse(self, file_path, use_mmap=False, lazy=False, cache=None):
+        # the object is read once. the cache hashes the same buffer we parse.
+        raw = LoadWASM(file_path, use_mmap)
+        if cache is not None:
+            module = cache.load(raw)
+            if module is not None:
+                return(module)
+            lazy = False
+
+        parser = ObjReader(ReadWASMBuffer(raw, 'little'), lazy)
+        module = parser.parse()
+        if cache is not None:
+            GetGasBounds(module)
+            cache.store(raw, module)
+        return(module)
 
     # dumps the object sections' info to stdout. pretty print.
     def dump_sections(self, module):
@@ -1282,7 +1415,7 @@ class PythonInterpreter(object):
                     print(Colors.blue + 'local count: ' + repr(iterer.count) + Colors.ENDC)
                     print(Colors.blue + 'local type: ' + repr(iterer.type) + Colors.ENDC)
                 for iterer in iter.code:
-                    instruction = iterer.opcode + ' ' + iterer.operands
+                    instruction = iterer.opcode + ' ' + iterer.getOperandsText()
                     print(Colors.cyan + 'opcode: ' + repr(iterer.opcode) + Colors.ENDC)
                     print(Colors.grey + 'immediate: ' + repr(iterer.operands) + Colors.ENDC)
                     print(Colors.yellow + instruction + Colors.ENDC)
@@ -1297,44 +1430,187 @@ class PythonInterpreter(object):
                 print(Colors.green + 'index: ' + repr(iter.index) + Colors.ENDC)
                 print(Colors.red + 'offset: ' + repr(iter.offset) + Colors.ENDC)
                 print(Colors.purple + 'size: ' + repr(iter.size) + Colors.ENDC)
-                print(Colors.cyan + 'data:' + repr(iter.data) + Colors.ENDC)
+                print(Colors.cyan + 'data:' + repr(list(iter.data)) + Colors.ENDC)
 
     # palceholder for the validation tests
     def runValidations(self):
         modulevalidation = ModuleValidation(self.modules[0])
         return(modulevalidation.ValidateAll())
 
+    # parses a wasm obj file with the StreamParser. a file_path of - reads
+    # stdin. returns the module and the TBInit that initialized its machine
+    # state while it was being read.
+    def parseStream(self, file_path, lazy=False):
+        if file_path == '-':
+            parser = StreamParser(sys.stdin.buffer, lazy, TBMachine())
+            return(parser.parse(), parser.init)
+        with open(file_path, 'rb') as wasm_file:
+            parser = StreamParser(wasm_file, lazy, TBMachine())
+            return(parser.parse(), parser.init)
+
+    # parses, validates and instantiates a list of wasm obj files in a pool of
+    # worker processes. returns a list of Batch_Results in the order of
+    # file_paths. the modules that passed are appended to the module list.
+    def parseBatch(self, file_paths, jobs=None, use_mmap=False, lazy=False, cache=None):
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        jobs = max(1, min(jobs, len(file_paths)))
+        cache_args = (None, None)
+        if cache is not None:
+            cache_args = (cache.cache_dir, cache.max_size)
+        job_list = [(file_path, use_mmap, lazy) + cache_args for file_path in file_paths]
+
+        if jobs == 1:
+            raw_results = [BatchWorker(job) for job in job_list]
+        else:
+            pool = multiprocessing.Pool(jobs)
+            try:
+                raw_results = pool.map(BatchWorker, job_list,
+                                       max(1, len(job_list) // (jobs * 4)))
+            finally:
+                pool.close()
+                pool.join()
+
+        results = []
+        for file_path, status, elapsed, cache_stats, payload in raw_results:
+            result = Batch_Result(file_path, status, elapsed, cache_stats[0] > 0)
+            if payload is not None:
+                result.module = UnpackModule(payload)
+                self.appendmodule(result.module)
+            if cache is not None:
+                cache.hits += cache_stats[0]
+                cache.misses += cache_stats[1]
+                cache.stores += cache_stats[2]
+                cache.evictions += cache_stats[3]
+                cache.evicted_bytes += cache_stats[4]
+            results.append(result)
+        return(results)
+
+
+# the outcome of one object in a batch. status is 'ok', 'invalid: ' and the
+# first validation error, or the error the object failed with.
+class Batch_Result():
+    def __init__(self, file_path, status, elapsed, cache_hit):
+        self.file_path = file_path
+        self.status = status
+        self.elapsed = elapsed
+        self.cache_hit = cache_hit
+        self.module = None
+
+
+# runs in the batch workers. job is (file_path, use_mmap, lazy, cache_dir,
+# cache_size). returns the file path, the status, the elapsed time, the
+# worker's cache counters and the packed module for objects that passed.
+def BatchWorker(job):
+    file_path, use_mmap, lazy, cache_dir, cache_size = job
+    begin = time.perf_counter()
+    cache = None
+    if cache_dir is not None:
+        cache = ModuleCache(cache_dir, cache_size)
+    payload = None
+    try:
+        module = PythonInterpreter().parse(file_path, use_mmap, lazy, cache)
+        modulevalidation = ModuleValidation(module)
+        if modulevalidation.ValidateAll():
+            VM([module])
+            payload = PackModule(module)
+            status = 'ok'
+        else:
+            status = 'invalid: ' + modulevalidation.errors[0]
+    # the disassembler exits on opcodes it doesn't know
+    except (Exception, SystemExit) as e:
+        status = type(e).__name__ + ': ' + str(e)
+    cache_stats = (0, 0, 0, 0, 0)
+    if cache is not None:
+        cache_stats = (cache.hits, cache.misses, cache.stores, cache.evictions,
+                       cache.evicted_bytes)
+    return(file_path, status, time.perf_counter() - begin, cache_stats, payload)
+
+
+def PrintBatchSummary(results, wall_time):
+    print(Colors.blue + Colors.BOLD + 'Batch Summary:' + Colors.ENDC)
+    cpu_time = 0
+    status_count = dict()
+    for result in results:
+        cpu_time += result.elapsed
+        if result.status == 'ok':
+            status = Colors.green + 'ok' + Colors.ENDC
+            status_count['ok'] = status_count.get('ok', 0) + 1
+        elif result.status.startswith('invalid'):
+            status = Colors.yellow + result.status + Colors.ENDC
+            status_count['invalid'] = status_count.get('invalid', 0) + 1
+        else:
+            status = Colors.red + result.status + Colors.ENDC
+            status_count['error'] = status_count.get('error', 0) + 1
+        print('%10.2f' % (result.elapsed * 1000) + ' ms ' +
+              ('(cached) ' if result.cache_hit else '') + result.file_path + ': ' + status)
+    print(repr(len(results)) + ' objects: ' +
+          ', '.join([name + ' ' + repr(status_count.get(name, 0))
+                     for name in ('ok', 'invalid', 'error')]))
+    print('wall time: ' + '%.3f' % wall_time + 's, worker time: ' + '%.3f' % cpu_time + 's')
+
 
 
 def main():
     argparser = CLIArgParser()
+    # set when a start function trapped, e.g. ran out of gas
+    trapped = False
 
     # this is essentially how we use our current interpreter. it reads in wasm
     # obj files and holds keeps the parses modules. Theb we run the validation
     # tests and initialize the WASM machine
     if argparser.getWASMPath() is not None:
         interpreter = PythonInterpreter()
-        for file_path in argparser.getWASMPath():
-            module = interpreter.parse(file_path)
-            interpreter.appendmodule(module)
-            if argparser.getDBG():
-                interpreter.dump_sections(module)
-            if interpreter.runValidations():
-                #run the interpreter
-                pass
-            else:
-                print(Colors.red + 'failed validation tests' + Colors.ENDC)
-            vm = VM(interpreter.getmodules())
-            vm.setFlags(argparser.getParseFlags())
-            ms = vm.getState()
-            if argparser.getIDXSPC():
-                DumpIndexSpaces(ms)
-            if argparser.getMEMDUMP():
-                DumpLinearMems(ms.Linear_Memory, argparser.getMEMDUMP())
-            if argparser.getRun():
-                vm.run()
-            # merklizer = Merklizer(ms.Linear_Memory[0][0:512], module)
-            # treelength, hashtree = merklizer.run()
+        cache = None
+        schedule = None
+        if argparser.getGasSchedule() is not None:
+            schedule = LoadGasSchedule(argparser.getGasSchedule())
+        if argparser.getCache() is not None:
+            cache = ModuleCache(argparser.getCache(), argparser.getCacheSize() * 1024 * 1024)
+        if argparser.getBatch():
+            begin = time.perf_counter()
+            results = interpreter.parseBatch(argparser.getWASMPath(), argparser.getJobs(),
+                                             argparser.getMMAP(), argparser.getLazy(), cache)
+            PrintBatchSummary(results, time.perf_counter() - begin)
+        else:
+            for file_path in argparser.getWASMPath():
+                init = None
+                if file_path == '-' or argparser.getStream():
+                    module, init = interpreter.parseStream(file_path, argparser.getLazy())
+                else:
+                    module = interpreter.parse(file_path, argparser.getMMAP(), argparser.getLazy(), cache)
+                interpreter.appendmodule(module)
+                if argparser.getDBG():
+                    interpreter.dump_sections(module)
+                modulevalidation = ModuleValidation(module)
+                if modulevalidation.ValidateAll():
+                    if modulevalidation.deferred:
+                        print(Colors.cyan + repr(len(modulevalidation.deferred)) +
+                              ' function bodies are validated when they are decoded' +
+                              Colors.ENDC)
+                else:
+                    print(Colors.red + 'failed validation tests' + Colors.ENDC)
+                    for error in modulevalidation.errors:
+                        print(Colors.red + error + Colors.ENDC)
+                vm = VM([module], init, schedule)
+                vm.setFlags(argparser.getParseFlags())
+                ms = vm.getState()
+                if argparser.getIDXSPC():
+                    DumpIndexSpaces(ms)
+                if argparser.getMEMDUMP():
+                    DumpLinearMems(ms.Linear_Memory, argparser.getMEMDUMP())
+                if argparser.getRun():
+                    try:
+                        vm.run(argparser.getGasLimit())
+                    except Trap as e:
+                        print(Colors.red + 'trap: ' + str(e) + Colors.ENDC)
+                        trapped = True
+                # merklizer = Merklizer(ms.Linear_Memory[0][0:512], module)
+                # treelength, hashtree = merklizer.run()
+        if cache is not None and argparser.getCacheStats():
+            cache.PrintStats()
+        if trapped:
+            sys.exit(1)
 
 
     if argparser.getWASTPath() is not None:
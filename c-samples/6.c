@@ -0,0 +1,8 @@
+
+int main (int argc, char** argv)
+{
+  int sum = 0;
+  for (int i = 0; i < 100000; ++i)
+    sum += i & 255;
+  return sum;
+}
@@ -0,0 +1,33 @@
+(module
+  (table 0 anyfunc)
+  (memory $0 1)
+  (export "memory" (memory $0))
+  (export "main" (func $main))
+  (func $main (param $0 i32) (param $1 i32) (result i32)
+    (local $2 i32)
+    (local $3 i32)
+    (loop $label$0
+      (set_local $3
+        (i32.add
+          (get_local $3)
+          (i32.and
+            (get_local $2)
+            (i32.const 255)
+          )
+        )
+      )
+      (br_if $label$0
+        (i32.ne
+          (tee_local $2
+            (i32.add
+              (get_local $2)
+              (i32.const 1)
+            )
+          )
+          (i32.const 100000)
+        )
+      )
+    )
+    (get_local $3)
+  )
+)
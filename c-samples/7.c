@@ -0,0 +1,16 @@
+
+int is_prime(unsigned int n)
+{
+  for (unsigned int d = 2; d * d <= n; ++d)
+    if (n % d == 0)
+      return 0;
+  return 1;
+}
+
+int main (int argc, char** argv)
+{
+  int count = 0;
+  for (unsigned int n = 2; n < 2000; ++n)
+    count += is_prime(n);
+  return count;
+}
@@ -0,0 +1,74 @@
+(module
+  (table 0 anyfunc)
+  (memory $0 1)
+  (export "memory" (memory $0))
+  (export "is_prime" (func $is_prime))
+  (export "main" (func $main))
+  (func $is_prime (param $0 i32) (result i32)
+    (local $1 i32)
+    (set_local $1
+      (i32.const 2)
+    )
+    (block $label$0
+      (loop $label$1
+        (br_if $label$0
+          (i32.gt_u
+            (i32.mul
+              (get_local $1)
+              (get_local $1)
+            )
+            (get_local $0)
+          )
+        )
+        (if
+          (i32.eqz
+            (i32.rem_u
+              (get_local $0)
+              (get_local $1)
+            )
+          )
+          (return
+            (i32.const 0)
+          )
+        )
+        (set_local $1
+          (i32.add
+            (get_local $1)
+            (i32.const 1)
+          )
+        )
+        (br $label$1)
+      )
+    )
+    (i32.const 1)
+  )
+  (func $main (param $0 i32) (param $1 i32) (result i32)
+    (local $2 i32)
+    (local $3 i32)
+    (set_local $2
+      (i32.const 2)
+    )
+    (loop $label$0
+      (set_local $3
+        (i32.add
+          (get_local $3)
+          (call $is_prime
+            (get_local $2)
+          )
+        )
+      )
+      (br_if $label$0
+        (i32.ne
+          (tee_local $2
+            (i32.add
+              (get_local $2)
+              (i32.const 1)
+            )
+          )
+          (i32.const 2000)
+        )
+      )
+    )
+    (get_local $3)
+  )
+)
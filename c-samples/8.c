@@ -0,0 +1,12 @@
+
+int fib(int n)
+{
+  if (n < 2)
+    return n;
+  return fib(n - 1) + fib(n - 2);
+}
+
+int main (int argc, char** argv)
+{
+  return fib(27);
+}
@@ -0,0 +1,37 @@
+(module
+  (table 0 anyfunc)
+  (memory $0 1)
+  (export "memory" (memory $0))
+  (export "fib" (func $fib))
+  (export "main" (func $main))
+  (func $fib (param $0 i32) (result i32)
+    (if
+      (i32.lt_s
+        (get_local $0)
+        (i32.const 2)
+      )
+      (return
+        (get_local $0)
+      )
+    )
+    (i32.add
+      (call $fib
+        (i32.add
+          (get_local $0)
+          (i32.const -1)
+        )
+      )
+      (call $fib
+        (i32.add
+          (get_local $0)
+          (i32.const -2)
+        )
+      )
+    )
+  )
+  (func $main (param $0 i32) (param $1 i32) (result i32)
+    (call $fib
+      (i32.const 27)
+    )
+  )
+)
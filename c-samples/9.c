@@ -0,0 +1,14 @@
+
+unsigned char sieve[20000];
+
+int main (int argc, char** argv)
+{
+  int count = 0;
+  for (unsigned int i = 2; i != 20000; ++i)
+    if (!sieve[i]) {
+      ++count;
+      for (unsigned int j = i * i; j < 20000; j += i)
+        sieve[j] = 1;
+    }
+  return count;
+}
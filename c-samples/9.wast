@@ -0,0 +1,70 @@
+(module
+  (table 0 anyfunc)
+  (memory $0 1)
+  (export "memory" (memory $0))
+  (export "main" (func $main))
+  (func $main (param $0 i32) (param $1 i32) (result i32)
+    (local $2 i32)
+    (local $3 i32)
+    (local $4 i32)
+    (set_local $2
+      (i32.const 2)
+    )
+    (loop $label$0
+      (if
+        (i32.eqz
+          (i32.load8_u offset=16
+            (get_local $2)
+          )
+        )
+        (block
+          (set_local $4
+            (i32.add
+              (get_local $4)
+              (i32.const 1)
+            )
+          )
+          (set_local $3
+            (i32.mul
+              (get_local $2)
+              (get_local $2)
+            )
+          )
+          (block $label$1
+            (loop $label$2
+              (br_if $label$1
+                (i32.ge_u
+                  (get_local $3)
+                  (i32.const 20000)
+                )
+              )
+              (i32.store8 offset=16
+                (get_local $3)
+                (i32.const 1)
+              )
+              (set_local $3
+                (i32.add
+                  (get_local $3)
+                  (get_local $2)
+                )
+              )
+              (br $label$2)
+            )
+          )
+        )
+      )
+      (br_if $label$0
+        (i32.ne
+          (tee_local $2
+            (i32.add
+              (get_local $2)
+              (i32.const 1)
+            )
+          )
+          (i32.const 20000)
+        )
+      )
+    )
+    (get_local $4)
+  )
+)
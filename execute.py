@@ -1,7 +1,39 @@
+from array import array
 from OpCodes import *
-from utils import Colors, ror, rol
-import numpy as np
+from utils import Colors
+from validator import Validation_Context, I32, I64, F32, F64
+from predecode import BuildBlockGas
+from gas import Gas_Schedule
+from values import *
 import math
+import struct as stc
+
+# the deepest the call stack can get before the interpreter traps
+Max_Call_Depth = 1024
+# the operand stack starts with Initial_Stack_Size slots and grows when a call
+# needs more room for its locals and max_stack operands, up to Max_Stack_Size
+# slots. past that the call traps. it is left this many values over what the
+# call needs for the arguments of invoke.
+Initial_Stack_Size = 4096
+Max_Stack_Size = 1 << 20
+Stack_Slack = 64
+# the gas limit when there is none. no run gets anywhere near it.
+Unlimited_Gas = 1 << 62
+
+# the precompiled accessors of the memory instructions
+Load_S8 = stc.Struct('<b').unpack_from
+Load_U8 = stc.Struct('<B').unpack_from
+Load_S16 = stc.Struct('<h').unpack_from
+Load_U16 = stc.Struct('<H').unpack_from
+Load_S32 = stc.Struct('<i').unpack_from
+Load_U32 = stc.Struct('<I').unpack_from
+Load_U64 = stc.Struct('<Q').unpack_from
+Load_F32 = stc.Struct('<f').unpack_from
+Store_8 = stc.Struct('<B').pack_into
+Store_16 = stc.Struct('<H').pack_into
+Store_32 = stc.Struct('<I').pack_into
+Store_64 = stc.Struct('<Q').pack_into
+Store_F32 = stc.Struct('<f').pack_into
 
 
 class Label():
@@ -10,975 +42,1659 @@ class Label():
         self.name = name
 
 
+# what a call needs to know about a function, worked out the first time it
+# is called. tags are the types of the parameters and locals and zeros the initial
+# payloads of the locals. gas is the body's block gas under the schedule.
+class Callee():
+    def __init__(self, func_body, gas):
+        self.func_body = func_body
+        self.gas = gas
+        self.param_count = func_body.param_count
+        self.local_count = len(func_body.local_types)
+        self.arity = len(func_body.results)
+        self.max_stack = func_body.max_stack
+        self.tags = array('B', func_body.local_types)
+        self.zeros = array('Q', [0]) * (self.local_count - self.param_count)
+
+
+# a function activation. the interpreter keeps them on Stack_Call. the
+# parameters and locals live in the slots of Stack_Omni starting at
+# locals_base, the function's operands start at stack_base right above them.
+# return_pc is the pc to continue at in the caller. the frames are
+# preallocated and reused so a call allocates nothing.
 class Frame():
-    def __init__(self, arity, local_indices, self_ref):
-        self.arity = arity
-        self.local_indices = local_indices
-        self.self_ref = self_ref
-
-
-# takes the machinestate, opcode and operand to run. updates the machinestate
+    def __init__(self):
+        self.callee = None
+        self.code = None
+        self.side_table = None
+        self.locals_base = 0
+        self.stack_base = 0
+        self.arity = 0
+        self.return_pc = 0
+
+
+# takes the machinestate, opcode and operand to run. updates the machinestate.
+# run the code with invoke. it drives a pc over the Code_Store of the function
+# on top of the call stack and uses the body's side table for control flow.
+# the handlers work on the arrays of the Operand_Stack directly, the stack
+# pointer lives in self.sp while the code runs. a call makes sure there is
+# room for the locals and max_stack operands of its function so the handlers
+# never check for it.
+# gas is charged a basic block at a time by the handlers that send execution
+# somewhere other than the next pc, see predecode.BuildBlockGas. the totals
+# are the same as charging every instruction its cost as it runs. the costs
+# come from the Gas_Schedule, the default one if there is none. the same
+# handlers enforce the gas limit: a block that would take op_gas over it traps
+# before any of it runs, so a run runs out of gas at the same instruction every
+# time and the instructions in between pay nothing for the check.
 class Execute(): # pragma: no cover
-    def __init__(self, machinestate):
+    def __init__(self, machinestate, module, schedule=None):
         self.machinestate = machinestate
+        self.module = module
+        if schedule is None:
+            schedule = Gas_Schedule()
+        self.schedule = schedule
         self.opcodeint = ''
-        self.immediates = []
+        self.operands = ()
         self.op_gas = int()
+        self.gas_limit = Unlimited_Gas
+        self.context = Validation_Context(
+            module.type_section, module.import_section, module.function_section,
+            module.table_section, module.memory_section, module.global_section)
+        self.func_bodies = []
+        if module.code_section is not None:
+            self.func_bodies = module.code_section.func_bodies
+        # the state of the function that is running
+        self.frame = None
+        self.pc = int()
+        self.opcodes = None
+        self.immediates = None
+        self.side = None
+        self.targets = None
+        self.arities = None
+        self.heights = None
+        self.gas = None
+        self.costs = schedule.costs
+        self.fp = 0
+        self.frame_pool = [Frame() for i in range(Max_Call_Depth)]
+        # the Callee of every function that was called, indexed by the
+        # function index
+        self.callees = [None] * (self.context.imported_funcs + len(self.func_bodies))
+        self.global_types = [global_type[0] for global_type in self.context.globals]
+        self.stack = Operand_Stack(Initial_Stack_Size)
+        machinestate.Stack_Omni = self.stack
+        self.enterStack()
+        self.sp = 0
+        # the module's memory. the handlers access its buffer directly and
+        # bounds check against its current size.
+        self.memory_instance = None
+        self.memory = None
+        self.memory_size = 0
+        if machinestate.Linear_Memory:
+            self.memory_instance = machinestate.Linear_Memory[0]
+            self.enterMemory()
+        self.handlers = self.getHandlers()
+
+    # picks up the buffer and size of the memory after it was set up or grown
+    def enterMemory(self):
+        self.memory = self.memory_instance.buffer
+        self.memory_size = self.memory_instance.size
+
+    # picks up the arrays of the operand stack after it was set up or grown
+    def enterStack(self):
+        self.values = self.stack.values
+        self.floats = self.stack.floats
+        self.tags = self.stack.tags
+
+    # grows the operand stack so it has room for size values and then some.
+    # traps if that is more than Max_Stack_Size.
+    def growStack(self, size):
+        if size > Max_Stack_Size:
+            raise Trap('operand stack exhausted')
+        self.stack.grow(min(max(2 * self.stack.size, size + Stack_Slack), Max_Stack_Size))
+        self.enterStack()
 
     def getOPGas(self):
         return self.op_gas
 
+    # the vm may use gas_limit more gas from now on. None lifts the limit.
+    def setGasLimit(self, gas_limit):
+        if gas_limit is None:
+            self.gas_limit = Unlimited_Gas
+        else:
+            self.gas_limit = self.op_gas + gas_limit
+
+    # the gas the vm may still use, None if there is no limit
+    def getGasLeft(self):
+        if self.gas_limit == Unlimited_Gas:
+            return(None)
+        return(self.gas_limit - self.op_gas)
+
+    # raised in place of charging gas that would go over the limit. nothing
+    # was charged for what didn't run. the handlers raise it before they move
+    # the pc or the frames so the loop sees the instruction that ran out.
+    def outOfGas(self):
+        raise Trap('out of gas')
+
     def chargeGasMem(self, mem_size_page):
-        factor = 64
-        self.op_gas += 64 * mem_size_page
+        gas = self.op_gas + self.schedule.page_cost * mem_size_page
+        if gas > self.gas_limit:
+            self.outOfGas()
+        self.op_gas = gas
 
+    # the static cost of an instruction. grow_memory charges for the pages
+    # itself.
     def chargeGas(self, opcodeint):
-        if opcodeint != 64:
-            self.op_gas += 1
-        else:
-            chargeGasMem()
-            pass
+        self.op_gas += self.costs[opcodeint]
 
     def getInstruction(self, opcodeint, immediates):
         self.opcodeint = opcodeint
-        self.immediates = immediates
+        self.operands = immediates
 
+    # runs the instruction getInstruction was given on its own
     def callExecuteMethod(self):
-        runmethod = self.instructionUnwinder(self.opcodeint, self.immediates, self.machinestate)
-        print (repr(self.opcodeint) + ' ' + repr(self.immediates))
+        immediate = self.operands[0] if self.operands else 0
+        runmethod = self.instructionUnwinder(self.opcodeint, immediate, self.machinestate)
+        self.sp = self.stack.sp
         try:
-            runmethod(self.opcodeint, self.immediates)
+            runmethod(self.opcodeint, immediate)
         except IndexError:
             # trap
             print(Colors.red + 'bad stack access.' + Colors.ENDC)
+        self.stack.sp = self.sp
+
+    # calls the function at func_index with args and runs it to completion.
+    # the args are python numbers and get converted to the parameter types.
+    # returns the list of its results as values, i.e. integers come back as
+    # their unsigned bit pattern. a trap leaves the stacks the way they were
+    # before the call.
+    def invoke(self, func_index, args):
+        frames = self.machinestate.Stack_Call
+        stack = self.stack
+        depth = len(frames)
+        base = stack.sp
+        pc = self.pc
+        param_types = self.context.types[self.context.functions[func_index]][0]
+        if len(args) != len(param_types):
+            raise Exception(Colors.red + 'function ' + repr(func_index) + ' takes ' +
+                            repr(len(param_types)) + ' arguments' + Colors.ENDC)
+        for value_type, arg in zip(param_types, args):
+            stack.push(value_type, ToValue(value_type, arg))
+        self.sp = stack.sp
+        try:
+            self.callFunction(func_index, pc)
+            self.loop()
+        except Trap:
+            del frames[depth:]
+            stack.sp = base
+            if frames:
+                self.enterFrame(frames[-1])
+                self.pc = pc
+            else:
+                self.frame = None
+            raise
+        finally:
+            self.sp = stack.sp
+        results = []
+        while stack.sp > base:
+            results.append(stack.pop())
+        results.reverse()
+        self.sp = base
+        return(results)
+
+    # the interpreter loop. runs until the frame it was entered with returns.
+    def loop(self):
+        frames = self.machinestate.Stack_Call
+        depth = len(frames) - 1
+        handlers = self.handlers
+        try:
+            while len(frames) > depth:
+                pc = self.pc
+                opcodeint = self.opcodes[pc]
+                immediate = self.immediates[pc]
+                self.pc = pc + 1
+                handlers[opcodeint](opcodeint, immediate)
+        except Trap:
+            # the instructions of the block after the one that trapped were
+            # paid for but never ran
+            pc = self.pc - 1
+            self.op_gas -= self.gas[pc] - self.costs[self.opcodes[pc]]
+            raise
+        finally:
+            self.stack.sp = self.sp
+
+    def getCallee(self, func_index):
+        if func_index < self.context.imported_funcs:
+            raise Trap('calling imported function ' + repr(func_index) +
+                       ' is not supported')
+        callee = self.callees[func_index]
+        if callee is None:
+            callee = self.makeCallee(func_index)
+        return(callee)
+
+    # builds the Callee of a function the first time it is called, which is
+    # when a lazy body gets decoded. the side tables come with the block gas
+    # of the default schedule, other schedules get theirs built here.
+    def makeCallee(self, func_index):
+        func_body = self.func_bodies[func_index - self.context.imported_funcs]
+        if func_body.code is None or func_body.side_table is None:
+            raise Trap('function ' + repr(func_index) + ' has not been validated')
+        if self.schedule.isDefault():
+            gas = func_body.side_table.gas
+        else:
+            gas = BuildBlockGas(func_body.code, self.costs)
+        callee = Callee(func_body, gas)
+        self.callees[func_index] = callee
+        return(callee)
+
+    # pushes a frame for the function. the arguments already are on the
+    # operand stack and become the first locals, the other locals get the
+    # slots above them. a zero payload is a zero of every type so that is what
+    # the locals start as.
+    def callFunction(self, func_index, return_pc):
+        frames = self.machinestate.Stack_Call
+        depth = len(frames)
+        if depth >= Max_Call_Depth:
+            raise Trap('call stack exhausted')
+        callee = self.getCallee(func_index)
+        locals_base = self.sp - callee.param_count
+        stack_base = locals_base + callee.local_count
+        if stack_base + callee.max_stack > self.stack.size:
+            self.growStack(stack_base + callee.max_stack)
+        gas = self.op_gas + callee.gas[0]
+        if gas > self.gas_limit:
+            self.outOfGas()
+        # an empty slice assignment counts as a resize of the exported buffer
+        if callee.zeros:
+            self.values[self.sp:stack_base] = callee.zeros
+        self.tags[locals_base:stack_base] = callee.tags
+        self.sp = stack_base
+        frame = self.frame_pool[depth]
+        frame.callee = callee
+        frame.code = callee.func_body.code
+        frame.side_table = callee.func_body.side_table
+        frame.locals_base = locals_base
+        frame.stack_base = stack_base
+        frame.arity = callee.arity
+        frame.return_pc = return_pc
+        frames.append(frame)
+        self.enterFrame(frame)
+        self.pc = 0
+        self.op_gas = gas
+
+    # makes the frame the running one
+    def enterFrame(self, frame):
+        self.frame = frame
+        self.opcodes = frame.code.opcodes
+        self.immediates = frame.code.immediates
+        self.side = frame.code.side
+        self.targets = frame.side_table.targets
+        self.arities = frame.side_table.arities
+        self.heights = frame.side_table.heights
+        self.gas = frame.callee.gas
+        self.fp = frame.locals_base
+
+    # moves the top arity values down to height and drops everything above
+    # them
+    def unwind(self, height, arity):
+        sp = self.sp
+        if arity and height != sp - arity:
+            self.values[height:height + arity] = self.values[sp - arity:sp]
+            self.tags[height:height + arity] = self.tags[sp - arity:sp]
+        self.sp = height + arity
+
+    # pops the running frame and leaves its results on the operand stack
+    # where its arguments were
+    def returnFunction(self):
+        frames = self.machinestate.Stack_Call
+        frame = frames[-1]
+        if len(frames) > 1:
+            # the caller's block after the call
+            gas = self.op_gas + frames[-2].callee.gas[frame.return_pc]
+            if gas > self.gas_limit:
+                self.outOfGas()
+        frames.pop()
+        self.unwind(frame.locals_base, frame.arity)
+        if frames:
+            self.enterFrame(frames[-1])
+            self.pc = frame.return_pc
+            self.op_gas = gas
+        else:
+            self.frame = None
+
+    # unwinds the operand stack to the target's height, keeping the values
+    # the branch carries, and jumps. pc is the branch instruction's.
+    def branch(self, pc, target, height):
+        gas = self.op_gas + self.gas[target]
+        if gas > self.gas_limit:
+            self.outOfGas()
+        self.unwind(self.frame.stack_base + height, self.arities[pc])
+        self.pc = target
+        self.op_gas = gas
 
     def instructionUnwinder(self, opcodeint, immediates, machinestate):
         self.chargeGas(opcodeint)
-
-        if opcodeint == 0:
-            return(self.run_unreachable)
-        elif opcodeint == 1:
-            return(self.run_nop)
-        elif opcodeint == 2:
-            return(self.run_block)
-        elif opcodeint == 3:
-            return(self.run_loop)
-        elif opcodeint == 4:
-            return(self.run_if)
-        elif opcodeint == 5:
-            return(self.run_else)
-        elif opcodeint == 11:
-            return(self.run_end)
-        elif opcodeint == 12:
-            return(self.run_br)
-        elif opcodeint == 13:
-            return(self.run_br_if)
-        elif opcodeint == 14:
-            return(self.run_br_table)
-        elif opcodeint == 15:
-            return(self.run_return)
-        elif opcodeint == 16:
-            return(self.run_call)
-        elif opcodeint == 17:
-            return(self.run_call_indirect)
-        elif opcodeint == 26:
-            return(self.run_drop)
-        elif opcodeint == 27:
-            return(self.run_select)
-        elif opcodeint == 32:
-            return(self.run_getlocal)
-        elif opcodeint == 33:
-            return(self.run_setlocal)
-        elif opcodeint == 34:
-            return(self.run_teelocal)
-        elif opcodeint == 35:
-            return(self.run_getglobal)
-        elif opcodeint == 36:
-            return(self.run_setglobal)
-        elif opcodeint >= 40 and opcodeint <= 53:
-            return(self.run_load)
-        elif opcodeint >= 54 and opcodeint <= 62:
-            return(self.run_store)
-        elif opcodeint == 63:
-            return(self.run_current_memory)
-        elif opcodeint == 64:
-            self.chargeGasMem(immediates[0])
-            return(self.run_grow_memory)
-        elif opcodeint >= 65 and opcodeint <= 68:
-            return(self.run_const)
-        elif opcodeint == 69 or opcodeint == 80:
-            return(self.run_eqz)
-        elif opcodeint == 70 or opcodeint == 81 or opcodeint == 91 or opcodeint == 97:
-            return(self.run_eq)
-        elif opcodeint == 71 or opcodeint == 82 or opcodeint == 92 or opcodeint == 98:
-            return(self.run_ne)
-        elif opcodeint == 72 or opcodeint == 83:
-            return(self.run_lt_s)
-        elif opcodeint == 73 or opcodeint == 84:
-            return(self.run_lt_u)
-        elif opcodeint == 74 or opcodeint == 85:
-            return(self.run_gt_s)
-        elif opcodeint == 75 or opcodeint == 86:
-            return(self.run_gt_u)
-        elif opcodeint == 76 or opcodeint == 87:
-            return(self.run_le_s)
-        elif opcodeint == 77 or opcodeint == 88:
-            return(self.run_le_u)
-        elif opcodeint == 78 or opcodeint == 89:
-            return(self.run_ge_s)
-        elif opcodeint == 79 or opcodeint == 90:
-            return(self.run_ge_u)
-        elif opcodeint == 93 or opcodeint == 99:
-            return(self.run_lt)
-        elif opcodeint == 94 or opcodeint == 100:
-            return(self.run_gt)
-        elif opcodeint == 95 or opcodeint == 101:
-            return(self.run_le)
-        elif opcodeint == 96 or opcodeint == 102:
-            return(self.run_ge)
-        elif opcodeint == 103 or opcodeint == 121:
-            return(self.run_clz)
-        elif opcodeint == 104 or opcodeint == 122:
-            return(self.run_ctz)
-        elif opcodeint == 105 or opcodeint == 123:
-            return(self.run_popcnt)
-        elif opcodeint == 106 or opcodeint == 124 or opcodeint == 146 or opcodeint == 160:
-            return(self.run_add)
-        elif opcodeint == 107 or opcodeint == 125 or opcodeint == 147 or opcodeint == 161:
-            return(self.run_sub)
-        elif opcodeint == 108 or opcodeint == 126 or opcodeint == 148 or opcodeint == 162:
-            return(self.run_mul)
-        elif opcodeint == 109 or opcodeint == 127:
-            return(self.run_div_s)
-        elif opcodeint == 110 or opcodeint == 128:
-            return(self.run_div_u)
-        elif opcodeint == 111 or opcodeint == 129:
-            return(self.run_rem_s)
-        elif opcodeint == 112 or opcodeint == 130:
-            return(self.run_rem_u)
-        elif opcodeint == 113 or opcodeint == 131:
-            return(self.run_and)
-        elif opcodeint == 114 or opcodeint == 132:
-            return(self.run_or)
-        elif opcodeint == 115 or opcodeint == 133:
-            return(self.run_xor)
-        elif opcodeint == 116 or opcodeint == 134:
-            return(self.run_shl)
-        elif opcodeint == 117 or opcodeint == 135:
-            return(self.run_shr_s)
-        elif opcodeint == 118 or opcodeint == 136:
-            return(self.run_shr_u)
-        elif opcodeint == 119 or opcodeint == 137:
-            return(self.run_rotl)
-        elif opcodeint == 120 or opcodeint == 138:
-            return(self.run_rotr)
-        elif opcodeint == 139 or opcodeint == 153:
-            return(self.run_abs)
-        elif opcodeint == 140 or opcodeint == 154:
-            return(self.run_neg)
-        elif opcodeint == 141 or opcodeint == 155:
-            return(self.run_ceil)
-        elif opcodeint == 142 or opcodeint == 156:
-            return(self.run_floor)
-        elif opcodeint == 143 or opcodeint == 157:
-            return(self.run_trunc)
-        elif opcodeint == 144 or opcodeint == 158:
-            return(self.run_nearest)
-        elif opcodeint == 145 or opcodeint == 159:
-            return(self.run_sqrt)
-        elif opcodeint == 149 or opcodeint == 163:
-            return(self.run_div)
-        elif opcodeint == 150 or opcodeint == 164:
-            return(self.run_min)
-        elif opcodeint == 151 or opcodeint == 165:
-            return(self.run_max)
-        elif opcodeint == 152 or opcodeint == 166:
-            return(self.run_copysign)
-        elif opcodeint == 167:
-            return(self.run_i32wrapi64)
-        elif opcodeint == 168:
-            return(self.run_i32trunc_sf32)
-        elif opcodeint == 169:
-            return(self.run_i32trunc_uf32)
-        elif opcodeint == 170:
-            return(self.run_i32trunc_sf64)
-        elif opcodeint == 171:
-            return(self.run_i32trunc_uf64)
-        elif opcodeint == 172:
-            return(self.run_i64extend_si32)
-        elif opcodeint == 173:
-            return(self.run_i64extend_ui3o)
-        elif opcodeint == 174:
-            return(self.run_i64trunc_sf32)
-        elif opcodeint == 175:
-            return(self.run_i64trunc_uf32)
-        elif opcodeint == 176:
-            return(self.run_i64trunc_sf64)
-        elif opcodeint == 177:
-            return(self.run_i64trunc_uf64)
-        elif opcodeint == 178:
-            return(self.run_f32convert_si32)
-        elif opcodeint == 179:
-            return(self.run_f32convert_ui32)
-        elif opcodeint == 180:
-            return(self.run_f32convert_si64)
-        elif opcodeint == 181:
-            return(self.run_f32convert_ui64)
-        elif opcodeint == 182:
-            return(self.run_f32demotef64)
-        elif opcodeint == 183:
-            return(self.run_f64convert_si32)
-        elif opcodeint == 184:
-            return(self.run_f64convert_ui32)
-        elif opcodeint == 185:
-            return(self.run_f64convert_si64)
-        elif opcodeint == 186:
-            return(self.run_f64convert_ui64)
-        elif opcodeint == 187:
-            return(self.run_f64promotef32)
-        elif opcodeint == 188:
-            return(self.run_i32reinterpretf32)
-        elif opcodeint == 189:
-            return(self.run_i64reinterpretf64)
-        elif opcodeint == 190:
-            return(self.run_f32reinterpreti32)
-        elif opcodeint == 191:
-            return(self.run_f64reinterpreti64)
-        else:
-            raise Exception(Colors.red + 'unknown opcode' + Colors.ENDC)
-
-    def run_unreachable(self, opcodeint, immediates):
-        # trap
-        raise Exception(Colors.red + "running an unreachable function..." + Colors.ENDC)
-
-    def run_nop(self, opcodeint, immediates):
+        return(self.handlers[opcodeint])
+
+    # the handler of every opcode, indexed by the opcode. built once per
+    # instance so the dispatch is a single list lookup.
+    def getHandlers(self):
+        handlers = [self.run_invalid] * 256
+        handlers[0x00] = self.run_unreachable
+        handlers[0x01] = self.run_nop
+        handlers[0x02] = self.run_block
+        handlers[0x03] = self.run_loop
+        handlers[0x04] = self.run_if
+        handlers[0x05] = self.run_else
+        handlers[0x0b] = self.run_end
+        handlers[0x0c] = self.run_br
+        handlers[0x0d] = self.run_br_if
+        handlers[0x0e] = self.run_br_table
+        handlers[0x0f] = self.run_return
+        handlers[0x10] = self.run_call
+        handlers[0x11] = self.run_call_indirect
+        handlers[0x1a] = self.run_drop
+        handlers[0x1b] = self.run_select
+        handlers[0x20] = self.run_getlocal
+        handlers[0x21] = self.run_setlocal
+        handlers[0x22] = self.run_teelocal
+        handlers[0x23] = self.run_getglobal
+        handlers[0x24] = self.run_setglobal
+        handlers[0x28] = self.run_i32load
+        handlers[0x29] = self.run_i64load
+        handlers[0x2a] = self.run_f32load
+        handlers[0x2b] = self.run_f64load
+        handlers[0x2c] = self.run_i32load8_s
+        handlers[0x2d] = self.run_i32load8_u
+        handlers[0x2e] = self.run_i32load16_s
+        handlers[0x2f] = self.run_i32load16_u
+        handlers[0x30] = self.run_i64load8_s
+        handlers[0x31] = self.run_i64load8_u
+        handlers[0x32] = self.run_i64load16_s
+        handlers[0x33] = self.run_i64load16_u
+        handlers[0x34] = self.run_i64load32_s
+        handlers[0x35] = self.run_i64load32_u
+        handlers[0x36] = self.run_i32store
+        handlers[0x37] = self.run_i64store
+        handlers[0x38] = self.run_f32store
+        handlers[0x39] = self.run_f64store
+        handlers[0x3a] = self.run_i32store8
+        handlers[0x3b] = self.run_i32store16
+        handlers[0x3c] = self.run_i64store8
+        handlers[0x3d] = self.run_i64store16
+        handlers[0x3e] = self.run_i64store32
+        handlers[0x3f] = self.run_current_memory
+        handlers[0x40] = self.run_grow_memory
+        handlers[0x41] = self.run_i32const
+        handlers[0x42] = self.run_i64const
+        handlers[0x43] = self.run_f32const
+        handlers[0x44] = self.run_f64const
+        handlers[0x45] = self.run_i32eqz
+        handlers[0x46] = self.run_i32eq
+        handlers[0x47] = self.run_i32ne
+        handlers[0x48] = self.run_i32lt_s
+        handlers[0x49] = self.run_i32lt_u
+        handlers[0x4a] = self.run_i32gt_s
+        handlers[0x4b] = self.run_i32gt_u
+        handlers[0x4c] = self.run_i32le_s
+        handlers[0x4d] = self.run_i32le_u
+        handlers[0x4e] = self.run_i32ge_s
+        handlers[0x4f] = self.run_i32ge_u
+        handlers[0x50] = self.run_i64eqz
+        handlers[0x51] = self.run_i64eq
+        handlers[0x52] = self.run_i64ne
+        handlers[0x53] = self.run_i64lt_s
+        handlers[0x54] = self.run_i64lt_u
+        handlers[0x55] = self.run_i64gt_s
+        handlers[0x56] = self.run_i64gt_u
+        handlers[0x57] = self.run_i64le_s
+        handlers[0x58] = self.run_i64le_u
+        handlers[0x59] = self.run_i64ge_s
+        handlers[0x5a] = self.run_i64ge_u
+        handlers[0x5b] = self.run_f32eq
+        handlers[0x5c] = self.run_f32ne
+        handlers[0x5d] = self.run_f32lt
+        handlers[0x5e] = self.run_f32gt
+        handlers[0x5f] = self.run_f32le
+        handlers[0x60] = self.run_f32ge
+        handlers[0x61] = self.run_f64eq
+        handlers[0x62] = self.run_f64ne
+        handlers[0x63] = self.run_f64lt
+        handlers[0x64] = self.run_f64gt
+        handlers[0x65] = self.run_f64le
+        handlers[0x66] = self.run_f64ge
+        handlers[0x67] = self.run_i32clz
+        handlers[0x68] = self.run_i32ctz
+        handlers[0x69] = self.run_i32popcnt
+        handlers[0x6a] = self.run_i32add
+        handlers[0x6b] = self.run_i32sub
+        handlers[0x6c] = self.run_i32mul
+        handlers[0x6d] = self.run_i32div_s
+        handlers[0x6e] = self.run_i32div_u
+        handlers[0x6f] = self.run_i32rem_s
+        handlers[0x70] = self.run_i32rem_u
+        handlers[0x71] = self.run_i32and
+        handlers[0x72] = self.run_i32or
+        handlers[0x73] = self.run_i32xor
+        handlers[0x74] = self.run_i32shl
+        handlers[0x75] = self.run_i32shr_s
+        handlers[0x76] = self.run_i32shr_u
+        handlers[0x77] = self.run_i32rotl
+        handlers[0x78] = self.run_i32rotr
+        handlers[0x79] = self.run_i64clz
+        handlers[0x7a] = self.run_i64ctz
+        handlers[0x7b] = self.run_i64popcnt
+        handlers[0x7c] = self.run_i64add
+        handlers[0x7d] = self.run_i64sub
+        handlers[0x7e] = self.run_i64mul
+        handlers[0x7f] = self.run_i64div_s
+        handlers[0x80] = self.run_i64div_u
+        handlers[0x81] = self.run_i64rem_s
+        handlers[0x82] = self.run_i64rem_u
+        handlers[0x83] = self.run_i64and
+        handlers[0x84] = self.run_i64or
+        handlers[0x85] = self.run_i64xor
+        handlers[0x86] = self.run_i64shl
+        handlers[0x87] = self.run_i64shr_s
+        handlers[0x88] = self.run_i64shr_u
+        handlers[0x89] = self.run_i64rotl
+        handlers[0x8a] = self.run_i64rotr
+        handlers[0x8b] = self.run_f32abs
+        handlers[0x8c] = self.run_f32neg
+        handlers[0x8d] = self.run_f32ceil
+        handlers[0x8e] = self.run_f32floor
+        handlers[0x8f] = self.run_f32trunc
+        handlers[0x90] = self.run_f32nearest
+        handlers[0x91] = self.run_f32sqrt
+        handlers[0x92] = self.run_f32add
+        handlers[0x93] = self.run_f32sub
+        handlers[0x94] = self.run_f32mul
+        handlers[0x95] = self.run_f32div
+        handlers[0x96] = self.run_f32min
+        handlers[0x97] = self.run_f32max
+        handlers[0x98] = self.run_f32copysign
+        handlers[0x99] = self.run_f64abs
+        handlers[0x9a] = self.run_f64neg
+        handlers[0x9b] = self.run_f64ceil
+        handlers[0x9c] = self.run_f64floor
+        handlers[0x9d] = self.run_f64trunc
+        handlers[0x9e] = self.run_f64nearest
+        handlers[0x9f] = self.run_f64sqrt
+        handlers[0xa0] = self.run_f64add
+        handlers[0xa1] = self.run_f64sub
+        handlers[0xa2] = self.run_f64mul
+        handlers[0xa3] = self.run_f64div
+        handlers[0xa4] = self.run_f64min
+        handlers[0xa5] = self.run_f64max
+        handlers[0xa6] = self.run_f64copysign
+        handlers[0xa7] = self.run_i32wrapi64
+        handlers[0xa8] = self.run_i32trunc_sf32
+        handlers[0xa9] = self.run_i32trunc_uf32
+        handlers[0xaa] = self.run_i32trunc_sf64
+        handlers[0xab] = self.run_i32trunc_uf64
+        handlers[0xac] = self.run_i64extend_si32
+        handlers[0xad] = self.run_i64extend_ui32
+        handlers[0xae] = self.run_i64trunc_sf32
+        handlers[0xaf] = self.run_i64trunc_uf32
+        handlers[0xb0] = self.run_i64trunc_sf64
+        handlers[0xb1] = self.run_i64trunc_uf64
+        handlers[0xb2] = self.run_f32convert_si32
+        handlers[0xb3] = self.run_f32convert_ui32
+        handlers[0xb4] = self.run_f32convert_si64
+        handlers[0xb5] = self.run_f32convert_ui64
+        handlers[0xb6] = self.run_f32demotef64
+        handlers[0xb7] = self.run_f64convert_si32
+        handlers[0xb8] = self.run_f64convert_ui32
+        handlers[0xb9] = self.run_f64convert_si64
+        handlers[0xba] = self.run_f64convert_ui64
+        handlers[0xbb] = self.run_f64promotef32
+        handlers[0xbc] = self.run_i32reinterpretf32
+        handlers[0xbd] = self.run_i64reinterpretf64
+        handlers[0xbe] = self.run_f32reinterpreti32
+        handlers[0xbf] = self.run_f64reinterpreti64
+        return(handlers)
+
+    def run_invalid(self, opcodeint, immediate):
+        raise Exception(Colors.red + 'unknown opcode' + Colors.ENDC)
+
+    def run_unreachable(self, opcodeint, immediate):
+        raise Trap('unreachable executed')
+
+    def run_nop(self, opcodeint, immediate):
         # literally do nothing
         pass
 
-    def run_block(self, opcodeint, immediates):
-        pass
-
-    def run_loop(self, opcodeint, immediates):
+    # blocks and loops only matter to the branches that target them and the
+    # side table already knows where those go
+    def run_block(self, opcodeint, immediate):
         pass
 
-    def run_if(self, opcodeint, immediates):
-        pass
-
-    def run_else(self, opcodeint, immediates):
-        pass
-
-    def run_end(self, opcodeint, immediates):
-        pass
-
-    def run_br(self, opcodeint, immediates):
-        pass
-
-    def run_br_if(self, opcodeint, immediates):
-        val = self.machinestate.Stack_Omni.pop()
-        if val:
-            pass
-        else:
-            self.run_br(dummy, immediates[0])
-
-    def run_br_table(self, opcodeint, immediates):
-        pass
-
-    def run_return(self, opcodeint, immediates):
-        pass
-
-    def run_call(self, opcodeint, immediates):
-        pass
-
-    def run_call_indirect(self, opcodeint, immediates):
-        pass
-
-    def run_drop(self, opcodeint, immediates):
-        self.machinestate.Stack_Omni.pop()
-
-    def run_select(self, opcodeint, immediates):
+    def run_loop(self, opcodeint, immediate):
         pass
 
-    def run_getlocal(self, opcodeint, immediates):
-        self.machinestate.Stack_Omni.append(immediates[0])
-
-    def run_setlocal(self, opcodeint, immediates):
-        return self.machinestate.Stack_Omni.pop()
-
-    def run_teelocal(self, dummy, immediates):
-        val = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(val)
-        self.machinestate.Stack_Omni.append(val)
-        self.run_setlocal(dummy, val)
-
-    def run_getglobal(self, opcodeint, immediates):
-        val = self.machinestate.Index_Space_Global[immediates[0]]
-        self.machinestate.Stack_Omni.append(val)
-
-    def run_setglobal(self, opcodeint, immediates):
-        val = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Index_Space_Global = val
-
-    def run_load(self, opcodeint, immediates):
-        if opcodeint == 40:
-            pass
-        elif opcodeint == 41:
-            pass
-        elif opcodeint == 42:
-            pass
-        elif opcodeint == 43:
-            pass
-        elif opcodeint == 44:
-            pass
-        elif opcodeint == 45:
-            pass
-        elif opcodeint == 46:
-            pass
-        elif opcodeint == 47:
-            pass
-        elif opcodeint == 48:
-            pass
-        elif opcodeint == 49:
-            pass
-        elif opcodeint == 50:
-            pass
-        elif opcodeint == 51:
-            pass
-        elif opcodeint == 52:
-            pass
-        elif opcodeint == 53:
-            pass
-        else:
-            raise Exception(Colors.red + 'invalid load instruction.' + Colors.ENDC)
-
-    def run_store(self, opcodeint, immediates):
-        if opcodeint == 54:
-            pass
-        elif opcodeint == 55:
-            pass
-        elif opcodeint == 56:
-            pass
-        elif opcodeint == 57:
-            pass
-        elif opcodeint == 58:
-            pass
-        elif opcodeint == 59:
-            pass
-        elif opcodeint == 60:
-            pass
-        elif opcodeint == 61:
-            pass
-        elif opcodeint == 62:
-            pass
-        else:
-            raise Exception(Colors.red + 'invalid store instruction' + Colors.ENDC)
-
-    def run_current_memory(self, opcodeint, immediates):
-        pass
-
-    def run_grow_memory(self, opcodeint, immediates):
-        pass
-
-    def run_const(self, opcodeint, immediates):
-        if opcodeint == 65:
-            self.machinestate.Stack_Omni.append(immediates[0])
-        elif opcodeint == 66:
-            self.machinestate.Stack_Omni.append(immediates[0])
-        elif opcodeint == 67:
-            self.machinestate.Stack_Omni.append(immediates[0])
-        elif opcodeint == 68:
-            self.machinestate.Stack_Omni.append(immediates[0])
-        else:
-            raise Exception(Colors.red + 'invalid const instruction' + Colors.ENDC)
-
-    def run_eqz(self, opcodeint, immediates):
-        if opcodeint == 69 or opcodeint == 80:
-            val = self.machinestate.Stack_Omni.pop()
-            if val == 0:
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid eqz instruction' + Colors.ENDC)
-
-    def run_eq(self, opcodeint, immediates):
-        if opcodeint == 70 or opcodeint == 81 or opcodeint == 91 or opcodeint == 97:
-            val2 = self.machinestate.Stack_Omni.pop()
-            val1 = self.machinestate.Stack_Omni.pop()
-            if val1 == val2:
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid eq instruction' + Colors.ENDC)
-
-    def run_ne(self, opcodeint, immediates):
-        if opcodeint == 71 or opcodeint == 82 or opcodeint == 92 or opcodeint == 98:
-            val2 = self.machinestate.Stack_Omni.pop()
-            val1 = self.machinestate.Stack_Omni.pop()
-            if val1 != val2:
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid ne instruction' + Colors.ENDC)
-
-    def run_lt_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 72:
-            if np.int32(val1) < np.int32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 83:
-            if np.int64(val1) < np.int64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid lt_s instruction' + Colors.ENDC)
-
-    def run_lt_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 73:
-            if np.uint32(val1) < np.uint32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 84:
-            if np.uint64(val1) < np.uint64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid lt_u instruction' + Colors.ENDC)
-
-    def run_gt_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 74:
-            if np.int32(val1) > np.int32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 85:
-            if np.int64(val1) > np.int64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid gt_s instruction' + Colors.ENDC)
-
-    def run_gt_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 75:
-            if np.uint32(val1) > np.uint32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 86:
-            if np.uint64(val1) > np.uint64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid gt_u instruction' + Colors.ENDC)
-
-    def run_le_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 76:
-            if np.int32(val1) <= np.int32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 87:
-            if np.int64(val1) <= np.int64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid le_s instruction' + Colors.ENDC)
-
-    def run_le_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 77:
-            if np.uint32(val1) <= np.uint32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 88:
-            if np.uint64(val1) <= np.uint64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid le_u instruction' + Colors.ENDC)
-
-    def run_ge_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 78:
-            if np.int32(val1) >= np.int32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 89:
-            if np.int64(val1) >= np.int64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid ge_s instruction' + Colors.ENDC)
-
-    def run_ge_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 79:
-            if np.uint32(val1) >= np.uint32(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 90:
-            if np.uint64(val1) >= np.uint64(val2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid ge_u instruction' + Colors.ENDC)
-
-    def run_lt(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 93:
-            if np.float32(v1) < np.float32(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 99:
-            if np.float64(v1) < np.float64(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid lt instruction' + Colors.ENDC)
-
-    def run_gt(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 94:
-            if np.float32(v1) > np.float32(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 100:
-            if np.float64(v1) > np.float64(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid gt instruction' + Colors.ENDC)
-
-    def run_le(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 95:
-            if np.float32(v1) <= np.float32(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 101:
-            if np.float64(v1) <= np.float64(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid le instruction' + Colors.ENDC)
-
-    def run_ge(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 96:
-            if np.float32(v1) >= np.float32(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        elif opcodeint == 102:
-            if np.float64(v1) >= np.float64(v2):
-                self.machinestate.Stack_Omni.append(1)
-            else:
-                self.machinestate.Stack_Omni.append(0)
-        else:
-            raise Exception(Colors.red + 'invalid ge instruction' + Colors.ENDC)
-
-    def run_clz(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 103:
-            self.machinestate.Stack_Omni.append(clz(val, 'uint32'))
-        elif opcodeint == 121:
-            self.machinestate.Stack_Omni.append(clz(val, 'uint64'))
-        else:
-            raise Exception(Colors.red + 'invalid clz instruction' + Colors.ENDC)
-
-    def run_ctz(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 104:
-            self.machinestate.Stack_Omni.append(ctz(val, 'uint32'))
-        elif opcodeint == 122:
-            self.machinestate.Stack_Omni.append(ctz(val, 'uint64'))
-        else:
-            raise Exception(Colors.red + 'invalid ctz instruction' + Colors.ENDC)
-
-    def run_popcnt(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 105:
-            self.machinestate.Stack_Omni.append(pop_cnt(val, 'uint32'))
-        elif opcodeint == 123:
-            self.machinestate.Stack_Omni.append(pop_cnt(val, 'uint64'))
-        else:
-            raise Exception(Colors.red + 'invalid popcnt instruction' + Colors.ENDC)
-
-    def run_add(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 106:
-            self.machinestate.Stack_Omni.append(np.uint32(val1 + val2))
-        elif opcodeint == 124:
-            self.machinestate.Stack_Omni.append(np.uint64(val1 + val2))
-        elif opcodeint == 146:
-            self.machinestate.Stack_Omni.append(np.float32(val1 + val2))
-        elif opcodeint == 160:
-            self.machinestate.Stack_Omni.append(np.float64(val1 + val2))
-        else:
-            raise Exception(Colors.red + 'invalid add instruction' + Colors.ENDC)
-
-    def run_sub(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 107:
-            self.machinestate.Stack_Omni.append(np.uint32(val1 - val2))
-        elif opcodeint == 125:
-            self.machinestate.Stack_Omni.append(np.uint64(val1 - val2))
-        elif opcodeint == 147:
-            self.machinestate.Stack_Omni.append(np.float32(val1 - val2))
-        elif opcodeint == 161:
-            self.machinestate.Stack_Omni.append(np.float64(val1 - val2))
-        else:
-            raise Exception(Colors.red + 'invalid sub instruction' + Colors.ENDC)
-
-    def run_mul(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 108:
-            self.machinestate.Stack_Omni.append(np.uint32(val1 * val2))
-        elif opcodeint == 126:
-            self.machinestate.Stack_Omni.append(np.uint64(val1 * val2))
-        elif opcodeint == 148:
-            self.machinestate.Stack_Omni.append(np.float32(val1 * val2))
-        elif opcodeint == 162:
-            self.machinestate.Stack_Omni.append(np.float64(val1 * val2))
-        else:
-            raise Exception(Colors.red + 'invalid mul instruction' + Colors.ENDC)
-
-    def run_div_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 109:
-            self.machinestate.Stack_Omni.append(np.int32(np.int32(val1) / np.int32(val2)))
-        elif opcodeint == 127:
-            self.machinestate.Stack_Omni.append(np.int64(np.int64(val1) / np.int64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid div_s instruction' + Colors.ENDC)
-
-    def run_div_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 110:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) / np.uint32(val2)))
-        elif opcodeint == 128:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) / np.uint64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid div_u instruction' + Colors.ENDC)
-
-    def run_rem_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 111:
-            self.machinestate.Stack_Omni.append(np.int32(np.int32(val1) % np.int32(val2)))
-        elif opcodeint == 129:
-            self.machinestate.Stack_Omni.append(np.int64(np.int64(val1) % np.int64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid rem_s instruction' + Colors.ENDC)
-
-    def run_rem_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 112:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) % np.uint32(val2)))
-        elif opcodeint == 130:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) % np.uint64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid rem_u instruction' + Colors.ENDC)
-
-    def run_and(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 113:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) & np.uint32(val2)))
-        elif opcodeint == 131:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) & np.uint64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid and instruction' + Colors.ENDC)
-
-    def run_or(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 114:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) | np.uint32(val2)))
-        elif opcodeint == 132:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) | np.uint64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid or instruction' + Colors.ENDC)
-
-    def run_xor(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 115:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) ^ np.uint32(val2)))
-        elif opcodeint == 133:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) ^ np.uint64(val2)))
-        else:
-            raise Exception(Colors.red + 'invalid xor instruction' + Colors.ENDC)
-
-    def run_shl(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 116:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) << (np.uint32(val2))))
-        elif opcodeint == 134:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) << (np.uint64(val2))))
-        else:
-            raise Exception(Colors.red + 'invalid shl instruction' + Colors.ENDC)
-
-    def run_shr_s(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 117:
-            self.machinestate.Stack_Omni.append(np.int32(np.int32(val1) >> (np.int32(val2))))
-        elif opcodeint == 135:
-            self.machinestate.Stack_Omni.append(np.int64(np.int64(val1) >> (np.int64(val2))))
-        else:
-            raise Exception(Colors.red + 'invalid shr_s instruction' + Colors.ENDC)
-
-    def run_shr_u(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 118:
-            self.machinestate.Stack_Omni.append(np.uint32(np.uint32(val1) >> (np.uint32(val2))))
-        elif opcodeint == 136:
-            self.machinestate.Stack_Omni.append(np.uint64(np.uint64(val1) >> (np.uint64(val2))))
-        else:
-            raise Exception(Colors.red + 'invalid shr_u instruction' + Colors.ENDC)
-
-    def run_rotl(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 119:
-            self.machinestate.Stack_Omni.append(rol(val1, 32, val2))
-        elif opcodeint == 137:
-            self.machinestate.Stack_Omni.append(rol(val1, 64, val2))
-        else:
-            raise Exception(Colors.red + 'invalid rotl instruction' + Colors.ENDC)
-
-    def run_rotr(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 120:
-            self.machinestate.Stack_Omni.append(ror(val1, 32, val2))
-        elif opcodeint == 138:
-            self.machinestate.Stack_Omni.append(ror(val1, 32, val2))
-        else:
-            raise Exception(Colors.red + 'invalid rotl instruction' + Colors.ENDC)
-
-    def run_abs(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 139 or opcodeint == 153:
-            self.machinestate.Stack_Omni.append(abs(val1))
+    def run_if(self, opcodeint, immediate):
+        self.sp -= 1
+        pc = self.pc
+        if not self.values[self.sp]:
+            pc = self.targets[pc - 1]
+        gas = self.op_gas + self.gas[pc]
+        if gas > self.gas_limit:
+            self.outOfGas()
+        self.pc = pc
+        self.op_gas = gas
+
+    # only reached at the end of the then branch
+    def run_else(self, opcodeint, immediate):
+        pc = self.targets[self.pc - 1]
+        gas = self.op_gas + self.gas[pc]
+        if gas > self.gas_limit:
+            self.outOfGas()
+        self.pc = pc
+        self.op_gas = gas
+
+    def run_end(self, opcodeint, immediate):
+        if self.pc == len(self.opcodes):
+            self.returnFunction()
+
+    def run_br(self, opcodeint, immediate):
+        pc = self.pc - 1
+        self.branch(pc, self.targets[pc], self.heights[pc])
+
+    def run_br_if(self, opcodeint, immediate):
+        self.sp -= 1
+        if self.values[self.sp]:
+            pc = self.pc - 1
+            self.branch(pc, self.targets[pc], self.heights[pc])
         else:
-            raise Exception(Colors.red + 'invalid abs instruction' + Colors.ENDC)
-
-    def run_neg(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 140 or opcodeint == 154:
-            self.machinestate.Stack_Omni.append(-val1)
+            gas = self.op_gas + self.gas[self.pc]
+            if gas > self.gas_limit:
+                self.outOfGas()
+            self.op_gas = gas
+
+    def run_br_table(self, opcodeint, immediate):
+        pc = self.pc - 1
+        self.sp -= 1
+        index = self.values[self.sp]
+        table = self.frame.side_table.tables[pc]
+        # the default is the last entry
+        if index >= len(table):
+            index = len(table) - 1
+        target, height = table[index]
+        self.branch(pc, target, height)
+
+    # a branch to the function's end
+    def run_return(self, opcodeint, immediate):
+        pc = self.pc - 1
+        self.branch(pc, self.targets[pc], 0)
+
+    def run_call(self, opcodeint, immediate):
+        self.callFunction(immediate, self.pc)
+
+    def run_call_indirect(self, opcodeint, immediate):
+        self.sp -= 1
+        index = self.values[self.sp]
+        table = self.machinestate.Tables[0]
+        if index >= len(table) or table[index] is None:
+            raise Trap('undefined table element ' + repr(index))
+        func_index = table[index]
+        if self.context.types[self.context.functions[func_index]] != \
+                self.context.types[immediate]:
+            raise Trap('indirect call type mismatch')
+        self.callFunction(func_index, self.pc)
+
+    def run_drop(self, opcodeint, immediate):
+        self.sp -= 1
+
+    # both operands have the same type so the payload is all that moves
+    def run_select(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 2
+        self.sp = sp
+        if not values[sp + 1]:
+            values[sp - 1] = values[sp]
+
+    # the locals are stack slots so they are copied without looking at the
+    # type. a local's type never changes so set_local leaves its tag alone.
+    def run_getlocal(self, opcodeint, immediate):
+        sp = self.sp
+        slot = self.fp + immediate
+        self.values[sp] = self.values[slot]
+        self.tags[sp] = self.tags[slot]
+        self.sp = sp + 1
+
+    def run_setlocal(self, opcodeint, immediate):
+        sp = self.sp - 1
+        self.sp = sp
+        self.values[self.fp + immediate] = self.values[sp]
+
+    def run_teelocal(self, opcodeint, immediate):
+        self.values[self.fp + immediate] = self.values[self.sp - 1]
+
+    # the globals are kept as values
+    def run_getglobal(self, opcodeint, immediate):
+        sp = self.sp
+        val = self.machinestate.Index_Space_Global[immediate]
+        global_type = self.global_types[immediate]
+        if global_type == F32 or global_type == F64:
+            self.floats[sp] = val
         else:
-            raise Exception(Colors.red + 'invalid neg instruction' + Colors.ENDC)
-
-    def run_ceil(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 141 or opcodeint == 155:
-            self.machinestate.Stack_Omni.append(math.ceil(val1))
-        else:
-            raise Exception(Colors.red + 'invalid ceil instruction' + Colors.ENDC)
-
-    def run_floor(self, opcodeint, immediates):
-        if opcodeint == 142 or opcodeint == 156:
-            self.machinestate.Stack_Omni.append(math.floor(val1))
+            self.values[sp] = val
+        self.tags[sp] = global_type
+        self.sp = sp + 1
+
+    def run_setglobal(self, opcodeint, immediate):
+        sp = self.sp - 1
+        self.sp = sp
+        global_type = self.global_types[immediate]
+        if global_type == F32 or global_type == F64:
+            self.machinestate.Index_Space_Global[immediate] = self.floats[sp]
         else:
-            raise Exception(Colors.red + 'invalid floor instruction' + Colors.ENDC)
-
-    def run_trunc(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 143 or opcodeint == 157:
-            self.machinestate.Stack_Omni.append(math.trunc(val1))
-        else:
-            raise Exception(Colors.red + 'invalid trunc instruction' + Colors.ENDC)
-
-    def run_nearest(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 144 or opcodeint == 158:
-            self.machinestate.Stack_Omni.append(round(val1))
-        else:
-            raise Exception(Colors.red + 'invalid nearest instruction' + Colors.ENDC)
-
-    def run_sqrt(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 145 or opcodeint == 159:
-            self.machinestate.Stack_Omni.append(math.sqrt(val1))
-        else:
-            raise Exception(Colors.red + 'invalid sqrt instruction' + Colors.ENDC)
-
-    def run_div(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 149:
-            self.machinestate.Stack_Omni.append(v1 / v2)
-        else:
-            raise Exception(Colors.red + 'invalid float div instruction' + Colors.ENDC)
-
-    def run_min(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 150 or opcodeint == 164:
-            self.machinestate.Stack_Omni.append(min(val1, val2))
-        else:
-            raise Exception(Colors.red + 'invalid min instruction' + Colors.ENDC)
-
-    def run_max(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 151 or opcodeint == 165:
-            self.machinestate.Stack_Omni.append(max(val1, val2))
-        else:
-            raise Exception(Colors.red + 'invalid max instruction' + Colors.ENDC)
-
-    def run_copysign(self, opcodeint, immediates):
-        val2 = self.machinestate.Stack_Omni.pop()
-        val1 = self.machinestate.Stack_Omni.pop()
-        if opcodeint == 152 or opcodeint == 166:
-            self.machinestate.Stack_Omni.append(math.copysign(val1, val2))
-        else:
-            raise Exception(Colors.red + 'invalid max instruction' + Colors.ENDC)
-
-    def run_i32wrapi64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int32(np.float64(val1)))
-
-    def run_i32trunc_sf32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int32(np.float32(val1)))
-
-    def run_i32trunc_uf32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.uint32(np.float32(val1)))
-
-    def run_i32trunc_sf64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int32(np.float64(val1)))
-
-    def run_i32trunc_uf64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int32(np.float64(val1)))
-
-    def run_i64extend_si32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.int32(val1)))
-
-    def run_i64extend_ui32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.uint32(val1)))
-
-    def run_i64trunc_sf32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int64(np.float32(val1)))
-
-    def run_i64trunc_uf32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.uint64(np.float32(val1)))
-
-    def run_i64trunc_sf64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.int64(np.float64(val1)))
-
-    def run_i64trunc_uf64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.uint64(np.float64(val1)))
-
-    def run_f32convert_si32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float32(np.uint32(val1)))
-
-    def run_f32convert_ui32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float32(np.int32(val1)))
-
-    def run_f32convert_si64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float32(np.int64(val1)))
-
-    def run_f32convert_ui64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float32(np.uint64(val1)))
-
-    def run_f32demotef64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float32(np.float64(val1)))
-
-    def run_f64convert_si32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.int32(val1)))
-
-    def run_f64convert_ui32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.uint32(val1)))
-
-    def run_f64convert_si64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.int64(val1)))
-
-    def run_f64convert_ui64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.uint64(val1)))
-
-    def run_f64promotef32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        self.machinestate.Stack_Omni.append(np.float64(np.float32(val1)))
-
-    def run_i32reinterpretf32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        sel.machinestate.Stack_Omni.append(reinterpretf32toi32(val1))
-
-    def run_i64reinterpretf64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        sel.machinestate.Stack_Omni.append(reinterpretf64toi64(val1))
-
-    def run_f32reinterpreti32(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        sel.machinestate.Stack_Omni.append(reinterpreti32tof32(val1))
+            self.machinestate.Index_Space_Global[immediate] = self.values[sp]
+
+    # the address is an unsigned i32 and the offset an unsigned immediate so
+    # the effective address can only be out of bounds at the top
+    def run_i32load(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U32(self.memory, address)[0]
+
+    def run_i64load(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 8 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U64(self.memory, address)[0]
+        self.tags[sp] = I64
+
+    def run_f32load(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.floats[sp] = Load_F32(self.memory, address)[0]
+        self.tags[sp] = F32
+
+    # f64s move as their bits so the NaN payloads survive
+    def run_f64load(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 8 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U64(self.memory, address)[0]
+        self.tags[sp] = F64
+
+    # the signed loads sign-extend to a python int that gets wrapped to the
+    # bit pattern
+    def run_i32load8_s(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_S8(self.memory, address)[0] & 0xffffffff
+
+    def run_i32load8_u(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U8(self.memory, address)[0]
+
+    def run_i32load16_s(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_S16(self.memory, address)[0] & 0xffffffff
+
+    def run_i32load16_u(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U16(self.memory, address)[0]
+
+    def run_i64load8_s(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_S8(self.memory, address)[0] & 0xffffffffffffffff
+        self.tags[sp] = I64
+
+    def run_i64load8_u(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U8(self.memory, address)[0]
+        self.tags[sp] = I64
+
+    def run_i64load16_s(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_S16(self.memory, address)[0] & 0xffffffffffffffff
+        self.tags[sp] = I64
+
+    def run_i64load16_u(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U16(self.memory, address)[0]
+        self.tags[sp] = I64
+
+    def run_i64load32_s(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_S32(self.memory, address)[0] & 0xffffffffffffffff
+        self.tags[sp] = I64
+
+    def run_i64load32_u(self, opcodeint, immediate):
+        sp = self.sp - 1
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        self.values[sp] = Load_U32(self.memory, address)[0]
+        self.tags[sp] = I64
+
+    def run_i32store(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_32(self.memory, address, self.values[sp + 1])
+
+    def run_i64store(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 8 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_64(self.memory, address, self.values[sp + 1])
+
+    def run_f32store(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_F32(self.memory, address, self.floats[sp + 1])
+
+    def run_f64store(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 8 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_64(self.memory, address, self.values[sp + 1])
+
+    # the narrow stores wrap the value
+    def run_i32store8(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_8(self.memory, address, self.values[sp + 1] & 0xff)
+
+    def run_i32store16(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_16(self.memory, address, self.values[sp + 1] & 0xffff)
+
+    def run_i64store8(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 1 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_8(self.memory, address, self.values[sp + 1] & 0xff)
+
+    def run_i64store16(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 2 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_16(self.memory, address, self.values[sp + 1] & 0xffff)
+
+    def run_i64store32(self, opcodeint, immediate):
+        sp = self.sp - 2
+        self.sp = sp
+        address = self.values[sp] + immediate
+        if address + 4 > self.memory_size:
+            raise Trap('out of bounds memory access')
+        Store_32(self.memory, address, self.values[sp + 1] & 0xffffffff)
+
+
+    def run_current_memory(self, opcodeint, immediate):
+        sp = self.sp
+        self.values[sp] = self.memory_instance.pages
+        self.tags[sp] = I32
+        self.sp = sp + 1
+
+    # pushes the old size in pages or -1 if the memory can't grow that far
+    # the pages are paid for once they are granted, a grow that fails costs
+    # nothing extra. one that would fit but can't be paid for runs out of gas
+    # before the memory changes.
+    def run_grow_memory(self, opcodeint, immediate):
+        sp = self.sp - 1
+        delta = self.values[sp]
+        memory_instance = self.memory_instance
+        if delta <= memory_instance.maximum - memory_instance.pages and \
+                self.op_gas + self.schedule.page_cost * delta > self.gas_limit:
+            self.outOfGas()
+        old_pages = memory_instance.grow(delta)
+        if old_pages != -1:
+            self.chargeGasMem(delta)
+        self.values[sp] = old_pages & 0xffffffff
+        self.enterMemory()
+
+    # the immediates are signed
+    def run_i32const(self, opcodeint, immediate):
+        sp = self.sp
+        self.values[sp] = immediate & 0xffffffff
+        self.tags[sp] = I32
+        self.sp = sp + 1
+
+    def run_i64const(self, opcodeint, immediate):
+        sp = self.sp
+        self.values[sp] = immediate & 0xffffffffffffffff
+        self.tags[sp] = I64
+        self.sp = sp + 1
+
+    # the float constants are not ints so they live in the side dict
+    def run_f32const(self, opcodeint, immediate):
+        sp = self.sp
+        self.floats[sp] = self.side[self.pc - 1][0]
+        self.tags[sp] = F32
+        self.sp = sp + 1
+
+    def run_f64const(self, opcodeint, immediate):
+        sp = self.sp
+        self.floats[sp] = self.side[self.pc - 1][0]
+        self.tags[sp] = F64
+        self.sp = sp + 1
+
+    def run_i32eqz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = 1 if values[sp] == 0 else 0
+
+    def run_i32eq(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] == values[sp] else 0
+
+    def run_i32ne(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] != values[sp] else 0
+
+    # flipping the sign bit orders the signed values like unsigned ones
+    def run_i32lt_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x80000000) < (values[sp] ^ 0x80000000) else 0
+
+    def run_i32lt_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] < values[sp] else 0
+
+    def run_i32gt_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x80000000) > (values[sp] ^ 0x80000000) else 0
+
+    def run_i32gt_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] > values[sp] else 0
+
+    def run_i32le_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x80000000) <= (values[sp] ^ 0x80000000) else 0
+
+    def run_i32le_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] <= values[sp] else 0
+
+    def run_i32ge_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x80000000) >= (values[sp] ^ 0x80000000) else 0
+
+    def run_i32ge_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] >= values[sp] else 0
+
+    def run_i64eqz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = 1 if values[sp] == 0 else 0
+        self.tags[sp] = I32
+
+    def run_i64eq(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] == values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64ne(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] != values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64lt_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x8000000000000000) < (values[sp] ^ 0x8000000000000000) else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64lt_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] < values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64gt_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x8000000000000000) > (values[sp] ^ 0x8000000000000000) else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64gt_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] > values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64le_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x8000000000000000) <= (values[sp] ^ 0x8000000000000000) else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64le_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] <= values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64ge_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if (values[sp - 1] ^ 0x8000000000000000) >= (values[sp] ^ 0x8000000000000000) else 0
+        self.tags[sp - 1] = I32
+
+    def run_i64ge_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = 1 if values[sp - 1] >= values[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32eq(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] == floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32ne(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] != floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32lt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] < floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32gt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] > floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32le(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] <= floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f32ge(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] >= floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64eq(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] == floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64ne(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] != floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64lt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] < floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64gt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] > floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64le(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] <= floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_f64ge(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        values = self.values
+        values[sp - 1] = 1 if floats[sp - 1] >= floats[sp] else 0
+        self.tags[sp - 1] = I32
+
+    def run_i32clz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Clz(values[sp], 32)
+
+    def run_i32ctz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Ctz(values[sp], 32)
+
+    def run_i32popcnt(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Popcnt(values[sp])
+
+    def run_i32add(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] + values[sp]) & 0xffffffff
+
+    def run_i32sub(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] - values[sp]) & 0xffffffff
+
+    def run_i32mul(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] * values[sp]) & 0xffffffff
+
+    def run_i32div_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = DivS(values[sp - 1], values[sp], 32)
+
+    def run_i32div_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = DivU(values[sp - 1], values[sp])
+
+    def run_i32rem_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = RemS(values[sp - 1], values[sp], 32)
+
+    def run_i32rem_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = RemU(values[sp - 1], values[sp])
+
+    def run_i32and(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] & values[sp]
+
+    def run_i32or(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] | values[sp]
+
+    def run_i32xor(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] ^ values[sp]
+
+    # the shift counts are taken modulo the width
+    def run_i32shl(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] << (values[sp] & 31)) & 0xffffffff
+
+    def run_i32shr_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (Signed32(values[sp - 1]) >> (values[sp] & 31)) & 0xffffffff
+
+    def run_i32shr_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] >> (values[sp] & 31)
+
+    def run_i32rotl(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        val1 = values[sp - 1]
+        val2 = values[sp] & 31
+        values[sp - 1] = ((val1 << val2) | (val1 >> (32 - val2))) & 0xffffffff
+
+    def run_i32rotr(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        val1 = values[sp - 1]
+        val2 = values[sp] & 31
+        values[sp - 1] = ((val1 >> val2) | (val1 << (32 - val2))) & 0xffffffff
+
+    def run_i64clz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Clz(values[sp], 64)
+
+    def run_i64ctz(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Ctz(values[sp], 64)
+
+    def run_i64popcnt(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Popcnt(values[sp])
+
+    def run_i64add(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] + values[sp]) & 0xffffffffffffffff
+
+    def run_i64sub(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] - values[sp]) & 0xffffffffffffffff
+
+    def run_i64mul(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] * values[sp]) & 0xffffffffffffffff
+
+    def run_i64div_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = DivS(values[sp - 1], values[sp], 64)
+
+    def run_i64div_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = DivU(values[sp - 1], values[sp])
+
+    def run_i64rem_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = RemS(values[sp - 1], values[sp], 64)
+
+    def run_i64rem_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = RemU(values[sp - 1], values[sp])
+
+    def run_i64and(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] & values[sp]
+
+    def run_i64or(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] | values[sp]
+
+    def run_i64xor(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] ^ values[sp]
+
+    def run_i64shl(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (values[sp - 1] << (values[sp] & 63)) & 0xffffffffffffffff
+
+    def run_i64shr_s(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = (Signed64(values[sp - 1]) >> (values[sp] & 63)) & 0xffffffffffffffff
+
+    def run_i64shr_u(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        values[sp - 1] = values[sp - 1] >> (values[sp] & 63)
+
+    def run_i64rotl(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        val1 = values[sp - 1]
+        val2 = values[sp] & 63
+        values[sp - 1] = ((val1 << val2) | (val1 >> (64 - val2))) & 0xffffffffffffffff
+
+    def run_i64rotr(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        self.sp = sp
+        val1 = values[sp - 1]
+        val2 = values[sp] & 63
+        values[sp - 1] = ((val1 >> val2) | (val1 << (64 - val2))) & 0xffffffffffffffff
+
+    def run_f32abs(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = math.fabs(floats[sp])
+
+    def run_f32neg(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = -floats[sp]
+
+    def run_f32ceil(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FCeil(floats[sp])
+
+    def run_f32floor(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FFloor(floats[sp])
+
+    def run_f32trunc(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FTrunc(floats[sp])
+
+    def run_f32nearest(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FNearest(floats[sp])
+
+    def run_f32sqrt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = RoundF32(FSqrt(floats[sp]))
+
+    # the exact result rounded to double and then to single precision is
+    # the correctly rounded single precision one
+    def run_f32add(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = RoundF32(floats[sp - 1] + floats[sp])
+
+    def run_f32sub(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = RoundF32(floats[sp - 1] - floats[sp])
+
+    def run_f32mul(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = RoundF32(floats[sp - 1] * floats[sp])
+
+    def run_f32div(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = RoundF32(FDiv(floats[sp - 1], floats[sp]))
+
+    def run_f32min(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = FMin(floats[sp - 1], floats[sp])
+
+    def run_f32max(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = FMax(floats[sp - 1], floats[sp])
+
+    def run_f32copysign(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = math.copysign(floats[sp - 1], floats[sp])
+
+    def run_f64abs(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = math.fabs(floats[sp])
+
+    def run_f64neg(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = -floats[sp]
+
+    def run_f64ceil(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FCeil(floats[sp])
+
+    def run_f64floor(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FFloor(floats[sp])
+
+    def run_f64trunc(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FTrunc(floats[sp])
+
+    def run_f64nearest(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FNearest(floats[sp])
+
+    def run_f64sqrt(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = FSqrt(floats[sp])
+
+    def run_f64add(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = floats[sp - 1] + floats[sp]
+
+    def run_f64sub(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = floats[sp - 1] - floats[sp]
+
+    def run_f64mul(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = floats[sp - 1] * floats[sp]
+
+    def run_f64div(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = FDiv(floats[sp - 1], floats[sp])
+
+    def run_f64min(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = FMin(floats[sp - 1], floats[sp])
+
+    def run_f64max(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = FMax(floats[sp - 1], floats[sp])
+
+    def run_f64copysign(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        self.sp = sp
+        floats[sp - 1] = math.copysign(floats[sp - 1], floats[sp])
+
+    def run_i32wrapi64(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = values[sp] & 0xffffffff
+        self.tags[sp] = I32
+
+    def run_i32trunc_sf32(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], -0x80000000, 0x80000000, 32)
+        self.tags[sp] = I32
+
+    def run_i32trunc_uf32(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], 0, 0x100000000, 32)
+        self.tags[sp] = I32
+
+    def run_i32trunc_sf64(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], -0x80000000, 0x80000000, 32)
+        self.tags[sp] = I32
+
+    def run_i32trunc_uf64(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], 0, 0x100000000, 32)
+        self.tags[sp] = I32
+
+    def run_i64extend_si32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        values[sp] = Signed32(values[sp]) & 0xffffffffffffffff
+        self.tags[sp] = I64
+
+    # the bits are already right
+    def run_i64extend_ui32(self, opcodeint, immediate):
+        self.tags[self.sp - 1] = I64
+
+    def run_i64trunc_sf32(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], -0x8000000000000000, 0x8000000000000000, 64)
+        self.tags[sp] = I64
+
+    def run_i64trunc_uf32(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], 0, 0x10000000000000000, 64)
+        self.tags[sp] = I64
+
+    def run_i64trunc_sf64(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], -0x8000000000000000, 0x8000000000000000, 64)
+        self.tags[sp] = I64
+
+    def run_i64trunc_uf64(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = Trunc(floats[sp], 0, 0x10000000000000000, 64)
+        self.tags[sp] = I64
+
+    def run_f32convert_si32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = RoundF32(float(Signed32(values[sp])))
+        self.tags[sp] = F32
+
+    def run_f32convert_ui32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = RoundF32(float(values[sp]))
+        self.tags[sp] = F32
+
+    def run_f32convert_si64(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = IntToF32(Signed64(values[sp]))
+        self.tags[sp] = F32
+
+    def run_f32convert_ui64(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = IntToF32(values[sp])
+        self.tags[sp] = F32
+
+    def run_f32demotef64(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        floats[sp] = RoundF32(floats[sp])
+        self.tags[sp] = F32
+
+    def run_f64convert_si32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = float(Signed32(values[sp]))
+        self.tags[sp] = F64
+
+    def run_f64convert_ui32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = float(values[sp])
+        self.tags[sp] = F64
+
+    def run_f64convert_si64(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = float(Signed64(values[sp]))
+        self.tags[sp] = F64
+
+    def run_f64convert_ui64(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = float(values[sp])
+        self.tags[sp] = F64
+
+    # every f32 is a double already
+    def run_f64promotef32(self, opcodeint, immediate):
+        self.tags[self.sp - 1] = F64
+
+    def run_i32reinterpretf32(self, opcodeint, immediate):
+        floats = self.floats
+        sp = self.sp - 1
+        values = self.values
+        values[sp] = I32ReinterpretF32(floats[sp])
+        self.tags[sp] = I32
+
+    # the payload is the double's bits already so only the type changes
+    def run_i64reinterpretf64(self, opcodeint, immediate):
+        self.tags[self.sp - 1] = I64
+
+    def run_f32reinterpreti32(self, opcodeint, immediate):
+        values = self.values
+        sp = self.sp - 1
+        floats = self.floats
+        floats[sp] = F32ReinterpretI32(values[sp])
+        self.tags[sp] = F32
+
+    def run_f64reinterpreti64(self, opcodeint, immediate):
+        self.tags[self.sp - 1] = F64
 
-    def run_f64reinterpreti64(self, opcodeint, immediates):
-        val1 = self.machinestate.Stack_Omni.pop()
-        sel.machinestate.Stack_Omni.append(reinterpreti64tof64(val1))
@@ -0,0 +1,74 @@
+from array import array
+from OpCodes import Op_Names
+from utils import Colors
+from predecode import Default_Costs
+import json
+
+# gas schedules. a schedule prices every opcode and every page grow_memory
+# adds. it is compiled into a 256 entry cost array indexed by the opcode that
+# predecode.BuildBlockGas folds into the block costs of every body, so a
+# schedule costs nothing extra at run time.
+# a schedule file is a json object. every key is optional:
+#   {"default": 1, "memory_page": 64, "opcodes": {"i32.load": 3, "call": 5}}
+# default is the cost of the opcodes the file doesn't name. the opcode names
+# are the mnemonics of WASM_OP_Code.
+
+Default_Page_Cost = 64
+
+# mnemonic -> opcode byte. WASM_OP_Code spells i64.rotr as i63.rotr, both
+# work.
+Op_Codes = dict()
+for opcodeint, name in enumerate(Op_Names):
+    if name is not None:
+        Op_Codes[name] = opcodeint
+Op_Codes['i64.rotr'] = 0x8a
+
+
+class Gas_Schedule():
+    def __init__(self, costs=Default_Costs, page_cost=Default_Page_Cost):
+        self.costs = costs
+        self.page_cost = page_cost
+
+    # whether the opcode costs are the ones the side tables were built with
+    def isDefault(self):
+        return(self.costs == Default_Costs)
+
+
+def CheckCost(cost, what):
+    if not isinstance(cost, int) or isinstance(cost, bool) or cost < 0:
+        raise Exception(Colors.red + 'the gas cost of ' + what +
+                        ' is not a non-negative integer: ' + repr(cost) + Colors.ENDC)
+    return(cost)
+
+
+# builds a Gas_Schedule out of a schedule's object, i.e. a parsed schedule
+# file
+def MakeGasSchedule(schedule):
+    if not isinstance(schedule, dict):
+        raise Exception(Colors.red + 'a gas schedule is a json object' + Colors.ENDC)
+    for key in schedule:
+        if key not in ('default', 'memory_page', 'opcodes'):
+            raise Exception(Colors.red + 'unknown gas schedule key: ' + key + Colors.ENDC)
+    default = CheckCost(schedule.get('default', 1), 'the default')
+    costs = array('l', [default]) * 256
+    opcodes = schedule.get('opcodes', dict())
+    if not isinstance(opcodes, dict):
+        raise Exception(Colors.red + 'the opcodes of a gas schedule are a json object' +
+                        Colors.ENDC)
+    for name, cost in opcodes.items():
+        if name not in Op_Codes:
+            raise Exception(Colors.red + 'unknown opcode in the gas schedule: ' + name +
+                            Colors.ENDC)
+        costs[Op_Codes[name]] = CheckCost(cost, name)
+    page_cost = CheckCost(schedule.get('memory_page', Default_Page_Cost), 'a memory page')
+    return(Gas_Schedule(costs, page_cost))
+
+
+def LoadGasSchedule(file_path):
+    with open(file_path, 'r') as schedule_file:
+        try:
+            schedule = json.load(schedule_file)
+        except ValueError as error:
+            raise Exception(Colors.red + 'failed to parse the gas schedule ' + file_path +
+                            ': ' + str(error) + Colors.ENDC)
+    return(MakeGasSchedule(schedule))
@@ -0,0 +1,401 @@
+from section_structs import Gas_Bound
+from validator import Validation_Context, Function_Block, Max_Pages
+from predecode import BuildCFG
+from gas import Gas_Schedule
+
+# static worst-case gas bounds. the bound of a function is the gas of the
+# most expensive path through its control-flow graph, where a call costs the
+# bound of the callee and a loop costs its trip count times its most
+# expensive iteration. loops are collapsed from the inside out so the graph
+# that is left is acyclic. grow_memory only pays for the pages it is granted,
+# which are never more than the memory's maximum minus its initial size. a
+# function has no bound if it takes part in a recursion, calls call_indirect
+# or an import or has a loop whose trip count isn't known statically.
+# the trip counts that are known are the ones of loops that count a local
+# from a constant by a constant step and leave once it passes a constant,
+# the loops C compilers emit for fixed for loops:
+#   x = c; loop ... x = x + s ... br_if 0 (x cmp N) end
+#   x = c; loop br_if exit (x cmp N) ... x = x + s; br 0 end
+# the local may not be written anywhere else in the loop, the increment and
+# the compare have to run on every iteration, i.e. sit at the loop's own
+# level, and the value the local enters the loop with has to be known: a
+# constant set in front of the loop or, for a loop that isn't in another one,
+# the zero a local starts as.
+
+# compare opcode -> (compare, bits, signed). eq and ne don't care about the
+# sign and the unsigned reading is as good as any.
+Compares = {0x46: ('eq', 32, False), 0x47: ('ne', 32, False), 0x48: ('lt', 32, True),
+            0x49: ('lt', 32, False), 0x4a: ('gt', 32, True), 0x4b: ('gt', 32, False),
+            0x4c: ('le', 32, True), 0x4d: ('le', 32, False), 0x4e: ('ge', 32, True),
+            0x4f: ('ge', 32, False), 0x51: ('eq', 64, False), 0x52: ('ne', 64, False),
+            0x53: ('lt', 64, True), 0x54: ('lt', 64, False), 0x55: ('gt', 64, True),
+            0x56: ('gt', 64, False), 0x57: ('le', 64, True), 0x58: ('le', 64, False),
+            0x59: ('ge', 64, True), 0x5a: ('ge', 64, False)}
+Negated = {'eq': 'ne', 'ne': 'eq', 'lt': 'ge', 'ge': 'lt', 'gt': 'le', 'le': 'gt'}
+# bits -> (value type, const opcode, add opcode, sub opcode)
+Int_Ops = {32: (0x7f, 0x41, 0x6a, 0x6b), 64: (0x7e, 0x42, 0x7c, 0x7d)}
+
+
+def Compare(compare, val1, val2):
+    if compare == 'eq':
+        return(val1 == val2)
+    elif compare == 'ne':
+        return(val1 != val2)
+    elif compare == 'lt':
+        return(val1 < val2)
+    elif compare == 'gt':
+        return(val1 > val2)
+    elif compare == 'le':
+        return(val1 <= val2)
+    return(val1 >= val2)
+
+
+# the number of iterations of a loop whose counter starts at entry and moves
+# by step every iteration, and that ends in the first iteration where
+# compare(counter, limit) holds. offset is 1 if the counter was already
+# stepped when the compare runs and 0 if not. entry and limit are bit
+# patterns of bits bits, read as signed numbers if signed. None if the loop
+# doesn't end before the counter wraps.
+def TripCount(entry, step, limit, compare, bits, signed, offset):
+    if signed:
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    else:
+        low, high = 0, (1 << bits) - 1
+    mask = (1 << bits) - 1
+    entry &= mask
+    limit &= mask
+    if signed:
+        if entry > high:
+            entry -= 1 << bits
+        if limit > high:
+            limit -= 1 << bits
+    # the counter when the first iteration compares it
+    first = entry + offset * step
+    if first < low or first > high:
+        return(None)
+    if Compare(compare, first, limit):
+        return(1)
+    if step == 0:
+        return(None)
+    if compare == 'ne':
+        last = first + step
+    elif compare == 'eq':
+        if (limit - first) % step != 0 or (limit - first) // step < 0:
+            return(None)
+        last = limit
+    elif (compare == 'ge' or compare == 'gt') and step > 0:
+        target = limit if compare == 'ge' else limit + 1
+        last = first + -(-(target - first) // step) * step
+    elif (compare == 'le' or compare == 'lt') and step < 0:
+        target = limit if compare == 'le' else limit - 1
+        last = first - -(-(first - target) // -step) * -step
+    else:
+        return(None)
+    if last < low or last > high:
+        return(None)
+    return((last - first) // step + 1)
+
+
+class GasBoundAnalysis():
+    def __init__(self, module, schedule):
+        self.context = Validation_Context(
+            module.type_section, module.import_section, module.function_section,
+            module.table_section, module.memory_section, module.global_section)
+        self.func_bodies = []
+        if module.code_section is not None:
+            self.func_bodies = module.code_section.func_bodies
+        self.costs = schedule.costs
+        self.page_cost = schedule.page_cost
+        # the most pages a grow_memory can be granted
+        self.grow_pages = Max_Pages
+        if module.memory_section is not None and module.memory_section.memory_types:
+            memory_type = module.memory_section.memory_types[0]
+            maximum = Max_Pages
+            if memory_type.flags and memory_type.maximum < maximum:
+                maximum = memory_type.maximum
+            self.grow_pages = max(maximum - memory_type.initial, 0)
+        self.bounds = [None] * (self.context.imported_funcs + len(self.func_bodies))
+        # the functions whose bounds are being worked out. a call to one of
+        # them is a recursion.
+        self.visiting = set()
+
+    # the Gas_Bound of every function, indexed by the function index
+    def run(self):
+        for func_index in range(len(self.bounds)):
+            self.getBound(func_index)
+        return(self.bounds)
+
+    def getBound(self, func_index):
+        if self.bounds[func_index] is not None:
+            return(self.bounds[func_index])
+        if func_index < self.context.imported_funcs:
+            bound = Gas_Bound(None, func_index, 0, 'imported function')
+        else:
+            func_body = self.func_bodies[func_index - self.context.imported_funcs]
+            if func_body.code is None or func_body.side_table is None:
+                bound = Gas_Bound(None, func_index, 0, 'function that has not been validated')
+            else:
+                self.visiting.add(func_index)
+                bound = self.getBodyBound(func_index, func_body)
+                self.visiting.discard(func_index)
+        self.bounds[func_index] = bound
+        return(bound)
+
+    # the gas of a basic block, or the Gas_Bound of why it has none
+    def getBlockGas(self, func_index, code, block):
+        opcodes = code.opcodes
+        immediates = code.immediates
+        gas = 0
+        for pc in range(block.start, block.end + 1):
+            opcodeint = opcodes[pc]
+            gas += self.costs[opcodeint]
+            if opcodeint == 0x10:
+                callee = immediates[pc]
+                if callee in self.visiting:
+                    return(Gas_Bound(None, func_index, pc,
+                                     'recursive call to function ' + repr(callee)))
+                bound = self.getBound(callee)
+                if bound.gas is None:
+                    # an import or a body that wasn't validated has nothing
+                    # to point at, the call is the reason. a loop or a
+                    # recursion in the callee is.
+                    if callee < self.context.imported_funcs:
+                        return(Gas_Bound(None, func_index, pc,
+                                         'call to imported function ' + repr(callee)))
+                    callee_body = self.func_bodies[callee - self.context.imported_funcs]
+                    if callee_body.code is None or callee_body.side_table is None:
+                        return(Gas_Bound(None, func_index, pc, 'call to function ' +
+                                         repr(callee) + ' that has not been validated'))
+                    return(bound)
+                gas += bound.gas
+            elif opcodeint == 0x11:
+                return(Gas_Bound(None, func_index, pc, 'call_indirect'))
+            elif opcodeint == 0x40:
+                # a constant delta over what can be granted always fails
+                pages = self.grow_pages
+                if pc > block.start and opcodes[pc - 1] == 0x41:
+                    delta = immediates[pc - 1] & 0xffffffff
+                    pages = delta if delta <= pages else 0
+                gas += pages * self.page_cost
+        return(gas)
+
+    def getBodyBound(self, func_index, func_body):
+        code = func_body.code
+        blocks = BuildCFG(func_body)
+        gas = dict()
+        successors = dict()
+        for block in blocks:
+            block_gas = self.getBlockGas(func_index, code, block)
+            if isinstance(block_gas, Gas_Bound):
+                return(block_gas)
+            gas[block.start] = block_gas
+            successors[block.start] = block.successors
+        owners = GetOwners(func_body)
+        # the block a collapsed block went into
+        merged = dict()
+
+        def find(start):
+            while start in merged:
+                start = merged[start]
+            return(start)
+
+        # the blocks of a loop are the ones from its header up to its end,
+        # which only runs once the loop is left. inner loops are shorter so
+        # they are collapsed first.
+        loops = sorted([(block[4] - pc, pc) for pc, block in func_body.blocks.items()
+                        if block[0] == 0x03])
+        for length, loop_pc in loops:
+            end_pc = func_body.blocks[loop_pc][4]
+            back_edges = sorted([pc for pc, branch_targets in func_body.branches.items()
+                                 if loop_pc in branch_targets])
+            if not back_edges:
+                continue
+            trips = self.getTripCount(func_body, loop_pc, end_pc, back_edges, owners)
+            if trips is None:
+                return(Gas_Bound(None, func_index, loop_pc,
+                                 'loop without a static trip count'))
+            header = loop_pc + 1
+            members = [start for start in gas if header <= start < end_pc and
+                       find(start) == start]
+            iteration, exits = LongestPath(members, header, gas, successors, find)
+            gas[header] = trips * iteration
+            successors[header] = exits
+            for start in members:
+                if start != header:
+                    merged[start] = header
+
+        members = [start for start in gas if find(start) == start]
+        longest, exits = LongestPath(members, 0, gas, successors, find)
+        return(Gas_Bound(longest, func_index))
+
+    # the trip count of the loop from the exits the back edge or the
+    # branches that leave it test, the smallest if there are several. None if
+    # none of them has one.
+    def getTripCount(self, func_body, loop_pc, end_pc, back_edges, owners):
+        opcodes = func_body.code.opcodes
+        if len(back_edges) != 1:
+            return(None)
+        back_edge = back_edges[0]
+        if owners[back_edge] != loop_pc:
+            return(None)
+        # (the exit's condition, whether the loop ends when it holds)
+        exits = []
+        if opcodes[back_edge] == 0x0d:
+            exits.append((GetCondition(func_body, back_edge, owners), False))
+        elif opcodes[back_edge] != 0x0c:
+            return(None)
+        for pc in range(loop_pc + 1, back_edge):
+            # blocks inside the loop start after it, a target in front of it
+            # is outside
+            if opcodes[pc] == 0x0d and owners[pc] == loop_pc and \
+                    func_body.branches[pc][-1] < loop_pc:
+                exits.append((GetCondition(func_body, pc, owners), True))
+
+        trip_count = None
+        for condition, ends_if_true in exits:
+            if condition is None:
+                continue
+            trips = self.getExitTrips(func_body, loop_pc, end_pc, back_edge, owners, condition,
+                                      ends_if_true)
+            if trips is not None and (trip_count is None or trips < trip_count):
+                trip_count = trips
+        return(trip_count)
+
+    def getExitTrips(self, func_body, loop_pc, end_pc, back_edge, owners, condition,
+                     ends_if_true):
+        code = func_body.code
+        opcodes = code.opcodes
+        immediates = code.immediates
+        read_pc, local_index, const_op, limit, compare_op = condition
+        compare, bits, signed = Compares[compare_op]
+        value_type, bits_const_op, add_op, sub_op = Int_Ops[bits]
+        if func_body.local_types[local_index] != value_type or const_op != bits_const_op:
+            return(None)
+        writes = [pc for pc in range(loop_pc, end_pc + 1)
+                  if (opcodes[pc] == 0x21 or opcodes[pc] == 0x22) and
+                  immediates[pc] == local_index]
+        if len(writes) != 1:
+            return(None)
+        write = writes[0]
+        # x = x + s, once per iteration
+        if owners[write] != loop_pc or write > back_edge or write < 3 or \
+                opcodes[write - 3] != 0x20 or immediates[write - 3] != local_index or \
+                opcodes[write - 2] != const_op or opcodes[write - 1] not in (add_op, sub_op):
+            return(None)
+        step = immediates[write - 2]
+        if opcodes[write - 1] == sub_op:
+            step = -step
+        # the compare reads the local after the increment or before it
+        offset = 1 if write <= read_pc else 0
+        entry = GetEntryValue(func_body, loop_pc, end_pc, local_index, const_op, owners)
+        if entry is None:
+            return(None)
+        if not ends_if_true:
+            compare = Negated[compare]
+        return(TripCount(entry, step, limit, compare, bits, signed, offset))
+
+
+# the pc of the innermost block, loop or if every pc is in, Function_Block
+# for the ones at the function's level. the end of a block is in the block.
+def GetOwners(func_body):
+    opcodes = func_body.code.opcodes
+    owners = [Function_Block] * len(opcodes)
+    open_blocks = [Function_Block]
+    for pc, opcodeint in enumerate(opcodes):
+        owners[pc] = open_blocks[-1]
+        if opcodeint in (0x02, 0x03, 0x04):
+            open_blocks.append(pc)
+        elif opcodeint == 0x0b and open_blocks[-1] != Function_Block and \
+                func_body.blocks[open_blocks[-1]][4] == pc:
+            open_blocks.pop()
+    return(owners)
+
+
+# the condition of a br_if if it is (get_local x | tee_local x) (const N)
+# (compare), as (pc of the local's read, x, const opcode, N, compare opcode).
+# None if it isn't.
+def GetCondition(func_body, pc, owners):
+    code = func_body.code
+    opcodes = code.opcodes
+    if pc < 3 or opcodes[pc - 1] not in Compares or opcodes[pc - 2] not in (0x41, 0x42) or \
+            opcodes[pc - 3] not in (0x20, 0x22):
+        return(None)
+    if owners[pc - 3] != owners[pc]:
+        return(None)
+    return((pc - 3, code.immediates[pc - 3], opcodes[pc - 2], code.immediates[pc - 2],
+            opcodes[pc - 1]))
+
+
+# the value a local has whenever the loop is entered. None if it isn't known.
+def GetEntryValue(func_body, loop_pc, end_pc, local_index, const_op, owners):
+    code = func_body.code
+    opcodes = code.opcodes
+    # every entry into the loop comes by way of the loop it is in, or the
+    # function's start
+    outer = owners[loop_pc]
+    while outer != Function_Block and opcodes[outer] != 0x03:
+        outer = owners[outer]
+    if outer == Function_Block:
+        start, end = 0, len(opcodes) - 1
+    else:
+        start, end = outer, func_body.blocks[outer][4]
+    writes = [pc for pc in range(start, end + 1)
+              if not loop_pc <= pc <= end_pc and (opcodes[pc] == 0x21 or opcodes[pc] == 0x22) and
+              code.immediates[pc] == local_index]
+    if not writes:
+        if outer == Function_Block and local_index >= func_body.param_count:
+            return(0)
+        return(None)
+    write = writes[0]
+    if len(writes) != 1 or write > loop_pc or opcodes[write - 1] != const_op:
+        return(None)
+    # the write has to run before every entry, so it can't be in a block the
+    # loop isn't in
+    enclosing = set([Function_Block])
+    owner = owners[loop_pc]
+    while owner != Function_Block:
+        enclosing.add(owner)
+        owner = owners[owner]
+    if owners[write] not in enclosing:
+        return(None)
+    return(code.immediates[write - 1])
+
+
+# the gas of the most expensive path from start through the members, the
+# blocks of a loop or of the whole body in the order of their pcs. branches
+# back to start are a loop's back edges and end the path. returns the gas and
+# the blocks outside the members the paths can leave to.
+def LongestPath(members, start, gas, successors, find):
+    member_set = set(members)
+    longest = {start: gas[start]}
+    exits = []
+    for member in sorted(members):
+        if member not in longest:
+            continue
+        for successor in successors[member]:
+            successor = find(successor)
+            if successor == start:
+                continue
+            if successor in member_set:
+                if successor > member and \
+                        longest.get(successor, -1) < longest[member] + gas[successor]:
+                    longest[successor] = longest[member] + gas[successor]
+            elif successor not in exits:
+                exits.append(successor)
+    return(max(longest.values()), exits)
+
+
+# the Gas_Bound of every function of the module, indexed by the function
+# index. the bounds under the default schedule are kept with the code section
+# so they get cached with the module.
+def GetGasBounds(module, schedule=None):
+    code_section = module.code_section
+    default = schedule is None or schedule.isDefault()
+    if default and code_section is not None and code_section.gas_bounds is not None:
+        return(code_section.gas_bounds)
+    if schedule is None:
+        schedule = Gas_Schedule()
+    bounds = GasBoundAnalysis(module, schedule).run()
+    if default and code_section is not None:
+        code_section.gas_bounds = bounds
+    return(bounds)
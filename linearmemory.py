@@ -0,0 +1,94 @@
+from OpCodes import WASM_OP_Code
+from utils import Colors
+from validator import Max_Pages
+import mmap
+import sys
+
+# a linear memory. the pages live in an anonymous mapping that reserves the
+# address space for the memory's maximum up front, so growing it only moves
+# the size and never copies. the OS hands out zero pages on first touch so
+# pages that are never written cost nothing. if the reservation fails, e.g.
+# under an address space limit, the mapping only covers the current size and
+# grow falls back to mapping a bigger one and copying.
+
+Page_Size = WASM_OP_Code.PAGE_SIZE
+# without MAP_NORESERVE the whole reservation is charged against the commit
+# limit, which also makes fork fail with a few memories around. older mmap
+# modules don't export it.
+if hasattr(mmap, 'MAP_NORESERVE'):
+    Map_NoReserve = mmap.MAP_NORESERVE
+elif sys.platform.startswith('linux'):
+    Map_NoReserve = 0x4000
+else:
+    Map_NoReserve = 0
+Map_Flags = mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS | Map_NoReserve
+
+
+def MapPages(pages):
+    # a mapping can't be empty
+    return(mmap.mmap(-1, max(pages, 1) * Page_Size, flags=Map_Flags))
+
+
+class Memory_Instance():
+    # maximum is in pages, None if the limits don't have one
+    def __init__(self, initial, maximum=None):
+        if maximum is None or maximum > Max_Pages:
+            maximum = Max_Pages
+        if initial > maximum:
+            raise Exception(Colors.red + 'memory of ' + repr(initial) +
+                            ' pages is over its maximum of ' + repr(maximum) + Colors.ENDC)
+        self.maximum = maximum
+        self.pages = initial
+        self.size = initial * Page_Size
+        try:
+            self.buffer = MapPages(maximum)
+            self.reserved = maximum
+        except (OSError, OverflowError):
+            self.buffer = MapPages(initial)
+            self.reserved = initial
+
+    # grows the memory by delta pages. returns the old size in pages or -1 if
+    # the memory can't grow that far.
+    def grow(self, delta):
+        old_pages = self.pages
+        if delta > self.maximum - old_pages:
+            return(-1)
+        pages = old_pages + delta
+        if pages > self.reserved:
+            try:
+                buffer = MapPages(pages)
+            except (OSError, OverflowError):
+                return(-1)
+            buffer[0:self.size] = self.buffer[0:self.size]
+            self.buffer = buffer
+            self.reserved = pages
+        self.pages = pages
+        self.size = pages * Page_Size
+        return(old_pages)
+
+    # indexing and slicing work like on a bytearray of the current size
+    # except that slice assignments can't change the size
+    def __len__(self):
+        return(self.size)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return(self.buffer[slice(*key.indices(self.size))])
+        if key < 0:
+            key += self.size
+        if key < 0 or key >= self.size:
+            raise IndexError('memory index out of range')
+        return(self.buffer[key])
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            indices = key.indices(self.size)
+            if len(range(*indices)) != len(value):
+                raise IndexError('memory slice assignment would change the size')
+            self.buffer[slice(*indices)] = value
+            return
+        if key < 0:
+            key += self.size
+        if key < 0 or key >= self.size:
+            raise IndexError('memory index out of range')
+        self.buffer[key] = value
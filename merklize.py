@@ -14,6 +14,15 @@ def Serialize(machinestate): # pragma: no cover
         flat_ms.append(iter)
 
 
+# the sha-256 of the operand stack. the payloads and then the types are hashed
+# straight out of the stack's arrays.
+def HashStack(stack):
+    values, tags = stack.getBuffers()
+    digest = hashlib.sha256(values)
+    digest.update(tags)
+    return(digest.hexdigest())
+
+
 # expects to receive a flat list, creates a merkle tree for it.
 class Merklizer(): # pragma: no cover
     def __init__ (self, machinestate, module):
@@ -0,0 +1,408 @@
+from utils import Colors
+from section_structs import *
+from array import array
+import hashlib
+import os
+import struct as stc
+import zlib
+
+# an on-disk cache of parsed modules. entries are keyed by the sha-256 of the
+# wasm object plus the parser version so a changed object or a changed parser
+# never gets a stale module. every entry is a small header followed by the
+# zlib-compressed module, packed field by field by PackValue. reading one
+# back only makes the known classes, nothing in an entry gets run.
+#   magic(4) | format version(u16) | parser version(u16) | schema(8) |
+#   sha-256(32) | payload
+# the cache directory is kept under a size limit by evicting the least
+# recently used entries. a hit refreshes the entry's mtime.
+# the cache trusts its directory: whoever can write an entry decides what
+# module a hit returns. the directory is created private to the user and one
+# that belongs to somebody else or that others can write to is refused.
+
+Cache_Magic = b'WMC\x00'
+Cache_Format_Version = 2
+Cache_Header = stc.Struct('<4sHH8s32s')
+Cache_Suffix = '.wmc'
+
+# the classes a packed module is made of, their index is their id in the
+# payload, and how to make one to list its fields
+Packed_Classes = [
+    (Module, lambda: Module(None, None, None, None, None, None, None, None, None, None, None)),
+    (Type_Section, Type_Section), (Func_Type, Func_Type), (Import_Section, Import_Section),
+    (Import_Entry, Import_Entry), (Function_Section, Function_Section),
+    (Table_Section, Table_Section), (Table_Type, Table_Type),
+    (Resizable_Limits, Resizable_Limits), (Memory_Section, Memory_Section),
+    (Memory_Type, Memory_Type), (Global_Section, Global_Section),
+    (Global_Variable, Global_Variable), (Global_Type, Global_Type),
+    (Export_Section, Export_Section), (Export_Entry, Export_Entry),
+    (Start_Section, Start_Section), (Element_Section, Element_Section),
+    (Elem_Segment, Elem_Segment), (Code_Section, Code_Section), (Func_Body, Func_Body),
+    (Local_Entry, Local_Entry), (Code_Store, Code_Store), (Side_Table, lambda: Side_Table(0)),
+    (Gas_Bound, Gas_Bound), (Data_Section, Data_Section), (Data_Segment, Data_Segment)]
+# class -> (id, the names of its fields in the order they are packed)
+Packed_Fields = dict()
+for class_id, (packed_class, make) in enumerate(Packed_Classes):
+    Packed_Fields[packed_class] = (class_id, sorted(vars(make())))
+# the digest of the classes' fields. renaming, adding or dropping a field
+# changes it, which turns the entries packed before into misses.
+Cache_Schema = hashlib.sha256(repr([(packed_class.__name__, Packed_Fields[packed_class][1])
+                                    for packed_class, make in Packed_Classes])
+                              .encode('utf-8')).digest()[0:8]
+
+U32_Struct = stc.Struct('<I')
+I64_Struct = stc.Struct('<q')
+F64_Struct = stc.Struct('<d')
+
+
+# an int64 that stands for None in an array of ints
+Null_Int = -(1 << 63)
+
+
+# the ints as one array of int64s if they all are ints that fit or None,
+# None if not. the second value is whether there were Nones.
+def GetInts(values):
+    nulls = False
+    for value in values:
+        if type(value) is int:
+            if value == Null_Int:
+                return(None, False)
+        elif value is None:
+            nulls = True
+        else:
+            return(None, False)
+    if nulls:
+        values = [Null_Int if value is None else value for value in values]
+    try:
+        return(array('q', values), nulls)
+    except OverflowError:
+        return(None, False)
+
+
+def PackInts(ints, nulls, out):
+    out += b'\x01' if nulls else b'\x00'
+    out += U32_Struct.pack(len(ints))
+    out += ints.tobytes()
+
+
+# appends the tagged form of value to out. only None, bools, ints, floats,
+# bytes, strs, lists, tuples, dicts, arrays and the Packed_Classes go. lists
+# and tuples of ints go as one array and so do the keys of dicts keyed by
+# ints. a dict from ints to lists or tuples of ints, like the validator's
+# blocks and branches, goes as its keys, the lengths of its values and all
+# of their ints.
+def PackValue(value, out):
+    value_type = type(value)
+    if value is None:
+        out += b'N'
+    elif value_type is bool:
+        out += b'T' if value else b'F'
+    elif value_type is int:
+        if -(1 << 63) <= value < (1 << 63):
+            out += b'i'
+            out += I64_Struct.pack(value)
+        else:
+            raw = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+            out += b'I'
+            out += U32_Struct.pack(len(raw))
+            out += raw
+    elif value_type is float:
+        out += b'f'
+        out += F64_Struct.pack(value)
+    elif value_type is bytes or value_type is memoryview:
+        out += b'b'
+        out += U32_Struct.pack(len(value))
+        out += value
+    elif value_type is str:
+        raw = value.encode('utf-8')
+        out += b's'
+        out += U32_Struct.pack(len(raw))
+        out += raw
+    elif value_type is list or value_type is tuple:
+        ints, nulls = GetInts(value)
+        if ints is not None:
+            out += b'L' if value_type is list else b'U'
+            PackInts(ints, nulls, out)
+        else:
+            out += b'l' if value_type is list else b't'
+            out += U32_Struct.pack(len(value))
+            for item in value:
+                PackValue(item, out)
+    elif value_type is dict:
+        keys, nulls = GetInts(value.keys())
+        if keys is None or nulls:
+            out += b'd'
+            out += U32_Struct.pack(len(value))
+            for key, item in value.items():
+                PackValue(key, out)
+                PackValue(item, out)
+            return
+        item_types = set([type(item) for item in value.values()])
+        table = None
+        if item_types == set([list]) or item_types == set([tuple]):
+            table, nulls = GetInts([val for item in value.values() for val in item])
+        if table is not None:
+            out += b'M' if list in item_types else b'W'
+            PackInts(keys, False, out)
+            PackInts(array('q', [len(item) for item in value.values()]), False, out)
+            PackInts(table, nulls, out)
+        else:
+            out += b'D'
+            PackInts(keys, False, out)
+            for item in value.values():
+                PackValue(item, out)
+    elif value_type is array:
+        out += b'a'
+        out += value.typecode.encode('ascii')
+        out += U32_Struct.pack(len(value))
+        out += value.tobytes()
+    elif value_type in Packed_Fields:
+        class_id, fields = Packed_Fields[value_type]
+        # the objects that need something done before they are packed say
+        # so in __getstate__. fields the schema doesn't know would be lost.
+        state = value.__getstate__() if hasattr(value, '__getstate__') else value.__dict__
+        if len(state) != len(fields):
+            raise Exception(Colors.red + 'a ' + value_type.__name__ +
+                            " has fields the cache doesn't know" + Colors.ENDC)
+        out += b'o'
+        out += bytes([class_id])
+        for field in fields:
+            PackValue(state[field], out)
+    else:
+        raise Exception(Colors.red + "can't pack a " + value_type.__name__ + Colors.ENDC)
+
+
+# reads the values PackValue wrote off of a buffer. a payload that ends early
+# or has a tag or class id that doesn't exist raises.
+class Value_Reader():
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offset = 0
+
+    def readCount(self):
+        count = U32_Struct.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 4
+        return(count)
+
+    # reads a count of items of size bytes each and returns their bytes
+    def readRaw(self, size):
+        offset = self.offset + 4
+        end = offset + size * U32_Struct.unpack_from(self.buffer, self.offset)[0]
+        if end > len(self.buffer):
+            raise ValueError('the packed value ends early')
+        self.offset = end
+        return(self.buffer[offset:end])
+
+    def readInts(self):
+        nulls = self.buffer[self.offset]
+        self.offset += 1
+        ints = array('q')
+        ints.frombytes(self.readRaw(8))
+        if nulls:
+            return([None if value == Null_Int else value for value in ints])
+        return(ints.tolist())
+
+    def read(self):
+        buffer = self.buffer
+        offset = self.offset
+        tag = buffer[offset]
+        self.offset = offset + 1
+        if tag == 0x69:
+            self.offset = offset + 9
+            return(I64_Struct.unpack_from(buffer, offset + 1)[0])
+        elif tag == 0x4c:
+            return(self.readInts())
+        elif tag == 0x6f:
+            packed_class = Packed_Classes[buffer[offset + 1]][0]
+            self.offset = offset + 2
+            value = packed_class.__new__(packed_class)
+            state = value.__dict__
+            for field in Packed_Fields[packed_class][1]:
+                state[field] = self.read()
+            return(value)
+        elif tag == 0x4e:
+            return(None)
+        elif tag == 0x54:
+            return(True)
+        elif tag == 0x46:
+            return(False)
+        elif tag == 0x55:
+            return(tuple(self.readInts()))
+        elif tag == 0x4d or tag == 0x57:
+            keys = self.readInts()
+            lengths = self.readInts()
+            table = self.readInts()
+            items = dict()
+            start = 0
+            for key, length in zip(keys, lengths):
+                end = start + length
+                items[key] = table[start:end] if tag == 0x4d else tuple(table[start:end])
+                start = end
+            return(items)
+        elif tag == 0x44:
+            return(dict([(key, self.read()) for key in self.readInts()]))
+        elif tag == 0x6c or tag == 0x74:
+            items = [self.read() for i in range(self.readCount())]
+            return(items if tag == 0x6c else tuple(items))
+        elif tag == 0x64:
+            items = dict()
+            for i in range(self.readCount()):
+                key = self.read()
+                items[key] = self.read()
+            return(items)
+        elif tag == 0x66:
+            self.offset = offset + 9
+            return(F64_Struct.unpack_from(buffer, offset + 1)[0])
+        elif tag == 0x49:
+            return(int.from_bytes(self.readRaw(1), 'little', signed=True))
+        elif tag == 0x62:
+            return(bytes(self.readRaw(1)))
+        elif tag == 0x73:
+            return(bytes(self.readRaw(1)).decode('utf-8'))
+        elif tag == 0x61:
+            value = array(chr(buffer[offset + 1]))
+            self.offset = offset + 2
+            value.frombytes(self.readRaw(value.itemsize))
+            return(value)
+        raise ValueError('bad tag ' + repr(tag) + ' at offset ' + repr(offset))
+
+
+# the compact form of a module the cache entries and the batch parser's
+# workers use. lazily decoded function bodies get decoded on the way in.
+def PackModule(module):
+    out = bytearray()
+    PackValue(module, out)
+    return(zlib.compress(out))
+
+
+def UnpackModule(payload):
+    reader = Value_Reader(memoryview(zlib.decompress(payload)))
+    module = reader.read()
+    if type(module) is not Module or reader.offset != len(reader.buffer):
+        raise ValueError('not a packed module')
+    return(module)
+
+
+# makes the cache directory if it isn't there. raises if it is there but
+# isn't private to the user.
+def CheckCacheDir(cache_dir):
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    stat = os.stat(cache_dir)
+    if hasattr(os, 'getuid') and stat.st_uid != os.getuid():
+        raise Exception(Colors.red + 'the cache directory ' + cache_dir +
+                        ' belongs to another user' + Colors.ENDC)
+    if stat.st_mode & 0o022:
+        raise Exception(Colors.red + 'the cache directory ' + cache_dir +
+                        ' can be written by other users' + Colors.ENDC)
+
+
+class ModuleCache():
+    def __init__(self, cache_dir, max_size=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        CheckCacheDir(cache_dir)
+
+    def getDigest(self, raw):
+        return(hashlib.sha256(raw).digest())
+
+    def getEntryPath(self, digest):
+        return(os.path.join(self.cache_dir, digest.hex() + '-v' + repr(Parser_Version) +
+                            Cache_Suffix))
+
+    # returns the cached module for the object bytes or None on a miss.
+    # entries that are corrupt or were written by another version count as
+    # misses and are dropped.
+    def load(self, raw):
+        digest = self.getDigest(raw)
+        path = self.getEntryPath(digest)
+        try:
+            with open(path, 'rb') as entry_file:
+                entry = entry_file.read()
+        except OSError:
+            self.misses += 1
+            return None
+
+        try:
+            magic, format_version, parser_version, schema, entry_digest = \
+                Cache_Header.unpack_from(entry, 0)
+            if magic != Cache_Magic or format_version != Cache_Format_Version or \
+                    parser_version != Parser_Version or schema != Cache_Schema or \
+                    entry_digest != digest:
+                raise ValueError('stale cache entry')
+            module = UnpackModule(entry[Cache_Header.size:])
+        except Exception:
+            self.misses += 1
+            self.remove(path)
+            return None
+
+        # bump the entry for the LRU
+        os.utime(path, None)
+        self.hits += 1
+        return(module)
+
+    # writes the module for the object bytes to the cache. payload is the
+    # module's PackModule form if the caller already has it.
+    def store(self, raw, module, payload=None):
+        digest = self.getDigest(raw)
+        path = self.getEntryPath(digest)
+        if payload is None:
+            payload = PackModule(module)
+        entry = Cache_Header.pack(Cache_Magic, Cache_Format_Version, Parser_Version,
+                                  Cache_Schema, digest) + payload
+        # write to a temporary file first so a reader never sees half an entry
+        temp_path = path + '.' + repr(os.getpid())
+        with open(temp_path, 'wb') as entry_file:
+            entry_file.write(entry)
+        os.replace(temp_path, path)
+        self.stores += 1
+        self.evict()
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # returns (mtime, size, path) for every entry in the cache directory
+    def getEntries(self):
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if not file.endswith(Cache_Suffix):
+                continue
+            path = os.path.join(self.cache_dir, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return(entries)
+
+    # drops the least recently used entries until the cache fits max_size
+    def evict(self):
+        entries = sorted(self.getEntries())
+        total_size = sum([entry[1] for entry in entries])
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self.remove(path)
+            total_size -= size
+            self.evictions += 1
+            self.evicted_bytes += size
+
+    def PrintStats(self):
+        entries = self.getEntries()
+        lookups = self.hits + self.misses
+        print(Colors.blue + Colors.BOLD + 'Module Cache:' + Colors.ENDC)
+        print('directory: ' + self.cache_dir)
+        print('entries: ' + repr(len(entries)) + ', ' +
+              repr(sum([entry[1] for entry in entries])) + ' of ' +
+              repr(self.max_size) + ' bytes')
+        print(Colors.green + 'hits: ' + repr(self.hits) + Colors.ENDC + ', ' +
+              Colors.red + 'misses: ' + repr(self.misses) + Colors.ENDC + ', ' +
+              'hit rate: ' + ('%.1f' % (100 * self.hits / lookups) if lookups else '-') + '%')
+        print('stores: ' + repr(self.stores) + ', evictions: ' + repr(self.evictions) +
+              ' (' + repr(self.evicted_bytes) + ' bytes)')
@@ -0,0 +1,146 @@
+from array import array
+from section_structs import Side_Table
+from validator import Function_Block
+
+# the passes that run over a function body once it has been disassembled and
+# validated and precompute what the interpreter would otherwise have to work
+# out while it runs.
+
+# the gas every opcode costs, indexed by the opcode
+Default_Costs = array('l', [1]) * 256
+
+# the instructions after which execution doesn't simply go on with the next
+# pc: unreachable, if, else, br, br_if, br_table, return, call and
+# call_indirect
+Block_Ends = frozenset([0x00, 0x04, 0x05, 0x0c, 0x0d, 0x0e, 0x0f, 0x10, 0x11])
+
+
+# builds the control-flow side table of a validated body out of its Code_Store
+# and the blocks and branches the validator recorded. for every pc that needs
+# one, targets holds the pc execution continues at:
+#   block, loop: the pc after the block's end
+#   if: the pc after its else, or after its end if it has no else
+#   else: the pc after the end of the if. only reached at the end of the then
+#         branch.
+#   br, br_if: the pc after the end of the target block, the first pc of the
+#              body of a target loop or the function's end for the function
+#              block, which makes a branch to it a return.
+# branches also get the number of values they carry and the operand stack
+# height of the target block. br_table gets a tuple of (target pc, height)
+# per target with the default last in tables. gas is the body's
+# BuildBlockGas with the default costs.
+def BuildSideTable(func_body, code):
+    side_table = Side_Table(len(code))
+    side_table.gas = BuildBlockGas(code, Default_Costs)
+    targets = side_table.targets
+    function_end = len(code) - 1
+
+    for pc, block in func_body.blocks.items():
+        opcodeint, arity, height, else_pc, end_pc = block
+        targets[pc] = end_pc + 1
+        if else_pc is not None:
+            if opcodeint == 0x04:
+                targets[pc] = else_pc + 1
+            targets[else_pc] = end_pc + 1
+
+    # the label of a block as (target pc, arity, height)
+    labels = {Function_Block: (function_end, len(func_body.results), 0)}
+    for pc, block in func_body.blocks.items():
+        opcodeint, arity, height, else_pc, end_pc = block
+        if opcodeint == 0x03:
+            labels[pc] = (pc + 1, 0, height)
+        else:
+            labels[pc] = (end_pc + 1, arity, height)
+
+    for pc, branch_targets in func_body.branches.items():
+        target, arity, height = labels[branch_targets[-1]]
+        targets[pc] = target
+        side_table.arities[pc] = arity
+        side_table.heights[pc] = height
+        if code.opcodes[pc] == 0x0e:
+            side_table.tables[pc] = tuple([(labels[block_pc][0], labels[block_pc][2])
+                                           for block_pc in branch_targets])
+    return(side_table)
+
+
+# the gas of the basic blocks of a body. execution that enters the code at a
+# pc always runs on up to the next instruction in Block_Ends, or the
+# function's end, so for every pc this holds the summed cost of the
+# instructions from it to there. the interpreter charges it whenever
+# execution enters the code somewhere other than the next pc, i.e. at the
+# start of the function, at the targets of the jumps and after the
+# instructions in Block_Ends. costs is indexed by the opcode.
+def BuildBlockGas(code, costs):
+    opcodes = code.opcodes
+    gas = array('l', [0]) * len(opcodes)
+    block_gas = 0
+    for pc in range(len(opcodes) - 1, -1, -1):
+        opcodeint = opcodes[pc]
+        if opcodeint in Block_Ends:
+            block_gas = 0
+        block_gas += costs[opcodeint]
+        gas[pc] = block_gas
+    return(gas)
+
+
+# a basic block of a body's control-flow graph. it runs the instructions from
+# start to end, both included, and goes on at the first pc of one of the
+# blocks in successors. blocks that end in unreachable or at the function's
+# end have none.
+class Basic_Block():
+    def __init__(self, start, end, successors):
+        self.start = start
+        self.end = end
+        self.successors = successors
+
+
+# builds the control-flow graph of a validated body out of its side table.
+# a block starts at the first pc, at every jump target and after every
+# instruction in Block_Ends. the end of a loop and the pc after it start
+# blocks too so the blocks of a loop's body are the ones from its first pc up
+# to its end. returns the blocks in the order of their pcs.
+def BuildCFG(func_body):
+    code = func_body.code
+    side_table = func_body.side_table
+    opcodes = code.opcodes
+    targets = side_table.targets
+    leaders = set([0])
+    for pc, opcodeint in enumerate(opcodes):
+        if opcodeint in Block_Ends and pc + 1 < len(opcodes):
+            leaders.add(pc + 1)
+        if opcodeint == 0x0e:
+            for target, height in side_table.tables[pc]:
+                leaders.add(target)
+        elif opcodeint in (0x04, 0x05, 0x0c, 0x0d, 0x0f):
+            leaders.add(targets[pc])
+        elif opcodeint == 0x03:
+            leaders.add(targets[pc] - 1)
+            leaders.add(targets[pc])
+
+    starts = sorted(leaders)
+    blocks = []
+    for index, start in enumerate(starts):
+        if index + 1 < len(starts):
+            end = starts[index + 1] - 1
+        else:
+            end = len(opcodes) - 1
+        opcodeint = opcodes[end]
+        if opcodeint == 0x00:
+            successors = []
+        elif opcodeint == 0x04 or opcodeint == 0x0d:
+            successors = [end + 1, targets[end]]
+        elif opcodeint in (0x05, 0x0c, 0x0f):
+            successors = [targets[end]]
+        elif opcodeint == 0x0e:
+            successors = [target for target, height in side_table.tables[end]]
+        elif end + 1 < len(opcodes):
+            successors = [end + 1]
+        else:
+            successors = []
+        # a jump to the next pc is only one edge
+        unique = []
+        for successor in successors:
+            if successor not in unique:
+                unique.append(successor)
+        blocks.append(Basic_Block(start, end, unique))
+    return(blocks)
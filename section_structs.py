@@ -1,3 +1,12 @@
+from array import array
+from OpCodes import Op_Names, Op_Immediates
+
+# the version of the parsed structures. bump it whenever the parser's output
+# changes so that cached modules are not used any more. changes to the fields
+# of the classes below are picked up by the module cache on its own.
+Parser_Version = 6
+
+
 # contains the data classes we use to hold the information of a module
 class Func_Type():
     def __init__(self):
@@ -144,7 +153,74 @@ class WASM_Ins():
     def __init__(self):
         self.opcode = str()
         self.opcodeint = int()
-        self.operands = []
+        # a tuple of the decoded immediates. br_table's targets are a tuple
+        # inside the tuple, followed by the default target.
+        self.operands = ()
+
+    # renders the immediates as text. only the pretty printers need this.
+    def getOperandsText(self):
+        text = []
+        for operand in self.operands:
+            if isinstance(operand, tuple):
+                text.append(repr(len(operand)))
+                text.extend(repr(target) for target in operand)
+            else:
+                text.append(repr(operand))
+        return(' '.join(text))
+
+
+# the decoded code of a function body, stored as a struct of arrays. every
+# instruction has its opcode in opcodes and its first integer immediate in
+# immediates(zero if it has none). the memory instructions have their offset
+# there instead since the alignment is only a hint. instructions with more
+# than one immediate or a float immediate also keep their full operand tuple
+# in side, keyed by the instruction index. iterating or indexing yields
+# WASM_Ins objects.
+class Code_Store():
+    def __init__(self):
+        self.opcodes = array('B')
+        self.immediates = array('q')
+        self.side = dict()
+
+    def append(self, opcodeint, operands):
+        if not operands:
+            self.immediates.append(0)
+        elif len(operands) == 1 and isinstance(operands[0], int):
+            self.immediates.append(operands[0])
+        else:
+            if 0x28 <= opcodeint <= 0x3e:
+                self.immediates.append(operands[1])
+            elif isinstance(operands[0], int):
+                self.immediates.append(operands[0])
+            else:
+                self.immediates.append(0)
+            self.side[len(self.opcodes)] = operands
+        self.opcodes.append(opcodeint)
+
+    # returns the operand tuple of the instruction at index pc
+    def getOperands(self, pc):
+        operands = self.side.get(pc)
+        if operands is not None:
+            return(operands)
+        if Op_Immediates[self.opcodes[pc]]:
+            return((self.immediates[pc],))
+        return(())
+
+    def __len__(self):
+        return(len(self.opcodes))
+
+    def __getitem__(self, pc):
+        if pc < 0:
+            pc += len(self.opcodes)
+        wasm_ins = WASM_Ins()
+        wasm_ins.opcodeint = self.opcodes[pc]
+        wasm_ins.opcode = Op_Names[wasm_ins.opcodeint]
+        wasm_ins.operands = self.getOperands(pc)
+        return(wasm_ins)
+
+    def __iter__(self):
+        for pc in range(0, len(self.opcodes)):
+            yield self[pc]
 
 
 class Func_Body():
@@ -153,9 +229,67 @@ class Func_Body():
         self.local_count = int()
         # Local_Entry
         self.locals = []
-        # WASM_Ins
-        self.code = []
+        # Code_Store
+        self._code = Code_Store()
         self.end = int()
+        # where the instructions start in the code section and their size
+        self.code_offset = int()
+        self.code_size = int()
+        # set for lazily decoded bodies. called with the body the first time
+        # its code is accessed and returns the Code_Store.
+        self.decoder = None
+        # the index of the body's function type in the type section
+        self.type_index = None
+        # the facts the validator records while the body is disassembled.
+        # blocks maps the pc of every block, loop and if to [opcode, arity,
+        # operand stack height, else pc, end pc] and branches maps the pc of
+        # every branch to the start pcs of the blocks it can target. the body
+        # itself is the block at pc -1.
+        self.validated = False
+        self.validation_error = None
+        self.param_count = int()
+        self.results = ()
+        # the types of the parameters followed by the locals
+        self.local_types = ()
+        self.max_stack = int()
+        self.max_depth = int()
+        self.blocks = dict()
+        self.branches = dict()
+        # Side_Table, built once the body has been validated
+        self.side_table = None
+
+    @property
+    def code(self):
+        if self.decoder is not None:
+            decoder = self.decoder
+            self.decoder = None
+            self._code = decoder(self)
+        return(self._code)
+
+    @code.setter
+    def code(self, code):
+        self.decoder = None
+        self._code = code
+
+    # lazy bodies hold on to their reader so they get decoded before packing
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_code'] = self.code
+        state['decoder'] = None
+        return(state)
+
+
+# the control-flow side table of a function body. indexed by pc. see
+# predecode.BuildSideTable for what goes in there.
+class Side_Table():
+    def __init__(self, length):
+        self.targets = array('l', [0]) * length
+        self.arities = array('B', [0]) * length
+        self.heights = array('l', [0]) * length
+        # br_table pc -> ((target pc, height), ...) with the default last
+        self.tables = dict()
+        # the gas of the basic block from every pc on
+        self.gas = array('l', [0]) * length
 
 
 class Code_Section():
@@ -163,6 +297,27 @@ class Code_Section():
         self.count = []
         # Func_Body
         self.func_bodies = []
+        # the Gas_Bound of every function under the default gas schedule, set
+        # by gasbound.GetGasBounds
+        self.gas_bounds = None
+
+
+# the most gas a function can use, the gas of its most expensive path
+# through the code including the functions it calls. gas is None if the
+# analysis found no bound. then func_index and pc say where the loop or call
+# that has none is and reason what it is.
+class Gas_Bound():
+    def __init__(self, gas=None, func_index=None, pc=None, reason=None):
+        self.gas = gas
+        self.func_index = func_index
+        self.pc = pc
+        self.reason = reason
+
+    def getText(self):
+        if self.gas is not None:
+            return(repr(self.gas))
+        return('unbounded: ' + self.reason + ' at function ' + repr(self.func_index) +
+               ' pc ' + repr(self.pc))
 
 
 class Data_Segment():
@@ -172,6 +327,13 @@ class Data_Segment():
         self.size = int()
         self.data = []
 
+    # the data is usually a view into the module buffer which isn't packed
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if isinstance(self.data, memoryview):
+            state['data'] = self.data.tobytes()
+        return(state)
+
 
 class Data_Section():
     def __init__(self):
@@ -235,3 +397,5 @@ class Module():
         self.element_section = element_section
         self.code_section = code_section
         self.data_section = data_section
+        # set by ModuleValidation once the whole module has been validated
+        self.validated = False
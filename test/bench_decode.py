@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+sys.path.append('../')
+from utils import Colors
+from argparser import ReadWASM, ObjReader
+
+# decode throughput benchmark. decodes the code section of every module a
+# number of times and reports instructions per second.
+# usage: python3 bench_decode.py [rounds] [wasm files...]
+
+
+def ModuleList():
+    obj_list = ['./injected.wasm']
+    samples = '../c-samples/'
+    for file in sorted(os.listdir(samples)):
+        if file.endswith('.wasm'):
+            obj_list.append(samples + file)
+    return(obj_list)
+
+
+def bench_decode(file_path, rounds):
+    reader = ObjReader(ReadWASM(file_path, 'little', False, False))
+    ins_cnt = 0
+    begin = time.perf_counter()
+    for i in range(0, rounds):
+        code_section = reader.ReadCodeSection()
+        for func_body in code_section.func_bodies:
+            ins_cnt += len(func_body.code)
+    elapsed = time.perf_counter() - begin
+    return ins_cnt, elapsed
+
+
+def main():
+    rounds = 200
+    obj_list = ModuleList()
+    if len(sys.argv) > 1:
+        rounds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        obj_list = sys.argv[2:]
+
+    for file_path in obj_list:
+        ins_cnt, elapsed = bench_decode(file_path, rounds)
+        print(Colors.green + os.path.basename(file_path) + Colors.ENDC + ': ' +
+              repr(ins_cnt) + ' instructions in ' + '%.3f' % elapsed + 's, ' +
+              Colors.cyan + '%.0f' % (ins_cnt / elapsed) + ' ins/s' + Colors.ENDC)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+sys.path.append('../')
+from utils import Colors
+from argparser import PythonInterpreter
+from TBInit import VM
+
+# interpreter throughput benchmark. runs the exported main of the loop-heavy
+# c-samples, the call-heavy fib one and the memory-heavy sieve one and reports
+# executed instructions per second. the gas counter charges one per
+# instruction so it doubles as the instruction count.
+# usage: python3 bench_execute.py [rounds] [wasm files...]
+
+Samples = ['../c-samples/6.wasm', '../c-samples/7.wasm', '../c-samples/8.wasm',
+           '../c-samples/9.wasm']
+
+
+def bench_execute(file_path, rounds):
+    module = PythonInterpreter().parse(file_path)
+    ins_cnt = 0
+    elapsed = 0
+    for i in range(0, rounds):
+        vm = VM([module])
+        main = vm.getExportFunctionIndex('main')
+        begin = time.perf_counter()
+        results = vm.invoke(main, [0, 0])
+        elapsed += time.perf_counter() - begin
+        ins_cnt += vm.executewasm.getOPGas()
+    return results, ins_cnt, elapsed
+
+
+def main():
+    rounds = 1
+    obj_list = Samples
+    if len(sys.argv) > 1:
+        rounds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        obj_list = sys.argv[2:]
+
+    for file_path in obj_list:
+        results, ins_cnt, elapsed = bench_execute(file_path, rounds)
+        print(Colors.green + os.path.basename(file_path) + Colors.ENDC + ': ' +
+              repr(results) + ', ' + repr(ins_cnt) + ' instructions in ' +
+              '%.3f' % elapsed + 's, ' +
+              Colors.cyan + '%.0f' % (ins_cnt / elapsed) + ' ins/s' + Colors.ENDC)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import sys
+import time
+sys.path.append('../')
+from utils import Colors
+from TBInit import VM
+from gas import LoadGasSchedule
+from wasmbuilder import ModuleBuilder, code, i32, f64, empty
+
+# gas schedule calibration benchmark. runs a loop per opcode class whose body
+# is mostly instructions of that class and reports the gas charged per
+# wall-second under the schedule, the time per instruction with the loop's own
+# instructions taken out and a suggested cost relative to the locals class.
+# classes that the schedule charges the same gas/s for are priced right
+# relative to each other.
+# usage: python3 bench_gas.py [iterations] [schedule file]
+
+# the instructions of a body unit, repeated Unit_Count times per iteration.
+# local 0 is the loop counter, local 1 an i32 and local 2 an f64. the units
+# leave the operand stack as they found it.
+Unit_Count = 10
+Classes = [
+    ('locals', [('get_local', 1), ('set_local', 1)]),
+    ('int arith', [('get_local', 1), ('i32.const', 7), 'i32.mul', ('i32.const', 3), 'i32.xor',
+                   ('i32.const', 1), 'i32.add', ('set_local', 1)]),
+    ('division', [('get_local', 1), ('i32.const', 7), 'i32.div_u', ('i32.const', 100003),
+                  'i32.rem_u', ('set_local', 1)]),
+    ('float', [('get_local', 2), ('f64.const', 0.5), 'f64.mul', ('f64.const', 1.0), 'f64.add',
+               'f64.sqrt', ('set_local', 2)]),
+    ('load', [('i32.const', 64), ('i32.load', 2, 0), ('i32.const', 128), ('i32.load16_u', 1, 0),
+              'i32.add', ('set_local', 1)]),
+    ('store', [('i32.const', 64), ('get_local', 1), ('i32.store', 2, 0), ('i32.const', 128),
+               ('get_local', 0), ('i32.store16', 1, 0)]),
+    ('control', [('block', empty), ('i32.const', 0), ('br_if', 0), ('get_local', 0), ('br_if', 0),
+                 'end']),
+    ('call', [('get_local', 1), ('call', 0), ('set_local', 1)]),
+]
+# the instructions of the loop around the units. decrements local 0 and loops
+# while it isn't zero.
+Loop_Tail = [('get_local', 0), ('i32.const', 1), 'i32.sub', ('tee_local', 0), ('br_if', 0)]
+
+
+# the module of a class. function 0 is the callee of the call class, 1 the
+# loop with the units and 2 the loop without them.
+def build_module(units):
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    builder.addFunction([i32], [i32], code(('get_local', 0)))
+    builder.addFunction([i32], [], code(('loop', empty), *(units * Unit_Count + Loop_Tail), 'end'),
+                        [i32, f64])
+    builder.addFunction([i32], [], code(('loop', empty), *Loop_Tail, 'end'), [i32, f64])
+    return builder.parse()
+
+
+# runs a function and returns the gas it charged and the seconds it took
+def measure(module, schedule, function, iterations):
+    vm = VM([module], None, schedule)
+    begin = time.perf_counter()
+    vm.invoke(function, [iterations])
+    elapsed = time.perf_counter() - begin
+    return vm.executewasm.getOPGas(), elapsed
+
+
+def bench_class(units, schedule, iterations):
+    module = build_module(units)
+    gas, elapsed = measure(module, schedule, 1, iterations)
+    loop_gas, loop_elapsed = measure(module, schedule, 2, iterations)
+    ins_cnt = len(units) * Unit_Count * iterations
+    # the call class also runs the callee's get_local and end
+    if units[1][0] == 'call':
+        ins_cnt += 2 * Unit_Count * iterations
+    return gas, elapsed, (elapsed - loop_elapsed) / ins_cnt
+
+
+def main():
+    iterations = 20000
+    schedule = None
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        schedule = LoadGasSchedule(sys.argv[2])
+
+    results = [(name,) + bench_class(units, schedule, iterations) for name, units in Classes]
+    base = results[0][3]
+    for name, gas, elapsed, ins_time in results:
+        print(Colors.green + name + Colors.ENDC + ': ' + repr(gas) + ' gas in ' +
+              '%.3f' % elapsed + 's, ' + Colors.cyan + '%.0f' % (gas / elapsed) + ' gas/s' +
+              Colors.ENDC + ', ' + '%.0f' % (ins_time * 1e9) + ' ns/ins, suggested cost ' +
+              '%.1f' % (ins_time / base))
+
+
+if __name__ == '__main__':
+    main()
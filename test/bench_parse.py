@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append('../')
+from utils import Colors
+from argparser import ReadWASM, ObjReader
+from wasmbuilder import ModuleBuilder, parse_stream, code, i32, i64
+
+# section parse benchmark. parses every section of a module on its own and
+# reports the wall time and the tracemalloc peak for each one. without
+# arguments a large synthetic module is built and parsed.
+# usage: python3 bench_parse.py [rounds] [wasm files...]
+
+Section_Readers = [('type', 'ReadTypeSection'), ('import', 'ReadImportSection'),
+                   ('function', 'ReadFunctionSection'), ('table', 'ReadTableSection'),
+                   ('memory', 'ReadMemorySection'), ('global', 'ReadGlobalSection'),
+                   ('export', 'ReadExportSection'), ('start', 'ReadStartSection'),
+                   ('element', 'ReadElementSection'), ('code', 'ReadCodeSection'),
+                   ('data', 'ReadDataSection')]
+
+
+def BuildLargeModule(func_cnt=2000):
+    builder = ModuleBuilder()
+    builder.addMemory(16)
+    builder.addTable(func_cnt)
+    for i in range(0, 64):
+        builder.addImportFunction('env', 'import_' + repr(i), [i32] * (i % 4), [i32])
+    for i in range(0, 256):
+        builder.addGlobal(i64, True, code(('i64.const', i << 20)))
+    body = code(('block', 0x40), ('loop', 0x40),
+                ('get_local', 0), ('i32.const', 1), 'i32.sub', ('tee_local', 0),
+                ('get_local', 1), ('i32.load', 2, 16), ('get_local', 1), 'i32.add',
+                ('set_local', 1), 'i32.eqz', ('br_if', 1), ('br', 0), 'end', 'end',
+                ('get_local', 1)) * 8 + code('drop', ('get_local', 1))
+    for i in range(0, func_cnt):
+        builder.addFunction([i32], [i32], body, locals=[i32, i64],
+                            export='func_' + repr(i))
+    builder.addElem(0, list(range(64, 64 + func_cnt)))
+    for i in range(0, 512):
+        builder.addData(i * 64, bytes(range(64)))
+    return builder.build()
+
+
+def bench_parse(parsedstruct, rounds):
+    reader = ObjReader(parsedstruct)
+    results = []
+    for section_name, method in Section_Readers:
+        read_section = getattr(reader, method)
+        tracemalloc.start()
+        read_section()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        begin = time.perf_counter()
+        for i in range(0, rounds):
+            read_section()
+        elapsed = (time.perf_counter() - begin) / rounds
+        results.append((section_name, elapsed, peak))
+    return results
+
+
+def main():
+    rounds = 5
+    obj_list = []
+    if len(sys.argv) > 1:
+        rounds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        obj_list = sys.argv[2:]
+
+    # (name, size, parsedstruct) for every object
+    objs = [(os.path.basename(file_path), os.path.getsize(file_path),
+             ReadWASM(file_path, 'little', False, False)) for file_path in obj_list]
+    if not objs:
+        raw = BuildLargeModule()
+        objs = [('synthetic', len(raw), parse_stream(raw).parsedstruct)]
+
+    for obj_name, size, parsedstruct in objs:
+        print(Colors.green + obj_name + Colors.ENDC + ': ' + repr(size) + ' bytes')
+        total_time = 0
+        for section_name, elapsed, peak in bench_parse(parsedstruct, rounds):
+            total_time += elapsed
+            print('    ' + section_name.ljust(10) + '%9.3f' % (elapsed * 1000) +
+                  ' ms ' + Colors.cyan + '%10d' % peak + ' bytes peak' + Colors.ENDC)
+        print('    ' + 'total'.ljust(10) + '%9.3f' % (total_time * 1000) + ' ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,27 @@ from test_LEB128 import test_signed_LEB128
 from test_LEB128 import test_unsigned_LEB128
 from leb128s import leb128sencodedecodeexhaustive
 from leb128s import leb128uencodedecodeexhaustive
+from test_loader import test_mmap_sections, test_mmap_module, test_lazy_code_section
+from test_loader import test_section_directory, test_bad_section_order, test_section_entries
+from test_immediates import test_typed_immediates, test_code_store
+from test_cursor import test_cursor_leb128, test_cursor_too_long, test_cursor_unused_bits, \
+    test_cursor_fixed
+from test_modcache import test_cache_hit, test_cache_corrupt_entry, test_cache_eviction, \
+    test_pack_values, test_cache_untrusted_entry, test_cache_dir_permissions
+from test_batch import test_batch_parse
+from test_stream import test_stream_sections, test_stream_pipe, test_stream_truncated
+from test_data import test_data_views, test_data_out_of_bounds
+from test_validator import test_valid_bodies, test_invalid_bodies, test_function_facts, test_module_validation
+from test_sidetable import test_side_table, test_side_table_lazy, test_side_table_invalid
+from test_execute import test_branches, test_calls, test_trap, test_handlers, test_loop_sample, \
+    test_locals, test_stack_growth, test_call_sample
+from test_values import test_int_ops, test_float_ops, test_conversions, test_traps, test_operand_stack
+from test_memory import test_loads, test_stores, test_out_of_bounds, test_grow, \
+    test_memory_instance, test_memory_sample
+from test_gas import test_block_gas, test_gas_totals, test_gas_traps, test_gas_schedule, \
+    test_gas_limit
+from test_gasbound import test_cfg, test_trip_count, test_gas_bounds, test_unbounded, \
+    test_sample_bounds, test_gas_bound_cache
 from abc import ABCMeta, abstractmethod
 sys.path.append('../')
 from utils import Colors
@@ -88,6 +109,152 @@ class LEB128Exhaustive(Void_Spwner):
     def GetName(self):
         return('leb128exhaustive')
 
+class LoaderTest(Void_Spwner):
+    def Legacy(self):
+        test_mmap_sections()
+        test_mmap_module()
+        test_lazy_code_section()
+        test_section_directory()
+        test_bad_section_order()
+        test_section_entries()
+
+    def GetName(self):
+        return('loadertest')
+
+class ImmediatesTest(Void_Spwner):
+    def Legacy(self):
+        test_typed_immediates()
+        test_code_store()
+
+    def GetName(self):
+        return('immediatestest')
+
+class CursorTest(Void_Spwner):
+    def Legacy(self):
+        test_cursor_leb128()
+        test_cursor_too_long()
+        test_cursor_unused_bits()
+        test_cursor_fixed()
+
+    def GetName(self):
+        return('cursortest')
+
+class ModuleCacheTest(Void_Spwner):
+    def Legacy(self):
+        test_cache_hit()
+        test_cache_corrupt_entry()
+        test_cache_eviction()
+        test_pack_values()
+        test_cache_untrusted_entry()
+        test_cache_dir_permissions()
+
+    def GetName(self):
+        return('modulecachetest')
+
+class BatchTest(Void_Spwner):
+    def Legacy(self):
+        test_batch_parse()
+
+    def GetName(self):
+        return('batchtest')
+
+class StreamTest(Void_Spwner):
+    def Legacy(self):
+        test_stream_sections()
+        test_stream_pipe()
+        test_stream_truncated()
+
+    def GetName(self):
+        return('streamtest')
+
+class DataSegmentTest(Void_Spwner):
+    def Legacy(self):
+        test_data_views()
+        test_data_out_of_bounds()
+
+    def GetName(self):
+        return('datasegmenttest')
+
+class ValidatorTest(Void_Spwner):
+    def Legacy(self):
+        test_valid_bodies()
+        test_invalid_bodies()
+        test_function_facts()
+        test_module_validation()
+
+    def GetName(self):
+        return('validatortest')
+
+class SideTableTest(Void_Spwner):
+    def Legacy(self):
+        test_side_table()
+        test_side_table_lazy()
+        test_side_table_invalid()
+
+    def GetName(self):
+        return('sidetabletest')
+
+class ExecuteTest(Void_Spwner):
+    def Legacy(self):
+        test_branches()
+        test_calls()
+        test_trap()
+        test_handlers()
+        test_loop_sample()
+        test_locals()
+        test_stack_growth()
+        test_call_sample()
+
+    def GetName(self):
+        return('executetest')
+
+class ValueModelTest(Void_Spwner):
+    def Legacy(self):
+        test_int_ops()
+        test_float_ops()
+        test_conversions()
+        test_traps()
+        test_operand_stack()
+
+    def GetName(self):
+        return('valuemodeltest')
+
+class MemoryTest(Void_Spwner):
+    def Legacy(self):
+        test_loads()
+        test_stores()
+        test_out_of_bounds()
+        test_grow()
+        test_memory_instance()
+        test_memory_sample()
+
+    def GetName(self):
+        return('memorytest')
+
+class GasTest(Void_Spwner):
+    def Legacy(self):
+        test_block_gas()
+        test_gas_totals()
+        test_gas_traps()
+        test_gas_schedule()
+        test_gas_limit()
+
+    def GetName(self):
+        return('gastest')
+
+
+class GasBoundTest(Void_Spwner):
+    def Legacy(self):
+        test_cfg()
+        test_trip_count()
+        test_gas_bounds()
+        test_unbounded()
+        test_sample_bounds()
+        test_gas_bound_cache()
+
+    def GetName(self):
+        return('gasboundtest')
+
 ################################################################################
 def main():
     return_list = []
@@ -97,6 +264,48 @@ def main():
     # leb128s exhaustive
     leb128sex = LEB128Exhaustive()
     leb128sex.Spwn()
+    # mmap loader
+    loadertest = LoaderTest()
+    loadertest.Spwn()
+    # typed immediates
+    immediatestest = ImmediatesTest()
+    immediatestest.Spwn()
+    # byte cursor
+    cursortest = CursorTest()
+    cursortest.Spwn()
+    # module cache
+    modulecachetest = ModuleCacheTest()
+    modulecachetest.Spwn()
+    # batch parsing
+    batchtest = BatchTest()
+    batchtest.Spwn()
+    # streaming parser
+    streamtest = StreamTest()
+    streamtest.Spwn()
+    # data segments
+    datasegmenttest = DataSegmentTest()
+    datasegmenttest.Spwn()
+    # validator
+    validatortest = ValidatorTest()
+    validatortest.Spwn()
+    # control-flow side tables
+    sidetabletest = SideTableTest()
+    sidetabletest.Spwn()
+    # the interpreter loop
+    executetest = ExecuteTest()
+    executetest.Spwn()
+    # the value model
+    valuemodeltest = ValueModelTest()
+    valuemodeltest.Spwn()
+    # linear memory
+    memorytest = MemoryTest()
+    memorytest.Spwn()
+    # gas metering
+    gastest = GasTest()
+    gastest.Spwn()
+    # static gas bounds
+    gasboundtest = GasBoundTest()
+    gasboundtest.Spwn()
     # parser test on the WASM testsuite
     obj_list = ObjectList()
     for testfile in obj_list:
@@ -0,0 +1,35 @@
+import sys
+import os
+import tempfile
+sys.path.append('../')
+from argparser import PythonInterpreter
+
+
+def test_batch_parse():
+    fd, bad_path = tempfile.mkstemp(suffix='.wasm')
+    os.write(fd, b'\x00asm\x01\x00\x00\x00\x0a\x05\x01\x03\x00\xff\x0b')
+    os.close(fd)
+    file_paths = ['./injected.wasm', bad_path, '../c-samples/1.wasm', '../c-samples/2.wasm']
+    try:
+        for jobs in (1, 2):
+            interpreter = PythonInterpreter()
+            results = interpreter.parseBatch(file_paths, jobs)
+            assert [result.file_path for result in results] == file_paths
+            assert [result.status for result in results][0::2] == ['ok', 'ok']
+            assert results[1].status.startswith('SystemExit')
+            assert results[1].module is None
+            assert len(interpreter.getmodules()) == 3
+            serial = PythonInterpreter().parse('./injected.wasm')
+            assert [list(func_body.code.opcodes)
+                    for func_body in results[0].module.code_section.func_bodies] == \
+                [list(func_body.code.opcodes) for func_body in serial.code_section.func_bodies]
+    finally:
+        os.remove(bad_path)
+
+
+def main():
+    test_batch_parse()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import sys
+sys.path.append('../')
+from utils import ByteCursor, LEB128UnsignedEncode, LEB128SignedEncode
+
+
+def test_cursor_leb128():
+    for val in [0, 1, 63, 64, 127, 128, 624485, 2**32 - 1]:
+        cursor = ByteCursor(bytes(LEB128UnsignedEncode(val)) + b'\xff')
+        assert cursor.varuint32() == val
+        assert cursor.u8() == 0xff
+    for val in [0, 1, 63, -64, -65, 64, -624485, 2**31 - 1, -2**31]:
+        assert ByteCursor(bytes(LEB128SignedEncode(val))).varint32() == val
+    for val in [0, -1, 2**40, -2**40, 2**63 - 1, -2**63]:
+        assert ByteCursor(bytes(LEB128SignedEncode(val))).varint64() == val
+    # padded encodings are fine as long as they fit the maximum length
+    assert ByteCursor(b'\x80\x80\x80\x80\x00').varuint32() == 0
+    assert ByteCursor(b'\xff\xff\xff\xff\x7f').varint32() == -1
+
+
+def test_cursor_too_long():
+    for reader, raw in ((ByteCursor.varuint32, b'\x80\x80\x80\x80\x80\x00'),
+                        (ByteCursor.varint32, b'\xff\xff\xff\xff\xff\x7f'),
+                        (ByteCursor.varint64, b'\x80' * 10 + b'\x00'),
+                        (ByteCursor.varuint1, b'\x81\x00'),
+                        (ByteCursor.varint7, b'\xc0\x7f')):
+        try:
+            reader(ByteCursor(raw))
+        except Exception:
+            pass
+        else:
+            assert False, 'overlong LEB128 was accepted'
+
+
+def test_cursor_unused_bits():
+    # the unused bits of the last byte have to be zero for the unsigned
+    # readers and copies of the sign bit for the signed ones
+    for reader, raw in ((ByteCursor.varuint32, b'\xff\xff\xff\xff\x7f'),
+                        (ByteCursor.varuint32, b'\x80\x80\x80\x80\x10'),
+                        (ByteCursor.varint32, b'\xff\xff\xff\xff\x4f'),
+                        (ByteCursor.varint32, b'\x80\x80\x80\x80\x08'),
+                        (ByteCursor.varint64, b'\xff' * 9 + b'\x3f'),
+                        (ByteCursor.varuint1, b'\x02'),
+                        (ByteCursor.varuint1, b'\x7f')):
+        try:
+            reader(ByteCursor(raw))
+        except Exception:
+            pass
+        else:
+            assert False, 'LEB128 with unused bits set was accepted'
+    assert ByteCursor(b'\xff\xff\xff\xff\x0f').varuint32() == 2**32 - 1
+    assert ByteCursor(b'\x80\x80\x80\x80\x78').varint32() == -2**31
+    assert ByteCursor(b'\xff' * 9 + b'\x00').varint64() == 2**63 - 1
+    assert ByteCursor(b'\x01').varuint1() == 1
+    assert ByteCursor(b'\x7f').varuint7() == 127
+    assert ByteCursor(b'\x40').varint7() == -64
+
+
+def test_cursor_fixed():
+    cursor = ByteCursor(memoryview(b'\x04main\x01\x02\x03\x04\x00\x00\xc0\x3f'))
+    name = cursor.name()
+    assert isinstance(name, memoryview)
+    assert bytes(name) == b'main'
+    assert cursor.u32() == 0x04030201
+    assert cursor.f32() == 1.5
+    assert cursor.offset == len(cursor.buffer)
+
+
+def main():
+    test_cursor_leb128()
+    test_cursor_too_long()
+    test_cursor_unused_bits()
+    test_cursor_fixed()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import sys
+sys.path.append('../')
+from TBInit import TBMachine, TBInit
+from wasmbuilder import ModuleBuilder, parse_stream
+
+
+def parse_data(segments):
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    for offset, data in segments:
+        builder.addData(offset, data)
+    parser = parse_stream(builder.build())
+    return parser.parsedstruct, parser.module
+
+
+def test_data_views():
+    big = bytes(range(256)) * 200
+    parsedstruct, module = parse_data([(8, b'hello'), (1024, big)])
+    segments = module.data_section.data_segments
+    assert all(isinstance(segment.data, memoryview) for segment in segments)
+    assert segments[1].data.obj is parsedstruct.section_dir[11].obj
+    machinestate = TBMachine()
+    TBInit(module, machinestate).run()
+    memory = machinestate.Linear_Memory[0]
+    assert memory[8:13] == b'hello'
+    assert memory[1024:1024 + len(big)] == big
+    assert memory[0:8] == bytes(8)
+    assert len(memory) == 65536
+
+
+def test_data_out_of_bounds():
+    parsedstruct, module = parse_data([(65530, b'too long')])
+    machinestate = TBMachine()
+    try:
+        TBInit(module, machinestate).run()
+    except Exception:
+        pass
+    else:
+        assert False, 'data segment past the end of memory was accepted'
+    assert len(machinestate.Linear_Memory[0]) == 65536
+
+
+def main():
+    test_data_views()
+    test_data_out_of_bounds()
+
+
+if __name__ == '__main__':
+    main()
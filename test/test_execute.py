@@ -0,0 +1,179 @@
+import sys
+sys.path.append('../')
+from argparser import PythonInterpreter
+from TBInit import VM
+from execute import Trap, Max_Call_Depth, Initial_Stack_Size, Max_Stack_Size
+from OpCodes import Op_Names
+from wasmbuilder import ModuleBuilder, code, i32, i64, f64, empty
+
+
+def test_branches():
+    builder = ModuleBuilder()
+    # returns 10, 20 or 30 for 0, 1 and anything else, through a br_table
+    # out of three nested blocks
+    index = builder.addFunction([i32], [i32], code(
+        ('block', empty), ('block', empty), ('block', empty),
+        ('get_local', 0), ('br_table', [0, 1], 2),
+        'end', ('i32.const', 10), 'return',
+        'end', ('i32.const', 20), 'return',
+        'end', ('i32.const', 30)))
+    # if/else with a result and a br out of the then branch
+    select = builder.addFunction([i32], [i32], code(
+        ('block', i32),
+        ('get_local', 0),
+        ('if', i32), ('i32.const', 1), ('br', 1), 'else', ('i32.const', 2), 'end',
+        'end'))
+    vm = builder.buildVM()
+    assert [vm.invoke(index, [n])[0] for n in (0, 1, 2, 7)] == [10, 20, 30, 30]
+    assert [vm.invoke(select, [n])[0] for n in (0, 1)] == [2, 1]
+    assert len(vm.getState().Stack_Omni) == 0
+    assert vm.getState().Stack_Call == []
+
+
+def test_calls():
+    builder = ModuleBuilder()
+    builder.addTable(2)
+    builder.addGlobal(i32, True, code(('i32.const', 0)))
+    # counts its calls in global 0 and counts down to 0 recursively
+    countdown = builder.addFunction([i32], [], code(
+        ('get_global', 0), ('i32.const', 1), 'i32.add', ('set_global', 0),
+        ('get_local', 0), 'i32.eqz', ('br_if', 0),
+        ('get_local', 0), ('i32.const', 1), 'i32.sub', ('call', 0)))
+    double = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('get_local', 0), 'i32.add'))
+    indirect = builder.addFunction([i32, i32], [i32], code(
+        ('get_local', 0), ('get_local', 1), ('call_indirect', 1, 0)))
+    builder.addElem(1, [double])
+    vm = builder.buildVM()
+    assert vm.invoke(countdown, [5]) == []
+    assert vm.getState().Index_Space_Global == [6]
+    assert vm.invoke(indirect, [21, 1]) == [42]
+    for args in ([1, 0], [1, 2]):
+        try:
+            vm.invoke(indirect, args)
+        except Trap:
+            pass
+        else:
+            assert False, 'call through a bad table entry did not trap'
+    assert len(vm.getState().Stack_Omni) == 0
+    assert vm.getState().Stack_Call == []
+
+
+def test_trap():
+    builder = ModuleBuilder()
+    index = builder.addFunction([], [], code(('i32.const', 1), ('block', empty), 'unreachable',
+                                             'end', 'drop'))
+    vm = builder.buildVM()
+    try:
+        vm.invoke(index)
+    except Trap:
+        pass
+    else:
+        assert False, 'unreachable did not trap'
+    assert len(vm.getState().Stack_Omni) == 0
+    assert vm.getState().Stack_Call == []
+
+
+def test_handlers():
+    builder = ModuleBuilder()
+    index = builder.addFunction([i32], [i32], code(
+        ('i32.const', 5), ('i32.const', 7), ('get_local', 0), 'select',
+        ('i64.const', 3), ('i64.const', 4), 'i64.mul', 'i32.wrap/i64', 'i32.add'))
+    vm = builder.buildVM()
+    handlers = vm.executewasm.handlers
+    assert len(handlers) == 256
+    for opcodeint in range(0, 256):
+        if Op_Names[opcodeint] is None:
+            assert handlers[opcodeint] == vm.executewasm.run_invalid
+        else:
+            assert handlers[opcodeint] != vm.executewasm.run_invalid, Op_Names[opcodeint]
+    assert vm.invoke(index, [1]) == [17]
+    assert vm.invoke(index, [0]) == [19]
+
+
+def test_loop_sample():
+    vm = VM([PythonInterpreter().parse('../c-samples/7.wasm')])
+    assert vm.invoke(vm.getExportFunctionIndex('is_prime'), [97]) == [1]
+    assert vm.invoke(vm.getExportFunctionIndex('is_prime'), [91]) == [0]
+    assert vm.invoke(vm.getExportFunctionIndex('main'), [0, 0]) == [303]
+
+
+def test_locals():
+    builder = ModuleBuilder()
+    # the locals start as zeros and a callee's locals don't clobber the
+    # caller's
+    index = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('i32.const', 2), 'i32.mul', ('set_local', 3),
+        ('get_local', 0), ('call', 1), 'drop',
+        ('get_local', 3), ('get_local', 1), 'i32.wrap/i64', 'i32.add',
+        ('get_local', 2), 'i32.trunc_s/f64', 'i32.add'),
+        locals=[i64, f64, i32])
+    builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('tee_local', 1), ('i32.const', 100), 'i32.add', ('tee_local', 1)),
+        locals=[i32])
+    # the call depth, recursing as deep as asked for
+    depth = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), 'i32.eqz', ('if', i32), ('i32.const', 0), 'else',
+        ('get_local', 0), ('i32.const', 1), 'i32.sub', ('call', 2), ('i32.const', 1), 'i32.add',
+        'end'))
+    vm = builder.buildVM()
+    assert vm.invoke(index, [21]) == [42]
+    # deeper than python's default recursion limit
+    assert vm.invoke(depth, [Max_Call_Depth - 1]) == [Max_Call_Depth - 1]
+    try:
+        vm.invoke(depth, [Max_Call_Depth])
+    except Trap:
+        pass
+    else:
+        assert False, 'call stack overflow did not trap'
+    assert len(vm.getState().Stack_Omni) == 0
+    assert vm.getState().Stack_Call == []
+
+
+def test_stack_growth():
+    builder = ModuleBuilder()
+    # recurses as deep as asked for with 4000 locals a frame
+    big = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), 'i32.eqz', ('if', i32), ('i32.const', 0), 'else',
+        ('get_local', 0), ('i32.const', 1), 'i32.sub', ('call', 0), ('i32.const', 1), 'i32.add',
+        'end'), locals=[i32] * 4000)
+    idle = builder.addFunction([], [], code(), locals=[i64] * 49000)
+    module = builder.parse(True)
+    vm = VM([module])
+    stack = vm.getState().Stack_Omni
+    # nothing is decoded or sized for a function before it is called
+    assert stack.size == Initial_Stack_Size
+    assert all(func_body.decoder is not None for func_body in module.code_section.func_bodies)
+    assert vm.invoke(big, [100]) == [100]
+    assert stack.size > 100 * 4000
+    assert module.code_section.func_bodies[idle].decoder is not None
+    try:
+        vm.invoke(big, [Max_Stack_Size // 4000])
+    except Trap as e:
+        assert str(e) == 'operand stack exhausted'
+    else:
+        assert False, 'operand stack overflow did not trap'
+    assert stack.size <= Max_Stack_Size
+    assert len(stack) == 0 and vm.getState().Stack_Call == []
+    assert vm.invoke(big, [3]) == [3]
+
+
+def test_call_sample():
+    vm = VM([PythonInterpreter().parse('../c-samples/8.wasm')])
+    fib = vm.getExportFunctionIndex('fib')
+    assert [vm.invoke(fib, [n])[0] for n in (0, 1, 2, 10, 15)] == [0, 1, 1, 55, 610]
+
+
+def main():
+    test_branches()
+    test_calls()
+    test_trap()
+    test_handlers()
+    test_loop_sample()
+    test_locals()
+    test_stack_growth()
+    test_call_sample()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import sys
+import os
+import tempfile
+sys.path.append('../')
+from argparser import PythonInterpreter
+from TBInit import VM
+from utils import ParseFlags
+from execute import Trap
+from predecode import BuildBlockGas, Default_Costs
+from gas import LoadGasSchedule, MakeGasSchedule, Op_Codes
+from wasmbuilder import ModuleBuilder, Ins_Table, build_body, code, i32, empty
+from test_sidetable import Nested_Body
+
+
+# wraps the handlers of the vm so they charge every instruction its cost as it
+# runs, which is one per instruction with the default schedule. returns the
+# counter, a list of one.
+def count_instructions(vm):
+    counter = [0]
+    costs = vm.executewasm.costs
+
+    def counting(handler):
+        def run(opcodeint, immediate):
+            counter[0] += costs[opcodeint]
+            handler(opcodeint, immediate)
+        return run
+
+    handlers = vm.executewasm.handlers
+    handlers[:] = [counting(handler) for handler in handlers]
+    return counter
+
+
+def test_block_gas():
+    func_body = build_body([i32], [i32], Nested_Body)
+    # the blocks end at the br_if, if, br, else, return and br_table
+    assert list(func_body.side_table.gas) == [7, 6, 5, 4, 3, 2, 1, 3, 2, 1, 2, 1, 1, 2, 1, 3, 2,
+                                              1, 2, 1]
+    costs = Default_Costs[:]
+    costs[Ins_Table['i32.sub'][0]] = 10
+    assert list(BuildBlockGas(func_body.code, costs))[0:8] == [16, 15, 14, 13, 12, 2, 1, 3]
+
+
+def test_gas_totals():
+    for file_path, name, args in (('../c-samples/7.wasm', 'main', [0, 0]),
+                                  ('../c-samples/8.wasm', 'fib', [12]),
+                                  ('../c-samples/9.wasm', 'main', [0, 0])):
+        vm = VM([PythonInterpreter().parse(file_path)])
+        counter = count_instructions(vm)
+        vm.invoke(vm.getExportFunctionIndex(name), args)
+        assert vm.executewasm.getOPGas() == counter[0], file_path
+
+
+def test_gas_traps():
+    builder = ModuleBuilder()
+    builder.addMemory(1, 4)
+    # traps in the middle of a block, one call down
+    divide = builder.addFunction([i32], [i32], code(
+        ('i32.const', 1), ('get_local', 0), 'i32.div_u',
+        ('i32.const', 2), 'i32.add', ('i32.const', 3), 'i32.mul'))
+    caller = builder.addFunction([i32], [i32], code(
+        ('block', empty), ('get_local', 0), ('call', divide), 'drop', 'end',
+        ('i32.const', 4), ('i32.const', 5), 'i32.add'))
+    grow = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('grow_memory', 0), ('i32.const', 1), 'i32.add'))
+    vm = builder.buildVM()
+    counter = count_instructions(vm)
+    assert vm.invoke(caller, [1]) == [9]
+    assert vm.executewasm.getOPGas() == counter[0]
+    try:
+        vm.invoke(caller, [0])
+    except Trap:
+        pass
+    else:
+        assert False, 'division by zero did not trap'
+    assert vm.executewasm.getOPGas() == counter[0]
+    # grow_memory also pays for the pages it is granted, only those
+    assert vm.invoke(grow, [2]) == [2]
+    assert vm.executewasm.getOPGas() == counter[0] + 2 * 64
+    assert vm.invoke(grow, [2]) == [0]
+    assert vm.executewasm.getOPGas() == counter[0] + 2 * 64
+
+
+def test_gas_schedule():
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.write(fd, b'{"default": 2, "memory_page": 10, '
+                 b'"opcodes": {"i32.div_u": 40, "call": 7, "i64.rotr": 3}}')
+    os.close(fd)
+    try:
+        schedule = LoadGasSchedule(path)
+    finally:
+        os.remove(path)
+    assert schedule.costs[Op_Codes['i32.div_u']] == 40
+    assert schedule.costs[0x8a] == 3
+    assert schedule.costs[Op_Codes['i32.add']] == 2
+    assert schedule.page_cost == 10
+    assert not schedule.isDefault() and MakeGasSchedule(dict()).isDefault()
+    for bad in ([], {'opcodes': {'i32.nope': 1}}, {'default': -1}, {'memory_page': 1.5},
+                {'gas': 1}):
+        try:
+            MakeGasSchedule(bad)
+        except Exception:
+            pass
+        else:
+            assert False, 'bad schedule was accepted: ' + repr(bad)
+    # the block costs fold in the schedule and the totals match charging
+    # every instruction as it runs, traps included
+    for file_path, name, args in (('../c-samples/8.wasm', 'fib', [12]),
+                                  ('../c-samples/9.wasm', 'main', [0, 0])):
+        vm = VM([PythonInterpreter().parse(file_path)], None, schedule)
+        counter = count_instructions(vm)
+        vm.invoke(vm.getExportFunctionIndex(name), args)
+        assert vm.executewasm.getOPGas() == counter[0], file_path
+    builder = ModuleBuilder()
+    builder.addMemory(1, 4)
+    divide = builder.addFunction([i32, i32], [i32], code(
+        ('get_local', 0), ('get_local', 1), 'i32.div_u', ('i32.const', 1), 'i32.add'))
+    grow = builder.addFunction([i32], [i32], code(('get_local', 0), ('grow_memory', 0)))
+    vm = builder.buildVM(schedule)
+    counter = count_instructions(vm)
+    assert vm.invoke(divide, [6, 3]) == [3]
+    assert vm.executewasm.getOPGas() == counter[0] == 2 + 2 + 40 + 2 + 2 + 2
+    try:
+        vm.invoke(divide, [6, 0])
+    except Trap:
+        pass
+    else:
+        assert False, 'division by zero did not trap'
+    assert vm.executewasm.getOPGas() == counter[0]
+    assert vm.invoke(grow, [2]) == [1]
+    assert vm.executewasm.getOPGas() == counter[0] + 2 * 10
+
+
+def expect_out_of_gas(vm, function, args):
+    try:
+        vm.invoke(function, args)
+    except Trap as e:
+        assert str(e) == 'out of gas', str(e)
+    else:
+        assert False, 'ran past the gas limit'
+
+
+def test_gas_limit():
+    # the exact total is enough, one less traps. the trap comes at the same
+    # point every time and only what ran was charged.
+    module = PythonInterpreter().parse('../c-samples/8.wasm')
+    vm = VM([module])
+    fib = vm.getExportFunctionIndex('fib')
+    assert vm.invoke(fib, [12]) == [144]
+    total = vm.executewasm.getOPGas()
+    vm = VM([module])
+    vm.executewasm.setGasLimit(total)
+    assert vm.invoke(fib, [12]) == [144]
+    assert vm.executewasm.getGasLeft() == 0
+    used = []
+    for i in range(2):
+        vm = VM([module])
+        counter = count_instructions(vm)
+        vm.executewasm.setGasLimit(total - 1)
+        expect_out_of_gas(vm, fib, [12])
+        assert vm.executewasm.getOPGas() == counter[0] <= total - 1
+        assert len(vm.getState().Stack_Omni) == 0 and len(vm.getState().Stack_Call) == 0
+        used.append(counter[0])
+    assert used[0] == used[1]
+    # the limit counts from when it was set, the stacks still work after
+    vm.executewasm.setGasLimit(total)
+    assert vm.invoke(fib, [12]) == [144]
+
+    builder = ModuleBuilder()
+    builder.addMemory(1, 4)
+    spin = builder.addFunction([], [], code(('loop', empty), ('br', 0), 'end'))
+    grow = builder.addFunction([i32], [i32], code(('get_local', 0), ('grow_memory', 0)))
+    builder.setStart(spin)
+    vm = builder.buildVM()
+    counter = count_instructions(vm)
+    vm.executewasm.setGasLimit(500)
+    expect_out_of_gas(vm, spin, [])
+    assert vm.executewasm.getOPGas() == counter[0] == 500
+    # grow_memory runs out before it grows
+    vm.executewasm.setGasLimit(2 + 64)
+    expect_out_of_gas(vm, grow, [2])
+    assert vm.executewasm.getOPGas() == counter[0] == 502
+    assert len(vm.getState().Linear_Memory[0]) == 65536
+    # a grow that fails returns -1 and costs no pages, the usual probe with
+    # -1 pages included
+    vm.executewasm.setGasLimit(3 + 3)
+    assert vm.invoke(grow, [-1]) == [0xffffffff]
+    assert vm.invoke(grow, [4]) == [0xffffffff]
+    assert vm.executewasm.getOPGas() == counter[0] == 508
+    vm.executewasm.setGasLimit(None)
+    assert vm.executewasm.getGasLeft() is None
+    assert vm.invoke(grow, [1]) == [1]
+    # run stops the start function at its limit, raises the trap and lifts
+    # the limit after
+    vm = builder.buildVM()
+    vm.setFlags(ParseFlags(None, None, None, None, None, False, False, None, False, True, False,
+                           False))
+    try:
+        vm.run(gas_limit=1000)
+    except Trap as e:
+        assert str(e) == 'out of gas', str(e)
+    else:
+        assert False, 'run did not report running out of gas'
+    assert vm.executewasm.getOPGas() == 1000
+    assert vm.executewasm.getGasLeft() is None
+    # a start function that fits the budget runs to its end
+    builder = ModuleBuilder()
+    builder.setStart(builder.addFunction([], [], code(('i32.const', 1), 'drop')))
+    vm = builder.buildVM()
+    vm.setFlags(ParseFlags(None, None, None, None, None, False, False, None, False, True, False,
+                           False))
+    vm.run(gas_limit=3)
+    assert vm.executewasm.getOPGas() == 3
+
+
+def main():
+    test_block_gas()
+    test_gas_totals()
+    test_gas_traps()
+    test_gas_schedule()
+    test_gas_limit()
+
+
+if __name__ == '__main__':
+    main()
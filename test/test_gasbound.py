@@ -0,0 +1,201 @@
+import sys
+import shutil
+import tempfile
+sys.path.append('../')
+from argparser import PythonInterpreter
+from TBInit import VM
+from modcache import ModuleCache
+from predecode import BuildCFG
+from gas import MakeGasSchedule
+from gasbound import GetGasBounds, TripCount
+from wasmbuilder import ModuleBuilder, build_body, code, i32, i64, empty
+from test_sidetable import Nested_Body
+
+
+# the gas a call uses when it runs
+def run_gas(module, func_index, args):
+    vm = VM([module])
+    vm.invoke(func_index, args)
+    return vm.executewasm.getOPGas()
+
+
+def test_cfg():
+    func_body = build_body([i32], [i32], Nested_Body)
+    blocks = [(block.start, block.end, block.successors) for block in BuildCFG(func_body)]
+    # the loop's body is 2 to 6, its end 7 and the if's branches 10 to 11 and
+    # 13 to 14
+    assert blocks == [(0, 1, [2]), (2, 6, [7, 2]), (7, 7, [8]), (8, 9, [10, 13]),
+                      (10, 11, [19]), (12, 12, [16]), (13, 14, [19]), (15, 15, [16]),
+                      (16, 17, [19]), (18, 18, [19]), (19, 19, [])]
+
+
+def test_trip_count():
+    # for (x = 0; x != 10; ++x) as a do-while that compares after the step
+    assert TripCount(0, 1, 10, 'eq', 32, False, 1) == 10
+    # for (x = 2; x * x ...; ++x) style guards that compare before the step
+    assert TripCount(2, 1, 7, 'ge', 32, True, 0) == 6
+    assert TripCount(2, 3, 7, 'gt', 32, True, 0) == 3
+    # counting down, signed
+    assert TripCount(10, -2, -1, 'le', 32, True, 0) == 7
+    assert TripCount(-1, 1, 5, 'ge', 32, True, 0) == 7
+    # the compare holds right away, the body still runs once
+    assert TripCount(20, 1, 10, 'ge', 32, False, 1) == 1
+    # counting away from the limit or past it wraps
+    assert TripCount(0, -1, 10, 'ge', 32, True, 0) is None
+    assert TripCount(0, 3, 10, 'eq', 32, False, 1) is None
+    assert TripCount(0, 1, 0xffffffff, 'gt', 32, False, 0) is None
+    assert TripCount(0, 1, 0xffffffff, 'ge', 32, False, 0) == 0x100000000
+    assert TripCount(0xfffffffe, 1, 0, 'eq', 32, False, 0) is None
+    assert TripCount(5, 1, 5, 'ne', 64, False, 0) == 2
+
+
+def test_gas_bounds():
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    straight = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('i32.const', 1), 'i32.add'))
+    # the if's then branch is the longer one
+    branches = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('if', i32), ('i32.const', 1), ('i32.const', 2), 'i32.add', 'else',
+        ('i32.const', 3), 'end'))
+    # do {} while (++x != 100) with x starting at the zero of a local
+    count_up = builder.addFunction([], [i32], code(
+        ('loop', empty), ('get_local', 1), ('get_local', 0), 'i32.add', ('set_local', 1),
+        ('get_local', 0), ('i32.const', 1), 'i32.add', ('tee_local', 0), ('i32.const', 100),
+        'i32.ne', ('br_if', 0), 'end', ('get_local', 1)), [i32, i32])
+    # for (x = 50; x > 0; x -= 3) with the compare in front and a call inside
+    count_down = builder.addFunction([], [i64], code(
+        ('i64.const', 50), ('set_local', 0),
+        ('block', empty), ('loop', empty),
+        ('get_local', 0), ('i64.const', 0), 'i64.le_s', ('br_if', 1),
+        ('get_local', 1), ('get_local', 0), 'i64.add', ('set_local', 1),
+        ('i32.const', 7), ('call', straight), 'drop',
+        ('get_local', 0), ('i64.const', 3), 'i64.sub', ('set_local', 0),
+        ('br', 0), 'end', 'end', ('get_local', 1)), [i64, i64])
+    # for (i = 0; i < 10; ++i) for (j = 0; j < i + 1; ++j) has no static
+    # bound for j but for (j = 0; j < 4; ++j) does
+    nested = builder.addFunction([], [i32], code(
+        ('loop', empty),
+        ('i32.const', 0), ('set_local', 1),
+        ('loop', empty),
+        ('get_local', 2), ('i32.const', 1), 'i32.add', ('set_local', 2),
+        ('get_local', 1), ('i32.const', 1), 'i32.add', ('tee_local', 1), ('i32.const', 4),
+        'i32.lt_u', ('br_if', 0), 'end',
+        ('get_local', 0), ('i32.const', 1), 'i32.add', ('tee_local', 0), ('i32.const', 10),
+        'i32.lt_s', ('br_if', 0), 'end', ('get_local', 2)), [i32, i32, i32])
+    calls = builder.addFunction([], [i32], code(
+        ('call', count_up), ('i32.const', 1), ('call', branches), 'i32.add'))
+    grow = builder.addFunction([], [i32], code(('i32.const', 2), ('grow_memory', 0)))
+    grow_any = builder.addFunction([i32], [i32], code(('get_local', 0), ('grow_memory', 0)))
+    probe = builder.addFunction([], [i32], code(('i32.const', -1), ('grow_memory', 0)))
+    module = builder.parse()
+    bounds = GetGasBounds(module)
+    assert module.code_section.gas_bounds is bounds
+    # straight line code and loops that run every instruction each time are
+    # exact
+    assert bounds[straight].gas == run_gas(module, straight, [1]) == 4
+    assert bounds[branches].gas == run_gas(module, branches, [1]) == 7
+    assert run_gas(module, branches, [0]) == 5
+    assert bounds[count_up].gas == run_gas(module, count_up, []) == 1 + 100 * 11 + 3
+    assert bounds[nested].gas == run_gas(module, nested, []) == 1 + 10 * (3 + 4 * 11 + 1 + 7) + 3
+    assert bounds[calls].gas == run_gas(module, calls, []) == \
+        bounds[count_up].gas + bounds[branches].gas + 5
+    assert bounds[grow].gas == run_gas(module, grow, []) == 3 + 2 * 64
+    # a grow is granted at most the pages up to the maximum, a constant delta
+    # past it never is
+    assert bounds[grow_any].gas == 3 + 65535 * 64
+    assert bounds[probe].gas == run_gas(module, probe, []) == 3
+    # the last of the 18 iterations of a loop that leaves at the top only
+    # runs the compare but is charged in full
+    assert run_gas(module, count_down, []) == 4 + 17 * 20 + 4 + 2
+    assert bounds[count_down].gas == 4 + 18 * 20 + 2
+    # the schedule's costs go into the bounds, which aren't kept then
+    schedule = MakeGasSchedule({'opcodes': {'i32.add': 10, 'call': 5}})
+    scheduled = GetGasBounds(module, schedule)
+    assert scheduled[straight].gas == 13
+    assert scheduled[calls].gas == \
+        scheduled[count_up].gas + scheduled[branches].gas + 5 + 1 + 5 + 10 + 1
+    assert GetGasBounds(module) is bounds
+
+
+def test_unbounded():
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    builder.addTable(1)
+    imported = builder.addImportFunction('env', 'f', [], [])
+    # the trip count depends on the parameter
+    param_loop = builder.addFunction([i32], [], code(
+        ('loop', empty), ('get_local', 0), ('i32.const', 1), 'i32.sub', ('tee_local', 0),
+        ('br_if', 0), 'end'))
+    # the counter is also written in the body
+    written = builder.addFunction([], [], code(
+        ('loop', empty), ('i32.const', 3), ('set_local', 0),
+        ('get_local', 0), ('i32.const', 1), 'i32.add', ('tee_local', 0), ('i32.const', 10),
+        'i32.lt_u', ('br_if', 0), 'end'), [i32])
+    # the step is in an if so it doesn't happen every iteration
+    skipped = builder.addFunction([i32], [], code(
+        ('loop', empty), ('get_local', 0), ('if', empty),
+        ('get_local', 1), ('i32.const', 1), 'i32.add', ('set_local', 1), 'end',
+        ('get_local', 1), ('i32.const', 10), 'i32.lt_u', ('br_if', 0), 'end'), [i32])
+    recursive = builder.addFunction([i32], [i32], code(
+        ('get_local', 0), ('if', i32), ('get_local', 0), ('i32.const', 1), 'i32.sub',
+        ('call', 4), 'else', ('i32.const', 0), 'end'))
+    caller = builder.addFunction([], [i32], code(('i32.const', 3), ('call', recursive)))
+    indirect = builder.addFunction([], [], code(('i32.const', 0), ('call_indirect', 0, 0)))
+    calls_import = builder.addFunction([], [], code(('call', imported)))
+    module = builder.parse()
+    bounds = GetGasBounds(module)
+    for func_index, pc, reason in ((param_loop, 0, 'loop without a static trip count'),
+                                   (written, 0, 'loop without a static trip count'),
+                                   (skipped, 0, 'loop without a static trip count'),
+                                   (recursive, 5, 'recursive call to function 4'),
+                                   (indirect, 1, 'call_indirect'),
+                                   (imported, 0, 'imported function'),
+                                   (calls_import, 0, 'call to imported function 0')):
+        bound = bounds[func_index]
+        assert (bound.gas, bound.func_index, bound.pc, bound.reason) == \
+            (None, func_index, pc, reason), bound.getText()
+    # a call to a function without a bound has the callee's reason, unless
+    # the callee is an import
+    assert bounds[caller] is bounds[recursive]
+    assert bounds[param_loop].getText() == \
+        'unbounded: loop without a static trip count at function 1 pc 0'
+
+
+def test_sample_bounds():
+    bounds = GetGasBounds(PythonInterpreter().parse('../c-samples/6.wasm'))
+    assert bounds[0].gas == 1300004
+    # fib recurses, the sieve's inner loop steps by the outer counter
+    bounds = GetGasBounds(PythonInterpreter().parse('../c-samples/8.wasm'))
+    assert bounds[0].reason == 'recursive call to function 0' and bounds[1] is bounds[0]
+    bounds = GetGasBounds(PythonInterpreter().parse('../c-samples/9.wasm'))
+    assert (bounds[0].reason, bounds[0].pc) == ('loop without a static trip count', 16)
+
+
+def test_gas_bound_cache():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        interpreter = PythonInterpreter()
+        cache = ModuleCache(cache_dir)
+        parsed = interpreter.parse('../c-samples/6.wasm', False, False, cache)
+        assert parsed.code_section.gas_bounds[0].gas == 1300004
+        cached = interpreter.parse('../c-samples/6.wasm', False, False, cache)
+        assert cache.hits == 1
+        # the bounds come out of the cache, not another analysis
+        assert cached.code_section.gas_bounds[0].gas == 1300004
+        assert GetGasBounds(cached) is cached.code_section.gas_bounds
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def main():
+    test_cfg()
+    test_trip_count()
+    test_gas_bounds()
+    test_unbounded()
+    test_sample_bounds()
+    test_gas_bound_cache()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import sys
+sys.path.append('../')
+from wasmbuilder import ModuleBuilder, code, i32, i64, f32, f64
+
+
+def parse_body(body):
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    builder.addFunction([], [], body)
+    return builder.parse().code_section.func_bodies[0].code
+
+
+def test_typed_immediates():
+    ins = parse_body(code(('i32.const', -17), 'drop',
+                          ('i64.const', 1 << 40), 'drop',
+                          ('f32.const', 1.5), 'drop',
+                          ('f64.const', -0.25), 'drop',
+                          ('i32.const', 64), ('i32.load', 2, 300), 'drop',
+                          ('block', 0x40), ('i32.const', 1),
+                          ('br_table', [0, 1, 0], 1), 'end'))
+    operands = [i.operands for i in ins]
+    assert operands[0] == (-17,)
+    assert operands[2] == (1 << 40,)
+    assert operands[4] == (1.5,)
+    assert isinstance(operands[4][0], float)
+    assert operands[6] == (-0.25,)
+    assert operands[9] == (2, 300)
+    assert operands[13] == ((0, 1, 0), 1)
+    assert operands[1] == ()
+    assert ins[13].getOperandsText() == '3 0 1 0 1'
+    assert ins[9].getOperandsText() == '2 300'
+
+
+def test_code_store():
+    store = parse_body(code(('get_local', 0), ('i32.load', 2, 8), 'i32.add',
+                            ('f64.const', 2.0), 'drop'))
+    assert list(store.opcodes) == [0x20, 0x28, 0x6a, 0x44, 0x1a, 0x0b]
+    # a memory instruction's immediate is its offset
+    assert list(store.immediates) == [0, 8, 0, 0, 0, 0]
+    assert sorted(store.side) == [1, 3]
+    assert store.getOperands(0) == (0,)
+    assert store.getOperands(2) == ()
+    assert [i.opcode for i in store] == ['get_local', 'i32.load', 'i32.add',
+                                         'f64.const', 'drop', 'end']
+    assert store[-1].opcodeint == 0x0b
+
+
+def main():
+    test_typed_immediates()
+    test_code_store()
+
+
+if __name__ == '__main__':
+    main()
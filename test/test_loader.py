@@ -0,0 +1,100 @@
+import sys
+sys.path.append('../')
+from argparser import ReadWASM, ObjReader
+from wasmbuilder import ModuleBuilder, parse_stream, name, uleb, code, i32
+
+
+def read_raw(sections):
+    builder = ModuleBuilder()
+    raw = b'\x00asm\x01\x00\x00\x00'
+    for section_id, payload in sections:
+        raw += builder.section(section_id, payload)
+    return parse_stream(raw).parsedstruct
+
+
+def test_mmap_sections():
+    read = ReadWASM('./injected.wasm', 'little', False, False)
+    mapped = ReadWASM('./injected.wasm', 'little', False, False, True)
+    assert len(read.section_list) == len(mapped.section_list)
+    for a, b in zip(read.section_list, mapped.section_list):
+        assert a[0] == b[0]
+        assert a[2] == b[2]
+        assert isinstance(b[6], memoryview)
+        assert bytes(a[6]) == bytes(b[6])
+
+
+def test_mmap_module():
+    read = ObjReader(ReadWASM('./injected.wasm', 'little', False, False)).parse()
+    mapped = ObjReader(ReadWASM('./injected.wasm', 'little', False, False, True)).parse()
+    assert read.code_section.count == mapped.code_section.count
+    for a, b in zip(read.code_section.func_bodies, mapped.code_section.func_bodies):
+        assert [(i.opcode, i.operands) for i in a.code] == \
+            [(i.opcode, i.operands) for i in b.code]
+    for a, b in zip(read.data_section.data_segments, mapped.data_section.data_segments):
+        assert bytes(a.data) == bytes(b.data)
+
+
+def test_lazy_code_section():
+    eager = ObjReader(ReadWASM('./injected.wasm', 'little', False, False)).parse()
+    lazy = ObjReader(ReadWASM('./injected.wasm', 'little', False, False), True).parse()
+    for func_body in lazy.code_section.func_bodies:
+        assert func_body.decoder is not None
+    for a, b in zip(eager.code_section.func_bodies, lazy.code_section.func_bodies):
+        assert a.code_offset == b.code_offset
+        assert a.code_size == b.code_size
+        assert [(l.count, l.type) for l in a.locals] == [(l.count, l.type) for l in b.locals]
+        assert list(a.code.opcodes) == list(b.code.opcodes)
+        assert b.decoder is None
+
+
+def test_section_directory():
+    parsedstruct = read_raw([(0, name('first') + b'abc'), (1, uleb(0)),
+                             (0, name('second')), (3, uleb(0))])
+    assert sorted(parsedstruct.section_dir) == [1, 3]
+    assert bytes(parsedstruct.section_dir[1]) == b'\x00'
+    assert [(n, bytes(p)) for n, p in parsedstruct.custom_sections] == \
+        [('first', b'abc'), ('second', b'')]
+
+
+def test_bad_section_order():
+    for sections in ([(1, uleb(0)), (1, uleb(0))], [(3, uleb(0)), (1, uleb(0))]):
+        try:
+            read_raw(sections)
+        except Exception:
+            pass
+        else:
+            assert False, 'malformed section order was accepted'
+
+
+def test_section_entries():
+    builder = ModuleBuilder()
+    builder.addImportFunction('env', 'f', [i32], [])
+    builder.addTable(2)
+    builder.addMemory(1, 4)
+    builder.addGlobal(i32, False, code(('i32.const', 11)))
+    index = builder.addFunction([], [], b'', export='main')
+    builder.addElem(11, [index, index])
+    builder.addData(11, b'ab')
+    module = builder.parse()
+    assert module.import_section.import_entry[0].field_str == list(b'f')
+    assert module.export_section.export_entries[0].field_str == list(b'main')
+    assert module.table_section.table_types[0].limit.flags == 0
+    assert module.memory_section.memory_types[0].maximum == 4
+    # the immediate of i32.const 11 is itself an end byte
+    assert module.global_section.global_variables[0].init_expr == [0x41, 0x0b, 0x0b]
+    assert module.element_section.elem_segments[0].elems == [1, 1]
+    assert module.data_section.data_segments[0].offset == [0x41, 0x0b, 0x0b]
+    assert bytes(module.data_section.data_segments[0].data) == b'ab'
+
+
+def main():
+    test_mmap_sections()
+    test_mmap_module()
+    test_lazy_code_section()
+    test_section_directory()
+    test_bad_section_order()
+    test_section_entries()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import sys
+import struct as stc
+sys.path.append('../')
+from argparser import PythonInterpreter
+from TBInit import VM
+from execute import Trap
+from linearmemory import Memory_Instance, MapPages, Page_Size
+from wasmbuilder import ModuleBuilder, code, i32, i64, f32, f64
+
+# the bytes the load tests read, at address 8
+Data = bytes([0x80, 0xff, 0xfe, 0x7f, 0x01, 0x02, 0x03, 0x84, 0x00, 0x00, 0xc0, 0x3f])
+
+# (mnemonic, result type, struct format) of every load
+Loads = [('i32.load', i32, '<I'), ('i64.load', i64, '<Q'), ('f32.load', f32, '<f'),
+         ('f64.load', f64, '<d'), ('i32.load8_s', i32, '<b'), ('i32.load8_u', i32, '<B'),
+         ('i32.load16_s', i32, '<h'), ('i32.load16_u', i32, '<H'), ('i64.load8_s', i64, '<b'),
+         ('i64.load8_u', i64, '<B'), ('i64.load16_s', i64, '<h'), ('i64.load16_u', i64, '<H'),
+         ('i64.load32_s', i64, '<i'), ('i64.load32_u', i64, '<I')]
+# (mnemonic, operand type, size in bytes) of every store
+Stores = [('i32.store', i32, 4), ('i64.store', i64, 8), ('f32.store', f32, 4),
+          ('f64.store', f64, 8), ('i32.store8', i32, 1), ('i32.store16', i32, 2),
+          ('i64.store8', i64, 1), ('i64.store16', i64, 2), ('i64.store32', i64, 4)]
+
+
+# a load and a store function for every memory instruction. the loads read at
+# their address argument plus an offset of 4, the stores write at their
+# address argument.
+def build_memory_vm():
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    builder.addData(8, Data)
+    loads = dict()
+    for name, result_type, fmt in Loads:
+        loads[name] = builder.addFunction([i32], [result_type], code(
+            ('get_local', 0), (name, 0, 4)))
+    stores = dict()
+    for name, value_type, size in Stores:
+        stores[name] = builder.addFunction([i32, value_type], [], code(
+            ('get_local', 0), ('get_local', 1), (name, 0, 0)))
+    return builder.buildVM(), loads, stores
+
+
+def test_loads():
+    vm, loads, stores = build_memory_vm()
+    for name, result_type, fmt in Loads:
+        size = stc.calcsize(fmt)
+        for address in range(8, 8 + len(Data) - size + 1):
+            expect = stc.unpack_from(fmt, Data, address - 8)[0]
+            if result_type == i32:
+                expect &= 0xffffffff
+            elif result_type == i64:
+                expect &= 0xffffffffffffffff
+            result = vm.invoke(loads[name], [address - 4])[0]
+            # floats are compared by their bits for the NaNs
+            if result_type == f32 or result_type == f64:
+                result, expect = stc.pack('<d', result), stc.pack('<d', expect)
+            assert result == expect, (name, address, result, expect)
+    # the bytes in front of the data are zero
+    assert vm.invoke(loads['i32.load'], [0]) == [0]
+
+
+def test_stores():
+    vm, loads, stores = build_memory_vm()
+    memory = vm.getState().Linear_Memory[0]
+    # the narrow stores wrap
+    for name, value_type, size in Stores:
+        memory[100:116] = bytes(16)
+        if value_type == i32:
+            val = 0x89abcdef
+        elif value_type == i64:
+            val = 0x0123456789abcdef
+        else:
+            val = -1.5
+        assert vm.invoke(stores[name], [101, val]) == []
+        if value_type == f32:
+            expect = stc.pack('<f', val)
+        elif value_type == f64:
+            expect = stc.pack('<d', val)
+        else:
+            expect = val.to_bytes(8, 'little')[:size]
+        assert memory[100:116] == bytes(1) + expect + bytes(15 - size), name
+    # a store and a load of the same bytes round trip
+    vm.invoke(stores['i64.store'], [200, -2])
+    assert vm.invoke(loads['i64.load'], [196]) == [0xfffffffffffffffe]
+    assert vm.invoke(loads['i32.load16_s'], [196]) == [0xfffffffe]
+
+
+def test_out_of_bounds():
+    vm, loads, stores = build_memory_vm()
+    end = len(vm.getState().Linear_Memory[0])
+    assert end == 65536
+    # the last bytes are in bounds
+    assert vm.invoke(loads['i32.load'], [end - 8]) == [0]
+    assert vm.invoke(stores['i64.store'], [end - 8, 1]) == []
+    for function, args in ((loads['i32.load'], [end - 7]), (loads['i32.load8_u'], [end - 4]),
+                           # the address plus the offset is past 4GiB
+                           (loads['i32.load'], [-1]),
+                           (stores['i64.store'], [end - 7, 1]), (stores['i32.store8'], [end, 1])):
+        try:
+            vm.invoke(function, args)
+        except Trap:
+            pass
+        else:
+            assert False, 'out of bounds access did not trap'
+        assert len(vm.getState().Stack_Omni) == 0
+    # nothing was written by the stores that trapped
+    assert vm.getState().Linear_Memory[0][end - 8:] == bytes([1]) + bytes(7)
+
+
+def test_grow():
+    builder = ModuleBuilder()
+    builder.addMemory(1, 3)
+    grow = builder.addFunction([i32], [i32], code(('get_local', 0), ('grow_memory', 0)))
+    size = builder.addFunction([], [i32], code(('current_memory', 0)))
+    store = builder.addFunction([i32, i32], [], code(
+        ('get_local', 0), ('get_local', 1), ('i32.store8', 0, 0)))
+    load = builder.addFunction([i32], [i32], code(('get_local', 0), ('i32.load8_u', 0, 0)))
+    vm = builder.buildVM()
+    memory = vm.getState().Linear_Memory[0]
+    assert vm.invoke(size) == [1]
+    try:
+        vm.invoke(store, [Page_Size, 1])
+    except Trap:
+        pass
+    else:
+        assert False, 'store past the memory size did not trap'
+    assert vm.invoke(grow, [0]) == [1]
+    assert vm.invoke(grow, [1]) == [1]
+    assert vm.invoke(size) == [2]
+    assert len(memory) == 2 * Page_Size
+    # the new page is zero and can be written
+    assert vm.invoke(load, [2 * Page_Size - 1]) == [0]
+    assert vm.invoke(store, [2 * Page_Size - 1, 7]) == []
+    assert memory[2 * Page_Size - 1] == 7
+    # past the maximum it fails and the size stays
+    assert vm.invoke(grow, [2]) == [0xffffffff]
+    assert vm.invoke(grow, [-1]) == [0xffffffff]
+    assert vm.invoke(grow, [1]) == [2]
+    assert vm.invoke(size) == [3]
+
+
+def test_memory_instance():
+    # a memory as big as a memory can get only costs the pages it touches
+    memory = Memory_Instance(65536)
+    assert len(memory) == 65536 * Page_Size
+    memory[len(memory) - 1] = 1
+    assert memory[-1] == 1
+    assert memory.grow(1) == -1
+    try:
+        memory[len(memory)]
+    except IndexError:
+        pass
+    else:
+        assert False, 'index past the size was accepted'
+    try:
+        memory[0:2] = b'abc'
+    except IndexError:
+        pass
+    else:
+        assert False, 'slice assignment changed the size'
+    try:
+        Memory_Instance(3, 2)
+    except Exception:
+        pass
+    else:
+        assert False, 'initial size over the maximum was accepted'
+    # without the reservation growing maps a bigger buffer and copies
+    memory = Memory_Instance(1, 4)
+    memory.buffer = MapPages(1)
+    memory.reserved = 1
+    memory[10:13] = b'abc'
+    assert memory.grow(2) == 1
+    assert memory.reserved == 3
+    assert memory[10:13] == b'abc'
+    assert memory[3 * Page_Size - 1] == 0
+
+
+def test_memory_sample():
+    vm = VM([PythonInterpreter().parse('../c-samples/9.wasm')])
+    assert vm.invoke(vm.getExportFunctionIndex('main'), [0, 0]) == [2262]
+
+
+def main():
+    test_loads()
+    test_stores()
+    test_out_of_bounds()
+    test_grow()
+    test_memory_instance()
+    test_memory_sample()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import sys
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+from array import array
+sys.path.append('../')
+from argparser import PythonInterpreter
+from modcache import ModuleCache, PackModule, UnpackModule, PackValue, Value_Reader, \
+    Cache_Header, Cache_Magic, Cache_Format_Version, Cache_Schema
+from section_structs import Parser_Version
+from wasmbuilder import ModuleBuilder, code, i32, f64
+
+
+def read_obj(path):
+    with open(path, 'rb') as obj_file:
+        return obj_file.read()
+
+
+def module_text(module):
+    code = [[(i.opcode, i.operands) for i in func_body.code]
+            for func_body in module.code_section.func_bodies]
+    data = [bytes(segment.data) for segment in module.data_section.data_segments]
+    exports = [entry.field_str for entry in module.export_section.export_entries]
+    return code, data, exports
+
+
+def test_cache_hit():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        interpreter = PythonInterpreter()
+        cache = ModuleCache(cache_dir)
+        parsed = interpreter.parse('./injected.wasm', False, True, cache)
+        assert (cache.hits, cache.misses, cache.stores) == (0, 1, 1)
+        cached = interpreter.parse('./injected.wasm', False, True, cache)
+        assert (cache.hits, cache.misses, cache.stores) == (1, 1, 1)
+        assert cached is not parsed
+        # lazy is ignored with a cache, so neither module has pending bodies
+        for func_body in parsed.code_section.func_bodies + cached.code_section.func_bodies:
+            assert func_body.decoder is None
+        # the mapped object hashes the same as the read one
+        interpreter.parse('./injected.wasm', True, False, cache)
+        assert (cache.hits, cache.misses, cache.stores) == (2, 1, 1)
+        assert module_text(cached) == module_text(parsed)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_cache_corrupt_entry():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        raw = read_obj('./injected.wasm')
+        cache = ModuleCache(cache_dir)
+        cache.store(raw, PythonInterpreter().parse('./injected.wasm'))
+        path = cache.getEntryPath(cache.getDigest(raw))
+        with open(path, 'r+b') as entry_file:
+            entry_file.write(b'XXXX')
+        assert cache.load(raw) is None
+        assert not os.path.exists(path)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_cache_eviction():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        module = PythonInterpreter().parse('../c-samples/1.wasm')
+        cache = ModuleCache(cache_dir)
+        cache.store(b'first', module)
+        entry_size = cache.getEntries()[0][1]
+        cache.max_size = 2 * entry_size
+        cache.store(b'second', module)
+        first = cache.getEntryPath(cache.getDigest(b'first'))
+        os.utime(first, (0, 0))
+        cache.store(b'third', module)
+        assert cache.evictions == 1
+        assert cache.load(b'first') is None
+        assert cache.load(b'second') is not None
+        assert cache.load(b'third') is not None
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_pack_values():
+    values = [None, True, False, 0, -1, 1 << 70, -(1 << 63), 0.5, b'ab', memoryview(b'cd'), 'name',
+              [1, 2, None], (3, -4), [1, 'x', (2.5,)], (), {1: [2, None], 3: [4]}, {5: (6,)},
+              {7: 'y', 8: None}, {'key': 1}, array('B', [1, 2]), array('d', [0.25])]
+    out = bytearray()
+    PackValue(values, out)
+    reader = Value_Reader(memoryview(bytes(out)))
+    assert reader.read() == values[0:9] + [b'cd'] + values[10:]
+    assert reader.offset == len(out)
+    # the globals' init-exprs, the f64 immediates and the memory limits
+    builder = ModuleBuilder()
+    builder.addMemory(1, 2)
+    builder.addGlobal(f64, True, code(('f64.const', 1.5)))
+    builder.addFunction([], [f64], code(('get_global', 0), ('f64.const', -0.25), 'f64.add'))
+    module = builder.parse()
+    unpacked = UnpackModule(PackModule(module))
+    assert unpacked.global_section.global_variables[0].init_expr == \
+        module.global_section.global_variables[0].init_expr
+    assert unpacked.memory_section.memory_types[0].maximum == 2
+    assert [(i.opcode, i.operands) for i in unpacked.code_section.func_bodies[0].code] == \
+        [(i.opcode, i.operands) for i in module.code_section.func_bodies[0].code]
+    try:
+        PackValue(set([1]), bytearray())
+    except Exception:
+        pass
+    else:
+        assert False, 'a set was packed'
+
+
+def test_cache_untrusted_entry():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        raw = read_obj('./injected.wasm')
+        cache = ModuleCache(cache_dir)
+        path = cache.getEntryPath(cache.getDigest(raw))
+        marker = os.path.join(cache_dir, 'ran')
+        # an entry holding a pickle that would run code is just a bad entry
+        payload = zlib.compress(pickle.dumps(Run_On_Load(marker)))
+        with open(path, 'wb') as entry_file:
+            entry_file.write(Cache_Header.pack(Cache_Magic, Cache_Format_Version, Parser_Version,
+                                               Cache_Schema, cache.getDigest(raw)) + payload)
+        assert cache.load(raw) is None
+        assert not os.path.exists(marker)
+        # an entry packed with other fields is stale
+        with open(path, 'wb') as entry_file:
+            entry_file.write(Cache_Header.pack(Cache_Magic, Cache_Format_Version, Parser_Version,
+                                               bytes(8), cache.getDigest(raw)) +
+                             PackModule(PythonInterpreter().parse('./injected.wasm')))
+        assert cache.load(raw) is None
+        assert not os.path.exists(path)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+class Run_On_Load():
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (open, (self.path, 'w'))
+
+
+def test_cache_dir_permissions():
+    parent_dir = tempfile.mkdtemp()
+    try:
+        cache_dir = os.path.join(parent_dir, 'cache')
+        ModuleCache(cache_dir)
+        assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+        os.chmod(cache_dir, 0o777)
+        try:
+            ModuleCache(cache_dir)
+        except Exception:
+            pass
+        else:
+            assert False, 'a cache directory others can write was used'
+    finally:
+        shutil.rmtree(parent_dir)
+
+
+def main():
+    test_cache_hit()
+    test_cache_corrupt_entry()
+    test_cache_eviction()
+    test_pack_values()
+    test_cache_untrusted_entry()
+    test_cache_dir_permissions()
+
+
+if __name__ == '__main__':
+    main()
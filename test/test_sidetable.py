@@ -0,0 +1,67 @@
+import sys
+sys.path.append('../')
+from TBInit import ModuleValidation
+from wasmbuilder import ModuleBuilder, build_body, code, i32, empty
+
+
+Nested_Body = [
+    ('block', i32),                                 # 0
+    ('loop', empty),                                # 1
+    ('get_local', 0), ('i32.const', 1), 'i32.sub',  # 2 3 4
+    ('tee_local', 0), ('br_if', 0),                 # 5 6
+    'end',                                          # 7
+    ('get_local', 0),                               # 8
+    ('if', i32),                                    # 9
+    ('i32.const', 2), ('br', 1),                    # 10 11
+    'else',                                         # 12
+    ('i32.const', 3), 'return',                     # 13 14
+    'end',                                          # 15
+    ('get_local', 0), ('br_table', [0, 1], 0),      # 16 17
+    'end']                                          # 18, the function's end is 19
+
+
+def check_nested(side_table):
+    targets = side_table.targets
+    # block and loop skip to after their end, if to after its else and else
+    # to after the end of the if
+    assert targets[0] == 19
+    assert targets[1] == 8
+    assert targets[9] == 13
+    assert targets[12] == 16
+    # br_if 0 in the loop goes back to the top of the loop body
+    assert (targets[6], side_table.arities[6], side_table.heights[6]) == (2, 0, 0)
+    # br 1 in the if leaves the block with one value
+    assert (targets[11], side_table.arities[11], side_table.heights[11]) == (19, 1, 0)
+    # return goes to the function's end, the end of block 0 falls through to it
+    assert (targets[14], side_table.arities[14], side_table.heights[14]) == (19, 1, 0)
+    assert side_table.tables == {17: ((19, 0), (19, 0), (19, 0))}
+    assert targets[17] == 19
+
+
+def test_side_table():
+    func_body = build_body([i32], [i32], Nested_Body)
+    assert func_body.validation_error is None
+    check_nested(func_body.side_table)
+
+
+def test_side_table_lazy():
+    func_body = build_body([i32], [i32], Nested_Body, True)
+    assert func_body.side_table is None
+    func_body.code
+    check_nested(func_body.side_table)
+
+
+def test_side_table_invalid():
+    func_body = build_body([], [i32], [('br', 0)])
+    assert func_body.validation_error is not None
+    assert func_body.side_table is None
+
+
+def main():
+    test_side_table()
+    test_side_table_lazy()
+    test_side_table_invalid()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import sys
+import os
+import threading
+sys.path.append('../')
+from argparser import ReadWASM, ObjReader, StreamParser
+from TBInit import TBMachine
+from wasmbuilder import ModuleBuilder, code, i32
+
+
+# hands out at most three bytes per read like a slow pipe would
+class Trickle():
+    def __init__(self, raw):
+        self.raw = raw
+        self.offset = 0
+
+    def read(self, n):
+        chunk = self.raw[self.offset:self.offset + min(n, 3)]
+        self.offset += len(chunk)
+        return chunk
+
+
+def build_module():
+    builder = ModuleBuilder()
+    builder.addImportFunction('env', 'f', [i32], [])
+    builder.addMemory(1)
+    builder.addFunction([], [], code(('i32.const', 1), ('call', 0)), export='main')
+    builder.addData(16, b'streamed')
+    raw = bytearray(builder.build())
+    raw += builder.section(0, b'\x04note' + b'xyz')
+    return bytes(raw)
+
+
+def test_stream_sections():
+    machinestate = TBMachine()
+    parser = StreamParser(Trickle(build_module()), False, machinestate)
+    seen = []
+    for section_id, section in parser.sections():
+        seen.append(section_id)
+        if section_id == 10:
+            # the declarations were set up before the code section was read
+            assert machinestate.Index_Space_Function == ['f', 1]
+            assert len(machinestate.Linear_Memory) == 1
+        if section_id == 11:
+            assert section.data_segments[0].size == 8
+    assert seen == [1, 2, 3, 5, 7, 10, 11, 0]
+    assert machinestate.Linear_Memory[0][16:24] == b'streamed'
+    assert parser.parsedstruct.custom_sections[0][0] == 'note'
+    assert [i.opcode for i in parser.module.code_section.func_bodies[0].code] == \
+        ['i32.const', 'call', 'end']
+
+
+def test_stream_pipe():
+    read_fd, write_fd = os.pipe()
+
+    def writer():
+        with open('./injected.wasm', 'rb') as obj_file:
+            raw = obj_file.read()
+        for offset in range(0, len(raw), 97):
+            os.write(write_fd, raw[offset:offset + 97])
+        os.close(write_fd)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    with os.fdopen(read_fd, 'rb', buffering=0) as stream:
+        streamed = StreamParser(stream).parse()
+    thread.join()
+    parsed = ObjReader(ReadWASM('./injected.wasm', 'little', False, False)).parse()
+    for a, b in zip(parsed.code_section.func_bodies, streamed.code_section.func_bodies):
+        assert list(a.code.opcodes) == list(b.code.opcodes)
+    assert [bytes(d.data) for d in parsed.data_section.data_segments] == \
+        [bytes(d.data) for d in streamed.data_section.data_segments]
+
+
+def test_stream_truncated():
+    try:
+        StreamParser(Trickle(build_module()[:-5])).parse()
+    except Exception:
+        pass
+    else:
+        assert False, 'truncated stream was accepted'
+
+
+def main():
+    test_stream_sections()
+    test_stream_pipe()
+    test_stream_truncated()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import sys
+sys.path.append('../')
+from TBInit import ModuleValidation
+from wasmbuilder import ModuleBuilder, code, i32, i64, f32, f64, empty
+
+
+def validate_body(params, results, body, locals=()):
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    builder.addGlobal(i32, True, code(('i32.const', 0)))
+    builder.addFunction(params, results, code(*body), locals=locals)
+    module = builder.parse()
+    return module.code_section.func_bodies[0]
+
+
+Valid_Bodies = [
+    ([i32, i32], [i32], [('get_local', 0), ('get_local', 1), 'i32.add']),
+    ([], [i64], [('i64.const', 1), ('i64.const', 2), 'i64.mul']),
+    ([f32], [f64], [('get_local', 0), 'f64.promote/f32']),
+    ([], [i32], [('block', i32), ('i32.const', 1), ('br', 0), 'end']),
+    ([], [i32], [('i32.const', 1), ('if', i32), ('i32.const', 2), 'else',
+                 ('i32.const', 3), 'end']),
+    ([], [], [('loop', empty), ('i32.const', 0), ('br_if', 0), 'end']),
+    ([], [i32], ['unreachable', 'i32.add']),
+    ([], [i32], [('i32.const', 0), ('i32.load', 2, 0)]),
+    ([], [], [('i32.const', 0), ('i64.const', 5), ('i64.store', 3, 8)]),
+    ([], [i32], [('i32.const', 1), ('i32.const', 2), ('i32.const', 0), 'select']),
+    ([], [], [('get_global', 0), ('set_global', 0)]),
+    ([], [i32], [('block', i32), ('i32.const', 7), ('i32.const', 0),
+                 ('br_table', [0, 0], 0), 'end']),
+    ([], [i32], [('i32.const', 1), 'return']),
+    ([], [i32], [('i32.const', 1), ('grow_memory', 0), 'drop', ('current_memory', 0)]),
+]
+
+Invalid_Bodies = [
+    ([], [i32], [('i64.const', 1)]),
+    ([], [i32], ['i32.add']),
+    ([], [], [('i32.const', 1)]),
+    ([], [i32], [('block', i32), 'end']),
+    ([], [], [('br', 1), ('br', 2)]),
+    ([], [], [('i32.const', 0), ('if', i32), ('i32.const', 1), 'end', 'drop']),
+    ([], [], [('get_local', 0), 'drop']),
+    ([], [], [('i32.const', 0), ('i32.load', 3, 0), 'drop']),
+    ([], [], [('f32.const', 1.0), ('set_global', 0)]),
+    ([], [], ['else']),
+    ([], [], [('call', 5)]),
+    ([], [], [('i32.const', 0), ('block', empty), 'drop', 'end']),
+]
+
+
+def test_valid_bodies():
+    for params, results, body in Valid_Bodies:
+        func_body = validate_body(params, results, body)
+        assert func_body.validation_error is None, (body, func_body.validation_error)
+
+
+def test_invalid_bodies():
+    for params, results, body in Invalid_Bodies:
+        func_body = validate_body(params, results, body)
+        assert func_body.validation_error is not None, body
+
+
+def test_function_facts():
+    func_body = validate_body([i32], [i32], [
+        ('block', i32),                                 # 0
+        ('loop', empty),                                # 1
+        ('get_local', 0), ('i32.const', 1), 'i32.sub',  # 2 3 4
+        ('tee_local', 0), ('br_if', 0),                 # 5 6
+        'end',                                          # 7
+        ('get_local', 0), ('i32.const', 0), ('br_table', [0, 1], 1),  # 8 9 10
+        'end'])                                         # 11
+    assert func_body.validation_error is None
+    assert func_body.max_stack == 2
+    assert func_body.max_depth == 3
+    assert func_body.blocks == {0: [0x02, 1, 0, None, 11], 1: [0x03, 0, 0, None, 7]}
+    assert func_body.branches == {6: (1,), 10: (0, -1, -1)}
+
+
+def test_module_validation():
+    builder = ModuleBuilder()
+    builder.addMemory(1)
+    index = builder.addFunction([], [], code(('i32.const', 0), 'drop'), export='main')
+    builder.addExport('main', 0, index)
+    builder.addData(0, b'x')
+    builder.setStart(index)
+    module = builder.parse(True)
+    validation = ModuleValidation(module)
+    assert not validation.ValidateAll()
+    assert validation.errors == ["export: duplicate export name b'main'"]
+    assert not module.validated
+
+    builder = ModuleBuilder()
+    builder.addFunction([], [], code(('i32.const', 0), ('i32.load', 2, 0), 'drop'))
+    builder.addData(0, b'x')
+    builder.addMemory(1, 0)
+    module = builder.parse(True)
+    validation = ModuleValidation(module)
+    assert not validation.ValidateAll()
+    assert len(validation.errors) == 1
+    assert validation.errors[0].startswith('memory: maximum size 0')
+
+    module = ModuleBuilder().parse()
+    assert ModuleValidation(module).ValidateAll()
+    assert module.validated
+
+    # lazy bodies are left alone and validated once they are decoded
+    builder = ModuleBuilder()
+    builder.addFunction([], [], code(('i32.const', 0), 'drop'))
+    builder.addFunction([], [i32], code(('i64.const', 0)))
+    module = builder.parse(True)
+    validation = ModuleValidation(module)
+    assert validation.ValidateAll()
+    assert validation.deferred == [0, 1]
+    assert all(func_body.decoder is not None for func_body in module.code_section.func_bodies)
+    module.code_section.func_bodies[1].code
+    assert not validation.ValidateAll()
+    assert validation.deferred == [0]
+    assert validation.errors[0].startswith('code: function body 1: ')
+
+
+def main():
+    test_valid_bodies()
+    test_invalid_bodies()
+    test_function_facts()
+    test_module_validation()
+
+
+if __name__ == '__main__':
+    main()
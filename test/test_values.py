@@ -0,0 +1,274 @@
+import sys
+import math
+import struct as stc
+import warnings
+import numpy as np
+sys.path.append('../')
+from values import Trap, Operand_Stack
+from merklize import HashStack
+from wasmbuilder import ModuleBuilder, Ins_Table
+
+# the value model corpus. runs the numeric handlers on edge case operands and
+# checks the results bit for bit against numpy, i.e. against the numpy scalar
+# semantics the handlers used to have.
+
+I32_Corpus = [0, 1, 2, 7, 31, 32, 33, 0x7f, 0x80, 0xffff, 12345678, 0x7fffffff, 0x80000000,
+              0x80000001, 0xdeadbeef, 0xfffffffe, 0xffffffff]
+I64_Corpus = [0, 1, 2, 63, 64, 65, 0xffffffff, 0x100000000, 0x123456789abcdef,
+              0x7fffffffffffffff, 0x8000000000000000, 0x8000000000000001,
+              0xfedcba9876543210, 0xfffffffffffffffe, 0xffffffffffffffff]
+Float_Corpus = [0.0, -0.0, 1.0, -1.0, 0.5, -0.5, 1.5, 2.5, -2.5, 3.75, 1.0 / 3, -7.125,
+                123456.789, 2.0 ** 24 + 1, 2.0 ** 31, -2.0 ** 31, 2.0 ** 63, 3.4e38, -3.4e38,
+                1e-45, 1e-300, 1.7e308, math.inf, -math.inf, math.nan]
+
+Np_Types = {'i32': (np.uint32, np.int32), 'i64': (np.uint64, np.int64),
+            'f32': (np.float32, np.float32), 'f64': (np.float64, np.float64)}
+
+
+def get_execute():
+    builder = ModuleBuilder()
+    builder.addFunction([], [], b'')
+    return builder.buildVM().executewasm
+
+
+Value_Types = {'i32': 0x7f, 'i64': 0x7e, 'f32': 0x7d, 'f64': 0x7c}
+Compares = ('eqz', 'eq', 'ne', 'lt', 'gt', 'le', 'ge')
+
+
+# the operand type is the one after the slash for conversions, the result type
+# is i32 for the comparisons
+def run(execute, name, *operands):
+    opcodeint = Ins_Table[name][0]
+    result_type, op = name.split('.')
+    operand_type = op.split('/')[1] if '/' in op else result_type
+    if op.split('_')[0] in Compares:
+        result_type = 'i32'
+    stack = execute.stack
+    stack.sp = 0
+    for val in operands:
+        stack.push(Value_Types[operand_type], val)
+    execute.sp = stack.sp
+    execute.handlers[opcodeint](opcodeint, 0)
+    stack.sp = execute.sp
+    assert len(stack) == 1
+    assert stack.tags[0] == Value_Types[result_type]
+    return stack.pop()
+
+
+def float_corpus(kind):
+    if kind == 'f32':
+        return sorted(set([float(np.float32(val)) for val in Float_Corpus
+                           if not abs(val) > 3.5e38]), key=repr)
+    return Float_Corpus
+
+
+def bits(val, kind):
+    if kind == 'f32':
+        return stc.pack('<f', val)
+    return stc.pack('<d', val)
+
+
+def same(result, expect, kind):
+    if kind in ('f32', 'f64'):
+        if math.isnan(expect):
+            return math.isnan(result)
+        return isinstance(result, float) and bits(result, kind) == bits(float(expect), kind)
+    return type(result) is int and result == int(expect)
+
+
+def check(execute, name, kind, operands, expect):
+    result = run(execute, name, *operands)
+    assert same(result, expect, kind), \
+        name + ' ' + repr(operands) + ': ' + repr(result) + ' != ' + repr(expect)
+
+
+def test_int_ops():
+    execute = get_execute()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for kind, corpus in (('i32', I32_Corpus), ('i64', I64_Corpus)):
+            unsigned, signed = Np_Types[kind]
+            width = 32 if kind == 'i32' else 64
+            for a in corpus:
+                ua = unsigned(a)
+                check(execute, kind + '.eqz', 'i32', [a], ua == 0)
+                check(execute, kind + '.clz', kind, [a], width - int(ua).bit_length())
+                check(execute, kind + '.popcnt', kind, [a], np.bitwise_count(ua))
+                ctz = width if a == 0 else int(np.bitwise_count((ua & -ua) - unsigned(1)))
+                check(execute, kind + '.ctz', kind, [a], ctz)
+                for b in corpus:
+                    ub = unsigned(b)
+                    sa, sb = ua.astype(signed), ub.astype(signed)
+                    count = ub & unsigned(width - 1)
+                    expects = {'add': ua + ub, 'sub': ua - ub, 'mul': ua * ub,
+                               'and': ua & ub, 'or': ua | ub, 'xor': ua ^ ub,
+                               'shl': ua << count, 'shr_u': ua >> count,
+                               'shr_s': (sa >> count.astype(signed)).astype(unsigned),
+                               'rotl': (ua << count) | (ua >> ((unsigned(width) - count) &
+                                                              unsigned(width - 1))),
+                               'rotr': (ua >> count) | (ua << ((unsigned(width) - count) &
+                                                              unsigned(width - 1)))}
+                    for op, expect in expects.items():
+                        check(execute, kind + '.' + op, kind, [a, b], expect)
+                    compares = {'eq': ua == ub, 'ne': ua != ub, 'lt_s': sa < sb, 'lt_u': ua < ub,
+                                'gt_s': sa > sb, 'gt_u': ua > ub, 'le_s': sa <= sb,
+                                'le_u': ua <= ub, 'ge_s': sa >= sb, 'ge_u': ua >= ub}
+                    for op, expect in compares.items():
+                        check(execute, kind + '.' + op, 'i32', [a, b], expect)
+                    if b == 0:
+                        continue
+                    check(execute, kind + '.div_u', kind, [a, b], ua // ub)
+                    check(execute, kind + '.rem_u', kind, [a, b], ua % ub)
+                    check(execute, kind + '.rem_s', kind, [a, b], np.fmod(sa, sb).astype(unsigned))
+                    if sa == np.iinfo(signed).min and sb == -1:
+                        continue
+                    quotient = (sa - np.fmod(sa, sb)) // sb
+                    check(execute, kind + '.div_s', kind, [a, b], quotient.astype(unsigned))
+
+
+def test_float_ops():
+    execute = get_execute()
+    with np.errstate(all='ignore'):
+        for kind in ('f32', 'f64'):
+            ftype = Np_Types[kind][0]
+            corpus = float_corpus(kind)
+            for a in corpus:
+                fa = ftype(a)
+                expects = {'abs': np.abs(fa), 'neg': np.negative(fa), 'ceil': np.ceil(fa),
+                           'floor': np.floor(fa), 'trunc': np.trunc(fa), 'nearest': np.rint(fa),
+                           'sqrt': np.sqrt(fa)}
+                for op, expect in expects.items():
+                    check(execute, kind + '.' + op, kind, [a], expect)
+                for b in corpus:
+                    fb = ftype(b)
+                    expects = {'add': fa + fb, 'sub': fa - fb, 'mul': fa * fb, 'div': fa / fb,
+                               'copysign': np.copysign(fa, fb)}
+                    # the sign of a zero min or max is pinned down further below
+                    if not (fa == 0 and fb == 0):
+                        expects['min'] = np.minimum(fa, fb)
+                        expects['max'] = np.maximum(fa, fb)
+                    for op, expect in expects.items():
+                        check(execute, kind + '.' + op, kind, [a, b], expect)
+                    compares = {'eq': fa == fb, 'ne': fa != fb, 'lt': fa < fb, 'gt': fa > fb,
+                                'le': fa <= fb, 'ge': fa >= fb}
+                    for op, expect in compares.items():
+                        check(execute, kind + '.' + op, 'i32', [a, b], expect)
+            assert math.copysign(1, run(execute, kind + '.min', 0.0, -0.0)) < 0
+            assert math.copysign(1, run(execute, kind + '.min', -0.0, 0.0)) < 0
+            assert math.copysign(1, run(execute, kind + '.max', 0.0, -0.0)) > 0
+            assert math.copysign(1, run(execute, kind + '.max', -0.0, 0.0)) > 0
+
+
+def test_conversions():
+    execute = get_execute()
+    with np.errstate(all='ignore'):
+        for a in I64_Corpus:
+            ua = np.uint64(a)
+            check(execute, 'i32.wrap/i64', 'i32', [a], ua.astype(np.uint32))
+            check(execute, 'f32.convert_s/i64', 'f32', [a], ua.astype(np.int64).astype(np.float32))
+            check(execute, 'f32.convert_u/i64', 'f32', [a], ua.astype(np.float32))
+            check(execute, 'f64.convert_s/i64', 'f64', [a], ua.astype(np.int64).astype(np.float64))
+            check(execute, 'f64.convert_u/i64', 'f64', [a], ua.astype(np.float64))
+            check(execute, 'f64.reinterpret/i64', 'f64', [a], ua.view(np.float64))
+        for a in I32_Corpus:
+            ua = np.uint32(a)
+            check(execute, 'i64.extend_s/i32', 'i64', [a], ua.astype(np.int32).astype(np.uint64))
+            check(execute, 'i64.extend_u/i32', 'i64', [a], ua.astype(np.uint64))
+            check(execute, 'f32.convert_s/i32', 'f32', [a], ua.astype(np.int32).astype(np.float32))
+            check(execute, 'f32.convert_u/i32', 'f32', [a], ua.astype(np.float32))
+            check(execute, 'f64.convert_s/i32', 'f64', [a], ua.astype(np.int32).astype(np.float64))
+            check(execute, 'f64.convert_u/i32', 'f64', [a], ua.astype(np.float64))
+            check(execute, 'f32.reinterpret/i32', 'f32', [a], ua.view(np.float32))
+        for a in Float_Corpus:
+            fa = np.float64(a)
+            check(execute, 'f32.demote/f64', 'f32', [a], fa.astype(np.float32))
+            if not math.isnan(a):
+                check(execute, 'i64.reinterpret/f64', 'i64', [a], fa.view(np.uint64))
+        for a in float_corpus('f32'):
+            fa = np.float32(a)
+            check(execute, 'f64.promote/f32', 'f64', [a], fa.astype(np.float64))
+            if not math.isnan(a):
+                check(execute, 'i32.reinterpret/f32', 'i32', [a], fa.view(np.uint32))
+        # truncation of the floats that fit, the others trap
+        for kind in ('f32', 'f64'):
+            for a in float_corpus(kind):
+                for name, signed, low, high in (('i32.trunc_s/', np.int32, -2 ** 31, 2 ** 31),
+                                                ('i32.trunc_u/', np.uint32, 0, 2 ** 32),
+                                                ('i64.trunc_s/', np.int64, -2 ** 63, 2 ** 63),
+                                                ('i64.trunc_u/', np.uint64, 0, 2 ** 64)):
+                    unsigned = Np_Types[name[0:3]][0]
+                    if not math.isnan(a) and low <= math.trunc(a) < high if \
+                            not math.isinf(a) else False:
+                        expect = Np_Types[kind][0](a).astype(signed).astype(unsigned)
+                        check(execute, name + kind, name[0:3], [a], expect)
+                    else:
+                        try:
+                            run(execute, name + kind, a)
+                        except Trap:
+                            pass
+                        else:
+                            assert False, name + kind + ' ' + repr(a) + ' did not trap'
+
+
+def test_traps():
+    execute = get_execute()
+    for kind, int_min in (('i32', 0x80000000), ('i64', 0x8000000000000000)):
+        for op in ('div_s', 'div_u', 'rem_s', 'rem_u'):
+            try:
+                run(execute, kind + '.' + op, 5, 0)
+            except Trap:
+                pass
+            else:
+                assert False, kind + '.' + op + ' by zero did not trap'
+        try:
+            run(execute, kind + '.div_s', int_min, int_min * 2 - 1)
+        except Trap:
+            pass
+        else:
+            assert False, kind + '.div_s overflow did not trap'
+        assert run(execute, kind + '.rem_s', int_min, int_min * 2 - 1) == 0
+
+
+def test_operand_stack():
+    stack = Operand_Stack(4)
+    stack.push(0x7f, 0xffffffff)
+    stack.push(0x7c, -2.5)
+    stack.push(0x7d, 0.5)
+    assert len(stack) == 3
+    assert list(stack) == [0xffffffff, -2.5, 0.5]
+    assert stack.peek(1) == -2.5
+    assert stack.pop() == 0.5
+    assert list(stack.tags[:2]) == [0x7f, 0x7c]
+    # the same payloads with other types or popped values left above the
+    # stack pointer hash differently or not at all
+    other = Operand_Stack(4)
+    other.push(0x7f, 0xffffffff)
+    other.push(0x7c, -2.5)
+    assert HashStack(stack) == HashStack(other)
+    other.tags[1] = 0x7e
+    assert HashStack(stack) != HashStack(other)
+    stack.push(0x7e, 1)
+    stack.push(0x7e, 2)
+    try:
+        stack.push(0x7e, 3)
+        assert False
+    except Trap:
+        pass
+    stack.sp = 0
+    try:
+        stack.pop()
+        assert False
+    except IndexError:
+        pass
+
+
+def main():
+    test_int_ops()
+    test_float_ops()
+    test_conversions()
+    test_traps()
+    test_operand_stack()
+
+
+if __name__ == '__main__':
+    main()
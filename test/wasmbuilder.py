@@ -0,0 +1,212 @@
+import sys
+import io
+import struct as stc
+sys.path.append('../')
+from utils import LEB128UnsignedEncode, LEB128SignedEncode
+from OpCodes import WASM_OP_Code
+from argparser import StreamParser
+from TBInit import VM
+
+# a small wasm object emitter for the tests and the benchmarks. it only knows
+# enough of the binary format to build MVP modules out of instruction lists.
+
+i32 = 0x7f
+i64 = 0x7e
+f32 = 0x7d
+f64 = 0x7c
+anyfunc = 0x70
+empty = 0x40
+
+# mnemonic -> (opcode byte, immediate kinds). the type encodings at the head of
+# all_ops are skipped since they are not instructions.
+Ins_Table = dict()
+for op_code in WASM_OP_Code.all_ops[7:]:
+    if op_code[2]:
+        Ins_Table[op_code[0]] = (int(op_code[1], 16), op_code[3])
+    else:
+        Ins_Table[op_code[0]] = (int(op_code[1], 16), None)
+Ins_Table['i64.rotr'] = Ins_Table['i63.rotr']
+
+
+def uleb(val):
+    return bytes(LEB128UnsignedEncode(val))
+
+
+def sleb(val):
+    return bytes(LEB128SignedEncode(val))
+
+
+def name(string):
+    raw = string.encode('utf-8')
+    return uleb(len(raw)) + raw
+
+
+def vec(items):
+    return uleb(len(items)) + b''.join(items)
+
+
+def encode_immediate(kind, val):
+    if kind == 'uint32':
+        return stc.pack('<f', val)
+    elif kind == 'uint64':
+        return stc.pack('<d', val)
+    elif kind.startswith('varint'):
+        return sleb(val)
+    else:
+        return uleb(val)
+
+
+# encodes a list of instructions. every instruction is either a mnemonic or a
+# tuple of a mnemonic and its immediates. br_table takes a list of targets and
+# the default target. memory ops take (align, offset).
+def code(*instructions):
+    out = bytearray()
+    for ins in instructions:
+        if isinstance(ins, str):
+            ins = (ins,)
+        opcode, kinds = Ins_Table[ins[0]]
+        out.append(opcode)
+        if ins[0] == 'br_table':
+            out += uleb(len(ins[1]))
+            for target in ins[1]:
+                out += uleb(target)
+            out += uleb(ins[2])
+        elif isinstance(kinds, tuple):
+            for kind, val in zip(kinds, ins[1:]):
+                out += encode_immediate(kind, val)
+        elif kinds is not None:
+            out += encode_immediate(kinds, ins[1])
+    return bytes(out)
+
+
+# parses a wasm object out of its bytes with the StreamParser, no file in
+# between. returns the parser, its module and parsedstruct are filled in.
+def parse_stream(raw, lazy=False):
+    parser = StreamParser(io.BytesIO(raw), lazy)
+    parser.parse()
+    return parser
+
+
+# the func_body of a module with just the one function
+def build_body(params, results, body, lazy=False):
+    builder = ModuleBuilder()
+    builder.addFunction(params, results, code(*body))
+    return builder.parse(lazy).code_section.func_bodies[0]
+
+
+def limits(initial, maximum):
+    if maximum is None:
+        return b'\x00' + uleb(initial)
+    return b'\x01' + uleb(initial) + uleb(maximum)
+
+
+class ModuleBuilder():
+    def __init__(self):
+        self.types = []
+        self.imports = []
+        self.functions = []
+        self.tables = []
+        self.memories = []
+        self.globals = []
+        self.exports = []
+        self.start = None
+        self.elements = []
+        self.datas = []
+        self.imported_funcs = 0
+
+    def addType(self, params, results):
+        sig = (tuple(params), tuple(results))
+        if sig not in self.types:
+            self.types.append(sig)
+        return self.types.index(sig)
+
+    def addImportFunction(self, module, field, params, results):
+        type_index = self.addType(params, results)
+        self.imports.append(name(module) + name(field) + b'\x00' + uleb(type_index))
+        self.imported_funcs += 1
+        return self.imported_funcs - 1
+
+    # body is the encoded instruction stream without the trailing end.
+    # locals is a list of value types. returns the function index.
+    def addFunction(self, params, results, body, locals=(), export=None):
+        type_index = self.addType(params, results)
+        self.functions.append((type_index, list(locals), body))
+        index = self.imported_funcs + len(self.functions) - 1
+        if export is not None:
+            self.addExport(export, 0, index)
+        return index
+
+    def addTable(self, initial, maximum=None):
+        self.tables.append(bytes([anyfunc]) + limits(initial, maximum))
+
+    def addMemory(self, initial, maximum=None):
+        self.memories.append(limits(initial, maximum))
+
+    def addGlobal(self, content_type, mutable, init):
+        self.globals.append(bytes([content_type, 1 if mutable else 0]) + init + b'\x0b')
+        return len(self.globals) - 1
+
+    def addExport(self, field, kind, index):
+        self.exports.append(name(field) + bytes([kind]) + uleb(index))
+
+    def setStart(self, index):
+        self.start = index
+
+    def addElem(self, offset, indices):
+        self.elements.append(b'\x00' + code(('i32.const', offset)) + b'\x0b' +
+                             vec([uleb(i) for i in indices]))
+
+    def addData(self, offset, data):
+        self.datas.append(b'\x00' + code(('i32.const', offset)) + b'\x0b' +
+                          uleb(len(data)) + bytes(data))
+
+    def section(self, section_id, payload):
+        return bytes([section_id]) + uleb(len(payload)) + payload
+
+    def build(self):
+        out = bytearray(b'\x00asm\x01\x00\x00\x00')
+        if self.types:
+            out += self.section(1, vec([b'\x60' + vec([bytes([p]) for p in params]) +
+                                        vec([bytes([r]) for r in results])
+                                        for params, results in self.types]))
+        if self.imports:
+            out += self.section(2, vec(self.imports))
+        if self.functions:
+            out += self.section(3, vec([uleb(f[0]) for f in self.functions]))
+        if self.tables:
+            out += self.section(4, vec(self.tables))
+        if self.memories:
+            out += self.section(5, vec(self.memories))
+        if self.globals:
+            out += self.section(6, vec(self.globals))
+        if self.exports:
+            out += self.section(7, vec(self.exports))
+        if self.start is not None:
+            out += self.section(8, uleb(self.start))
+        if self.elements:
+            out += self.section(9, vec(self.elements))
+        if self.functions:
+            bodies = []
+            for type_index, local_types, body in self.functions:
+                entries = []
+                for local_type in local_types:
+                    if entries and entries[-1][1] == local_type:
+                        entries[-1][0] += 1
+                    else:
+                        entries.append([1, local_type])
+                raw = vec([uleb(c) + bytes([t]) for c, t in entries]) + body + b'\x0b'
+                bodies.append(uleb(len(raw)) + raw)
+            out += self.section(10, vec(bodies))
+        if self.datas:
+            out += self.section(11, vec(self.datas))
+        return bytes(out)
+
+    def parse(self, lazy=False):
+        return parse_stream(self.build(), lazy).module
+
+    def buildVM(self, schedule=None):
+        return VM([self.parse()], None, schedule)
+
+    def write(self, path):
+        with open(path, 'wb') as obj_file:
+            obj_file.write(self.build())
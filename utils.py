@@ -5,7 +5,7 @@ import struct as stc
 
 class ParseFlags:
     def __init__(self, wast_path, wasm_path, as_path, disa_path, out_path, dbg, unval, memdump
-                 , idxspc, run, metric, gas):
+                 , idxspc, run, metric, gas, mmap=False, lazy=False):
         self.wast_path = wast_path
         self.wasm_path = wasm_path
         self.as_path = as_path
@@ -18,6 +18,8 @@ class ParseFlags:
         self.run = run
         self.metric = metric
         self.gas = gas
+        self.mmap = mmap
+        self.lazy = lazy
 
 
 # pretty print
@@ -92,90 +94,189 @@ def LEB128SignedEncode(int_val):
     return(byte_array)
 
 
+# reads the values the binary format is made of off of a buffer. the offset
+# moves past every value that is read. the LEB128 readers decode in one pass
+# and raise if a value is longer than the spec allows for its type or doesn't
+# fit its bits, i.e. the unused bits of the last byte are set or aren't a
+# sign extension.
+class ByteCursor():
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def u8(self):
+        byte = self.buffer[self.offset]
+        self.offset += 1
+        return byte
+
+    def u32(self):
+        offset = self.offset
+        self.offset = offset + 4
+        return int.from_bytes(self.buffer[offset:offset + 4], byteorder='little', signed=False)
+
+    def u64(self):
+        offset = self.offset
+        self.offset = offset + 8
+        return int.from_bytes(self.buffer[offset:offset + 8], byteorder='little', signed=False)
+
+    def f32(self):
+        value = F32_Struct.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def f64(self):
+        value = F64_Struct.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 8
+        return value
+
+    def varuint1(self):
+        return self.varuint(1, 1)
+
+    def varuint7(self):
+        return self.varuint(1, 7)
+
+    def varint7(self):
+        return self.varint(1, 7)
+
+    def varuint32(self):
+        byte = self.buffer[self.offset]
+        if byte < 0x80:
+            self.offset += 1
+            return byte
+        return self.varuint(5, 32)
+
+    def varint32(self):
+        byte = self.buffer[self.offset]
+        if byte < 0x40:
+            self.offset += 1
+            return byte
+        return self.varint(5, 32)
+
+    def varint64(self):
+        byte = self.buffer[self.offset]
+        if byte < 0x40:
+            self.offset += 1
+            return byte
+        return self.varint(10, 64)
+
+    # reads an unsigned LEB128 value of bits bits that is at most max_bytes
+    # long
+    def varuint(self, max_bytes, bits):
+        buffer = self.buffer
+        offset = self.offset
+        end = offset + max_bytes
+        result = 0
+        shift = 0
+        while True:
+            if offset == end:
+                raise Exception(Colors.red + "LEB128 value at offset " + repr(self.offset) +
+                                " is longer than " + repr(max_bytes) + " bytes." + Colors.ENDC)
+            byte = buffer[offset]
+            offset += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        if result >> bits:
+            self.outOfRange(bits)
+        self.offset = offset
+        return result
+
+    # reads a signed LEB128 value of bits bits that is at most max_bytes long
+    def varint(self, max_bytes, bits):
+        buffer = self.buffer
+        offset = self.offset
+        end = offset + max_bytes
+        result = 0
+        shift = 0
+        while True:
+            if offset == end:
+                raise Exception(Colors.red + "LEB128 value at offset " + repr(self.offset) +
+                                " is longer than " + repr(max_bytes) + " bytes." + Colors.ENDC)
+            byte = buffer[offset]
+            offset += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        if byte & 0x40:
+            result -= 1 << shift
+        if result >> (bits - 1) not in (0, -1):
+            self.outOfRange(bits)
+        self.offset = offset
+        return result
+
+    def outOfRange(self, bits):
+        raise Exception(Colors.red + "LEB128 value at offset " + repr(self.offset) +
+                        " doesn't fit in " + repr(bits) + " bits." + Colors.ENDC)
+
+    # returns the next n bytes as a slice of the buffer. for memoryviews that
+    # is a view, nothing gets copied.
+    def bytes(self, n):
+        offset = self.offset
+        self.offset = offset + n
+        return self.buffer[offset:offset + n]
+
+    # reads a length-prefixed name
+    def name(self):
+        return self.bytes(self.varuint32())
+
+
+F32_Struct = stc.Struct('<f')
+F64_Struct = stc.Struct('<d')
+
+
 # @DEVI-FIXME-MVP-only-we currently inly support consts and get_global
 # interprets the init-exprs
 def init_interpret(expr):
-    offset = 0
-    byte, offset, dummy = Read(expr, offset, 'uint8')
+    cursor = ByteCursor(expr)
+    byte = cursor.u8()
     const = int()
 
     if byte == 65:
-        # @DEVI-FIXME-the spec says varint32, obviously we are not doing that
-        # since it will return neg values which are meningless and break things
-        const, offset, dummy = Read(expr, offset, 'varuint32')
+        # the bit pattern, negative values would break things
+        const = cursor.varint32() & 0xffffffff
     elif byte == 66:
-        const, offset, dummy = Read(expr, offset, 'varint64')
+        const = cursor.varint64()
     elif byte == 67:
-        const, offset, dummy = Read(expr, offset, 'uint32')
+        const = cursor.u32()
     elif byte == 68:
-        const, offset, dummy = Read(expr, offset, 'uint64')
+        const = cursor.u64()
     elif byte == 35:
         pass
     else:
         raise Exception(Colors.red + "illegal opcode for an MVP init expr." + Colors.ENDC)
 
-    block_end, offset, dummy = Read(expr, offset, 'uint8')
+    block_end = cursor.u8()
     if block_end != 11:
         raise Exception(Colors.red + "init expr has no block end." + Colors.ENDC)
 
     return(const)
 
 
-# reads different-typed values from a byte array, takes in the bytearray, the
-# current offset the read should be performed from and the kind of value that
-# should be read. returns the read value as a decimal number, the updated
-# offset and the number of bytes read
-def Read(section_byte, offset, kind):
-    operand = []
-    return_list = int()
-    read_bytes = 0
-
-    if kind == 'varuint1' or kind == 'varuint7' or kind == 'varuint32' or kind == 'varuint64':
-        while True:
-            byte = int(section_byte[offset])
-            read_bytes += 1
-            offset += 1
-
-            operand.append(byte)
-
-            if byte == 0x80:
-                pass
-            elif byte & 0x80 != 0:
-                pass
-            else:
-                # we have read the last byte of the operand
-                break
+# evaluates an MVP init expr to the value the interpreter works with. globals
+# is the global index space get_global reads from.
+def InitExprValue(expr, globals):
+    cursor = ByteCursor(expr)
+    byte = cursor.u8()
 
-        return_list = LEB128UnsignedDecode(operand)
-        operand = []
-    elif kind == 'uint8' or kind == 'uint16' or kind == 'uint32' or kind == 'uint64':
-        byte = section_byte[offset: offset + TypeDic[kind]]
-        read_bytes += TypeDic[kind]
-        offset += TypeDic[kind]
-        operand.append(byte)
-        return_list = int.from_bytes(operand[0], byteorder='little', signed=False)
-        operand = []
-    elif kind == 'varint1' or kind == 'varint7' or kind == 'varint32' or kind == 'varint64':
-        while True:
-            byte = int(section_byte[offset])
-            read_bytes += 1
-            offset += 1
-
-            operand.append(byte)
-
-            # @DEVI-what happens when we decode a 56-bit value?
-            if byte == 0x80 or byte == 0xff:
-                pass
-            elif byte & 0x80 != 0:
-                pass
-            else:
-                # we have read the lasy byte of the operand
-                break
+    if byte == 65:
+        value = cursor.varint32()
+    elif byte == 66:
+        value = cursor.varint64()
+    elif byte == 67:
+        value = cursor.f32()
+    elif byte == 68:
+        value = cursor.f64()
+    elif byte == 35:
+        value = globals[cursor.varuint32()]
+    else:
+        raise Exception(Colors.red + "illegal opcode for an MVP init expr." + Colors.ENDC)
 
-            return_list = LEB128SignedDecode(operand)
-            operand = []
+    if cursor.u8() != 11:
+        raise Exception(Colors.red + "init expr has no block end." + Colors.ENDC)
 
-    return return_list, offset, read_bytes
+    return(value)
 
 
 def ror(val, type_length, rot_size):
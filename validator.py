@@ -0,0 +1,497 @@
+from OpCodes import Op_Names
+from utils import ByteCursor
+
+# the code validator. it runs alongside the disassembler, one instruction at a
+# time, and checks a function body against the MVP typing rules with an
+# operand type stack and a control stack. while at it, it records the facts
+# about the body the interpreter needs: the maximum operand stack height, the
+# blocks with their arities and where they end, and the block every branch
+# targets.
+
+# value types as they are encoded in the binary format
+I32 = 0x7f
+I64 = 0x7e
+F32 = 0x7d
+F64 = 0x7c
+Value_Types = (I32, I64, F32, F64)
+Type_Names = {I32: 'i32', I64: 'i64', F32: 'f32', F64: 'f64', None: 'any'}
+Empty_Block_Type = 0x40
+# the table element type and the function type form as the readers return
+# them(varint7)
+Anyfunc = -0x10
+Func_Form = -0x20
+Max_Pages = 65536
+# an implementation limit on the number of locals a function can have. the
+# spec allows 2^32 but we keep the local types in a list.
+Max_Locals = 50000
+# the block the function body itself forms. branches to it return.
+Function_Block = -1
+
+
+class ValidationError(Exception):
+    pass
+
+
+# the parts of the module a function body is validated against
+class Validation_Context():
+    def __init__(self, type_section, import_section, function_section, table_section,
+                 memory_section, global_section):
+        self.types = []
+        if type_section is not None:
+            for func_type in type_section.func_types:
+                self.types.append((tuple(func_type.param_types), tuple(func_type.return_type)))
+
+        # function type indices, global types and the number of imported
+        # functions and globals
+        self.functions = []
+        self.globals = []
+        self.imported_funcs = 0
+        self.imported_globals = 0
+        self.tables = 0
+        self.memories = 0
+        if import_section is not None:
+            for import_entry in import_section.import_entry:
+                if import_entry.kind == 0:
+                    self.functions.append(import_entry.type)
+                    self.imported_funcs += 1
+                elif import_entry.kind == 1:
+                    self.tables += 1
+                elif import_entry.kind == 2:
+                    self.memories += 1
+                elif import_entry.kind == 3:
+                    self.globals.append((import_entry.type.content_type,
+                                         import_entry.type.mutability))
+                    self.imported_globals += 1
+        if function_section is not None:
+            self.functions.extend(function_section.type_section_index)
+        if table_section is not None:
+            self.tables += len(table_section.table_types)
+        if memory_section is not None:
+            self.memories += len(memory_section.memory_types)
+        if global_section is not None:
+            for global_variable in global_section.global_variables:
+                self.globals.append((global_variable.global_type.content_type,
+                                     global_variable.global_type.mutability))
+
+    # returns the (params, results) of a function index
+    def getFunctionType(self, func_index):
+        if func_index >= len(self.functions):
+            raise ValidationError('unknown function ' + repr(func_index))
+        type_index = self.functions[func_index]
+        if type_index >= len(self.types):
+            raise ValidationError('unknown type ' + repr(type_index))
+        return(self.types[type_index])
+
+
+# returns the value type an MVP init-expr produces
+def InitExprType(expr, context):
+    cursor = ByteCursor(expr)
+    opcode = cursor.u8()
+    if opcode == 0x41:
+        value_type = I32
+        cursor.varint32()
+    elif opcode == 0x42:
+        value_type = I64
+        cursor.varint64()
+    elif opcode == 0x43:
+        value_type = F32
+        cursor.u32()
+    elif opcode == 0x44:
+        value_type = F64
+        cursor.u64()
+    elif opcode == 0x23:
+        global_index = cursor.varuint32()
+        # only imported immutable globals can be read in an init-expr
+        if global_index >= context.imported_globals:
+            raise ValidationError('init expr reads global ' + repr(global_index) +
+                                  ' which is not imported')
+        value_type, mutability = context.globals[global_index]
+        if mutability:
+            raise ValidationError('init expr reads mutable global ' + repr(global_index))
+    else:
+        raise ValidationError('init expr is not a constant expression')
+    if cursor.offset != len(expr) - 1 or cursor.u8() != 0x0b:
+        raise ValidationError('init expr has more than one instruction')
+    return(value_type)
+
+
+# (popped types in pop order, pushed types) for the instructions that do
+# nothing but take and produce values
+def BuildSignatureTable():
+    table = [None] * 256
+
+    def fill(first, last, pops, pushes):
+        for opcodeint in range(first, last + 1):
+            table[opcodeint] = (pops, pushes)
+
+    fill(0x41, 0x41, (), (I32,))
+    fill(0x42, 0x42, (), (I64,))
+    fill(0x43, 0x43, (), (F32,))
+    fill(0x44, 0x44, (), (F64,))
+    fill(0x45, 0x45, (I32,), (I32,))
+    fill(0x46, 0x4f, (I32, I32), (I32,))
+    fill(0x50, 0x50, (I64,), (I32,))
+    fill(0x51, 0x5a, (I64, I64), (I32,))
+    fill(0x5b, 0x60, (F32, F32), (I32,))
+    fill(0x61, 0x66, (F64, F64), (I32,))
+    fill(0x67, 0x69, (I32,), (I32,))
+    fill(0x6a, 0x78, (I32, I32), (I32,))
+    fill(0x79, 0x7b, (I64,), (I64,))
+    fill(0x7c, 0x8a, (I64, I64), (I64,))
+    fill(0x8b, 0x91, (F32,), (F32,))
+    fill(0x92, 0x98, (F32, F32), (F32,))
+    fill(0x99, 0x9f, (F64,), (F64,))
+    fill(0xa0, 0xa6, (F64, F64), (F64,))
+    fill(0xa7, 0xa7, (I64,), (I32,))
+    fill(0xa8, 0xa9, (F32,), (I32,))
+    fill(0xaa, 0xab, (F64,), (I32,))
+    fill(0xac, 0xad, (I32,), (I64,))
+    fill(0xae, 0xaf, (F32,), (I64,))
+    fill(0xb0, 0xb1, (F64,), (I64,))
+    fill(0xb2, 0xb3, (I32,), (F32,))
+    fill(0xb4, 0xb5, (I64,), (F32,))
+    fill(0xb6, 0xb6, (F64,), (F32,))
+    fill(0xb7, 0xb8, (I32,), (F64,))
+    fill(0xb9, 0xba, (I64,), (F64,))
+    fill(0xbb, 0xbb, (F32,), (F64,))
+    fill(0xbc, 0xbc, (F32,), (I32,))
+    fill(0xbd, 0xbd, (F64,), (I64,))
+    fill(0xbe, 0xbe, (I32,), (F32,))
+    fill(0xbf, 0xbf, (I64,), (F64,))
+    return(table)
+
+
+Op_Signatures = BuildSignatureTable()
+
+# the value type and natural width in bytes of the loads and the stores
+Load_Types = {0x28: (I32, 4), 0x29: (I64, 8), 0x2a: (F32, 4), 0x2b: (F64, 8),
+              0x2c: (I32, 1), 0x2d: (I32, 1), 0x2e: (I32, 2), 0x2f: (I32, 2),
+              0x30: (I64, 1), 0x31: (I64, 1), 0x32: (I64, 2), 0x33: (I64, 2),
+              0x34: (I64, 4), 0x35: (I64, 4)}
+Store_Types = {0x36: (I32, 4), 0x37: (I64, 8), 0x38: (F32, 4), 0x39: (F64, 8),
+               0x3a: (I32, 1), 0x3b: (I32, 2), 0x3c: (I64, 1), 0x3d: (I64, 2),
+               0x3e: (I64, 4)}
+
+
+# validates one function body. the disassembler calls step for every
+# instruction it decodes and finish once the body is done.
+# a control frame is [opcode, label types, end types, operand stack height,
+# unreachable, start pc].
+class CodeValidator():
+    def __init__(self, context, type_index, locals):
+        self.context = context
+        self.operands = []
+        self.controls = []
+        self.max_stack = 0
+        self.max_depth = 0
+        # block start pc -> [opcode, arity, operand stack height, else pc, end pc]
+        self.blocks = dict()
+        # branch pc -> the start pcs of the blocks it can target
+        self.branches = dict()
+        self.error = None
+        self.done = False
+        self.local_types = []
+        self.params = ()
+        self.results = ()
+        try:
+            if type_index is None or type_index >= len(context.types):
+                raise ValidationError('the body has no function type')
+            params, results = context.types[type_index]
+            self.params = params
+            self.results = results
+            self.local_types.extend(params)
+            for local_entry in locals:
+                if local_entry.type not in Value_Types:
+                    raise ValidationError('bad local type ' + repr(local_entry.type))
+                if len(self.local_types) + local_entry.count > Max_Locals:
+                    raise ValidationError('too many locals')
+                self.local_types.extend([local_entry.type] * local_entry.count)
+            self.pushControl(0, results, results, Function_Block)
+        except ValidationError as e:
+            self.error = str(e)
+
+    def step(self, pc, opcodeint, immediates):
+        if self.error is not None:
+            return
+        try:
+            if self.done:
+                raise ValidationError('instruction after the end of the function')
+            signature = Op_Signatures[opcodeint]
+            if signature is not None:
+                for value_type in signature[0]:
+                    self.popExpect(value_type)
+                for value_type in signature[1]:
+                    self.push(value_type)
+            else:
+                check = Special_Checks.get(opcodeint)
+                if check is None:
+                    raise ValidationError('unknown opcode')
+                check(self, pc, opcodeint, immediates)
+        except ValidationError as e:
+            self.error = 'pc ' + repr(pc) + '(' + Op_Names[opcodeint] + '): ' + str(e)
+
+    # writes the recorded facts into the function body
+    def finish(self, func_body):
+        if self.error is None and not self.done:
+            self.error = 'the function body has no end'
+        func_body.param_count = len(self.params)
+        func_body.results = self.results
+        func_body.local_types = tuple(self.local_types)
+        func_body.max_stack = self.max_stack
+        func_body.max_depth = self.max_depth
+        func_body.blocks = self.blocks
+        func_body.branches = self.branches
+        func_body.validation_error = self.error
+        func_body.validated = True
+
+    def push(self, value_type):
+        self.operands.append(value_type)
+        if len(self.operands) > self.max_stack:
+            self.max_stack = len(self.operands)
+
+    # pops an operand. on an unreachable stack there is always one more
+    # operand of any type to pop.
+    def popAny(self):
+        frame = self.controls[-1]
+        if len(self.operands) == frame[3]:
+            if frame[4]:
+                return None
+            raise ValidationError('operand stack underflow')
+        return(self.operands.pop())
+
+    def popExpect(self, expect):
+        actual = self.popAny()
+        if actual is None:
+            return(expect)
+        if expect is not None and actual != expect:
+            raise ValidationError('expected ' + Type_Names[expect] + ' but got ' +
+                                  Type_Names[actual])
+        return(actual)
+
+    def popTypes(self, value_types):
+        for value_type in reversed(value_types):
+            self.popExpect(value_type)
+
+    def pushControl(self, opcodeint, label_types, end_types, pc):
+        self.controls.append([opcodeint, label_types, end_types, len(self.operands), False, pc])
+        if len(self.controls) > self.max_depth:
+            self.max_depth = len(self.controls)
+
+    def popControl(self):
+        frame = self.controls[-1]
+        self.popTypes(frame[2])
+        if len(self.operands) != frame[3]:
+            raise ValidationError('the block leaves ' + repr(len(self.operands) - frame[3]) +
+                                  ' extra operands on the stack')
+        self.controls.pop()
+        return(frame)
+
+    def setUnreachable(self):
+        frame = self.controls[-1]
+        del self.operands[frame[3]:]
+        frame[4] = True
+
+    def getLabel(self, depth):
+        if depth >= len(self.controls):
+            raise ValidationError('unknown label ' + repr(depth))
+        return(self.controls[-1 - depth])
+
+    def getBlockTypes(self, block_type):
+        if block_type == Empty_Block_Type:
+            return(())
+        if block_type not in Value_Types:
+            raise ValidationError('bad block type ' + repr(block_type))
+        return((block_type,))
+
+    def checkMemory(self):
+        if self.context.memories == 0:
+            raise ValidationError('the module has no memory')
+
+    def checkUnreachable(self, pc, opcodeint, immediates):
+        self.setUnreachable()
+
+    def checkNop(self, pc, opcodeint, immediates):
+        pass
+
+    def checkBlock(self, pc, opcodeint, immediates):
+        end_types = self.getBlockTypes(immediates[0])
+        if opcodeint == 0x04:
+            self.popExpect(I32)
+        # branches to a loop go back to its start and carry no values
+        label_types = () if opcodeint == 0x03 else end_types
+        self.blocks[pc] = [opcodeint, len(end_types), len(self.operands), None, None]
+        self.pushControl(opcodeint, label_types, end_types, pc)
+
+    def checkElse(self, pc, opcodeint, immediates):
+        frame = self.controls[-1]
+        if frame[0] != 0x04:
+            raise ValidationError('else without an if')
+        self.popControl()
+        self.blocks[frame[5]][3] = pc
+        self.pushControl(0x05, frame[1], frame[2], frame[5])
+
+    def checkEnd(self, pc, opcodeint, immediates):
+        frame = self.popControl()
+        # an if without an else has an empty else branch
+        if frame[0] == 0x04 and frame[2]:
+            raise ValidationError('an if without an else can not produce a value')
+        if frame[5] == Function_Block:
+            self.done = True
+        else:
+            self.blocks[frame[5]][4] = pc
+        for value_type in frame[2]:
+            self.push(value_type)
+
+    def checkBr(self, pc, opcodeint, immediates):
+        frame = self.getLabel(immediates[0])
+        self.popTypes(frame[1])
+        self.branches[pc] = (frame[5],)
+        self.setUnreachable()
+
+    def checkBrIf(self, pc, opcodeint, immediates):
+        self.popExpect(I32)
+        frame = self.getLabel(immediates[0])
+        self.popTypes(frame[1])
+        for value_type in frame[1]:
+            self.push(value_type)
+        self.branches[pc] = (frame[5],)
+
+    def checkBrTable(self, pc, opcodeint, immediates):
+        self.popExpect(I32)
+        targets = []
+        default = self.getLabel(immediates[1])
+        for depth in immediates[0]:
+            frame = self.getLabel(depth)
+            if len(frame[1]) != len(default[1]):
+                raise ValidationError('br_table targets have different arities')
+            self.popTypes(frame[1])
+            for value_type in frame[1]:
+                self.push(value_type)
+            targets.append(frame[5])
+        targets.append(default[5])
+        self.popTypes(default[1])
+        self.branches[pc] = tuple(targets)
+        self.setUnreachable()
+
+    def checkReturn(self, pc, opcodeint, immediates):
+        self.popTypes(self.controls[0][1])
+        self.branches[pc] = (Function_Block,)
+        self.setUnreachable()
+
+    def checkCall(self, pc, opcodeint, immediates):
+        params, results = self.context.getFunctionType(immediates[0])
+        self.popTypes(params)
+        for value_type in results:
+            self.push(value_type)
+
+    def checkCallIndirect(self, pc, opcodeint, immediates):
+        if self.context.tables == 0:
+            raise ValidationError('the module has no table')
+        if immediates[1] != 0:
+            raise ValidationError('reserved byte is not zero')
+        if immediates[0] >= len(self.context.types):
+            raise ValidationError('unknown type ' + repr(immediates[0]))
+        params, results = self.context.types[immediates[0]]
+        self.popExpect(I32)
+        self.popTypes(params)
+        for value_type in results:
+            self.push(value_type)
+
+    def checkDrop(self, pc, opcodeint, immediates):
+        self.popAny()
+
+    def checkSelect(self, pc, opcodeint, immediates):
+        self.popExpect(I32)
+        value_type = self.popAny()
+        value_type = self.popExpect(value_type)
+        self.push(value_type)
+
+    def getLocalType(self, local_index):
+        if local_index >= len(self.local_types):
+            raise ValidationError('unknown local ' + repr(local_index))
+        return(self.local_types[local_index])
+
+    def checkGetLocal(self, pc, opcodeint, immediates):
+        self.push(self.getLocalType(immediates[0]))
+
+    def checkSetLocal(self, pc, opcodeint, immediates):
+        self.popExpect(self.getLocalType(immediates[0]))
+
+    def checkTeeLocal(self, pc, opcodeint, immediates):
+        value_type = self.getLocalType(immediates[0])
+        self.popExpect(value_type)
+        self.push(value_type)
+
+    def getGlobal(self, global_index):
+        if global_index >= len(self.context.globals):
+            raise ValidationError('unknown global ' + repr(global_index))
+        return(self.context.globals[global_index])
+
+    def checkGetGlobal(self, pc, opcodeint, immediates):
+        self.push(self.getGlobal(immediates[0])[0])
+
+    def checkSetGlobal(self, pc, opcodeint, immediates):
+        value_type, mutability = self.getGlobal(immediates[0])
+        if not mutability:
+            raise ValidationError('global ' + repr(immediates[0]) + ' is immutable')
+        self.popExpect(value_type)
+
+    def checkAlignment(self, align, width):
+        if (1 << align) > width:
+            raise ValidationError('alignment 2^' + repr(align) +
+                                  ' is larger than the natural alignment')
+
+    def checkLoad(self, pc, opcodeint, immediates):
+        self.checkMemory()
+        value_type, width = Load_Types[opcodeint]
+        self.checkAlignment(immediates[0], width)
+        self.popExpect(I32)
+        self.push(value_type)
+
+    def checkStore(self, pc, opcodeint, immediates):
+        self.checkMemory()
+        value_type, width = Store_Types[opcodeint]
+        self.checkAlignment(immediates[0], width)
+        self.popExpect(value_type)
+        self.popExpect(I32)
+
+    def checkCurrentMemory(self, pc, opcodeint, immediates):
+        self.checkMemory()
+        if immediates[0] != 0:
+            raise ValidationError('reserved byte is not zero')
+        self.push(I32)
+
+    def checkGrowMemory(self, pc, opcodeint, immediates):
+        self.checkMemory()
+        if immediates[0] != 0:
+            raise ValidationError('reserved byte is not zero')
+        self.popExpect(I32)
+        self.push(I32)
+
+
+# the checks for the instructions the signature table can't describe
+Special_Checks = {0x00: CodeValidator.checkUnreachable, 0x01: CodeValidator.checkNop,
+                  0x02: CodeValidator.checkBlock, 0x03: CodeValidator.checkBlock,
+                  0x04: CodeValidator.checkBlock, 0x05: CodeValidator.checkElse,
+                  0x0b: CodeValidator.checkEnd, 0x0c: CodeValidator.checkBr,
+                  0x0d: CodeValidator.checkBrIf, 0x0e: CodeValidator.checkBrTable,
+                  0x0f: CodeValidator.checkReturn, 0x10: CodeValidator.checkCall,
+                  0x11: CodeValidator.checkCallIndirect, 0x1a: CodeValidator.checkDrop,
+                  0x1b: CodeValidator.checkSelect, 0x20: CodeValidator.checkGetLocal,
+                  0x21: CodeValidator.checkSetLocal, 0x22: CodeValidator.checkTeeLocal,
+                  0x23: CodeValidator.checkGetGlobal, 0x24: CodeValidator.checkSetGlobal,
+                  0x3f: CodeValidator.checkCurrentMemory, 0x40: CodeValidator.checkGrowMemory}
+for opcodeint in Load_Types:
+    Special_Checks[opcodeint] = CodeValidator.checkLoad
+for opcodeint in Store_Types:
+    Special_Checks[opcodeint] = CodeValidator.checkStore
+
+
+# validates a body that was disassembled without a validator, e.g. one that
+# came out of a module cache written before validation
+def ValidateBody(context, func_body):
+    validator = CodeValidator(context, func_body.type_index, func_body.locals)
+    code = func_body.code
+    for pc in range(0, len(code)):
+        validator.step(pc, code.opcodes[pc], code.getOperands(pc))
+    validator.finish(func_body)
@@ -0,0 +1,274 @@
+from array import array
+import math
+import struct as stc
+
+# the interpreter's value model. i32 and i64 values are python ints holding
+# their bit pattern as an unsigned number, i.e. masked to 32 or 64 bits, so the
+# signed and unsigned instructions only differ in how they read the bits. f32
+# and f64 values are python floats, f32 ones always rounded to single
+# precision. the handlers in execute.py do the cheap cases inline and call in
+# here for everything that needs more care.
+# NaN payloads are not preserved through f32 arithmetic since the floats go
+# through doubles.
+
+Mask_32 = 0xffffffff
+Mask_64 = 0xffffffffffffffff
+Sign_32 = 0x80000000
+Sign_64 = 0x8000000000000000
+
+I32_Struct = stc.Struct('<I')
+I64_Struct = stc.Struct('<Q')
+F32_Struct = stc.Struct('<f')
+F64_Struct = stc.Struct('<d')
+
+
+# raised when the wasm code traps
+class Trap(Exception):
+    pass
+
+
+def Signed32(val):
+    return(val - 0x100000000 if val & Sign_32 else val)
+
+
+def Signed64(val):
+    return(val - 0x10000000000000000 if val & Sign_64 else val)
+
+
+def RoundF32(val):
+    try:
+        return(F32_Struct.unpack(F32_Struct.pack(val))[0])
+    # only raised when the value rounds to infinity
+    except OverflowError:
+        return(math.copysign(math.inf, val))
+
+
+# converts a python number to a value of the given type(the binary format's
+# value type encoding)
+def ToValue(value_type, val):
+    if value_type == 0x7f:
+        return(int(val) & Mask_32)
+    elif value_type == 0x7e:
+        return(int(val) & Mask_64)
+    elif value_type == 0x7d:
+        return(RoundF32(float(val)))
+    return(float(val))
+
+
+def DivS(val1, val2, bits):
+    sign = 1 << (bits - 1)
+    a = val1 - (sign << 1) if val1 & sign else val1
+    b = val2 - (sign << 1) if val2 & sign else val2
+    if b == 0:
+        raise Trap('integer divide by zero')
+    if a == -sign and b == -1:
+        raise Trap('integer overflow')
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        quotient = -quotient
+    return(quotient & ((sign << 1) - 1))
+
+
+def RemS(val1, val2, bits):
+    sign = 1 << (bits - 1)
+    a = val1 - (sign << 1) if val1 & sign else val1
+    b = val2 - (sign << 1) if val2 & sign else val2
+    if b == 0:
+        raise Trap('integer divide by zero')
+    remainder = abs(a) % abs(b)
+    if a < 0:
+        remainder = -remainder
+    return(remainder & ((sign << 1) - 1))
+
+
+def DivU(val1, val2):
+    if val2 == 0:
+        raise Trap('integer divide by zero')
+    return(val1 // val2)
+
+
+def RemU(val1, val2):
+    if val2 == 0:
+        raise Trap('integer divide by zero')
+    return(val1 % val2)
+
+
+def Clz(val, bits):
+    return(bits - val.bit_length())
+
+
+def Ctz(val, bits):
+    if val == 0:
+        return(bits)
+    return((val & -val).bit_length() - 1)
+
+
+def Popcnt(val):
+    return(bin(val).count('1'))
+
+
+# python raises on a zero divisor where IEEE gives an infinity or a NaN
+def FDiv(val1, val2):
+    if val2 == 0:
+        if val1 == 0 or val1 != val1:
+            return(math.nan)
+        return(math.copysign(math.inf, val1) * math.copysign(1.0, val2))
+    return(val1 / val2)
+
+
+def FSqrt(val):
+    if val < 0:
+        return(math.nan)
+    return(math.sqrt(val))
+
+
+# min and max are NaN if either operand is and order -0 below 0
+def FMin(val1, val2):
+    if val1 != val1 or val2 != val2:
+        return(math.nan)
+    if val1 == val2:
+        return(val1 if math.copysign(1.0, val1) < 0 else val2)
+    return(val1 if val1 < val2 else val2)
+
+
+def FMax(val1, val2):
+    if val1 != val1 or val2 != val2:
+        return(math.nan)
+    if val1 == val2:
+        return(val2 if math.copysign(1.0, val1) < 0 else val1)
+    return(val1 if val1 > val2 else val2)
+
+
+# the rounding instructions keep infinities, NaNs and the sign of a zero
+# result. the math module's versions return ints.
+def FCeil(val):
+    if val != val or val in (math.inf, -math.inf):
+        return(val)
+    return(math.copysign(float(math.ceil(val)), val))
+
+
+def FFloor(val):
+    if val != val or val in (math.inf, -math.inf):
+        return(val)
+    return(math.copysign(float(math.floor(val)), val))
+
+
+def FTrunc(val):
+    if val != val or val in (math.inf, -math.inf):
+        return(val)
+    return(math.copysign(float(math.trunc(val)), val))
+
+
+# round half to even, which is what python's round does
+def FNearest(val):
+    if val != val or val in (math.inf, -math.inf):
+        return(val)
+    return(math.copysign(float(round(val)), val))
+
+
+# truncates a float to an integer in [low, high) and returns its bit pattern
+# in bits
+def Trunc(val, low, high, bits):
+    if val != val:
+        raise Trap('invalid conversion to integer')
+    if val in (math.inf, -math.inf):
+        raise Trap('integer overflow')
+    result = math.trunc(val)
+    if result < low or result >= high:
+        raise Trap('integer overflow')
+    return(result & ((1 << bits) - 1))
+
+
+# an integer to the nearest f32. ints over 53 bits would get rounded twice on
+# the way through a double so the bits that don't fit are folded into a
+# sticky bit first.
+def IntToF32(val):
+    magnitude = abs(val)
+    shift = magnitude.bit_length() - 53
+    if shift > 0:
+        rest = magnitude & ((1 << shift) - 1)
+        magnitude = (magnitude >> shift) | (1 if rest else 0)
+        result = math.ldexp(float(magnitude), shift)
+    else:
+        result = float(magnitude)
+    return(RoundF32(-result if val < 0 else result))
+
+
+def I32ReinterpretF32(val):
+    return(I32_Struct.unpack(F32_Struct.pack(val))[0])
+
+
+def I64ReinterpretF64(val):
+    return(I64_Struct.unpack(F64_Struct.pack(val))[0])
+
+
+def F32ReinterpretI32(val):
+    return(F32_Struct.unpack(I32_Struct.pack(val))[0])
+
+
+def F64ReinterpretI64(val):
+    return(F64_Struct.unpack(I64_Struct.pack(val))[0])
+
+
+# the operand stack. one preallocated array of raw 64-bit payloads and a
+# parallel array of the value types. ints are stored as they are, floats as
+# the bits of their double so the float instructions can work on them through
+# the floats view of the same buffer. the buffer is exported to the view so
+# it can't be resized by accident, grow swaps in bigger arrays instead. sp is
+# the number of values on the stack.
+class Operand_Stack():
+    def __init__(self, size):
+        self.size = size
+        self.values = array('Q', [0]) * size
+        self.tags = array('B', [0]) * size
+        self.floats = memoryview(self.values).cast('B').cast('d')
+        self.sp = 0
+
+    # makes room for size values. the values on the stack are kept, whoever
+    # holds on to the arrays has to pick up the new ones.
+    def grow(self, size):
+        values = array('Q', [0]) * size
+        tags = array('B', [0]) * size
+        values[0:self.size] = self.values
+        tags[0:self.size] = self.tags
+        self.size = size
+        self.values = values
+        self.tags = tags
+        self.floats = memoryview(values).cast('B').cast('d')
+
+    def push(self, value_type, val):
+        if self.sp >= self.size:
+            raise Trap('operand stack exhausted')
+        if value_type == 0x7d or value_type == 0x7c:
+            self.floats[self.sp] = val
+        else:
+            self.values[self.sp] = val
+        self.tags[self.sp] = value_type
+        self.sp += 1
+
+    # the value depth places down from the top
+    def peek(self, depth=0):
+        index = self.sp - 1 - depth
+        if index < 0:
+            raise IndexError('operand stack underflow')
+        if self.tags[index] == 0x7d or self.tags[index] == 0x7c:
+            return(self.floats[index])
+        return(self.values[index])
+
+    def pop(self):
+        val = self.peek()
+        self.sp -= 1
+        return(val)
+
+    def __len__(self):
+        return(self.sp)
+
+    # from the bottom up
+    def __iter__(self):
+        for depth in range(self.sp - 1, -1, -1):
+            yield self.peek(depth)
+
+    # the payloads followed by the types of the values on the stack, for
+    # hashing without serializing every value
+    def getBuffers(self):
+        return(memoryview(self.values)[:self.sp], memoryview(self.tags)[:self.sp])